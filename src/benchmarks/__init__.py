@@ -0,0 +1,4 @@
+"""
+Equivalence checks and benchmarks of the optimized code paths against their reference,
+run from src, e.g. python -m benchmarks.row_mappers
+"""
@@ -0,0 +1,119 @@
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+
+from sqlalchemy import create_engine
+
+from models.agency.sql_db import Base
+from processors.agency import CompactSchemaMigrator
+
+
+def build_sample_database(path: str, transactions: int = 200_000, seed: int = 1) -> None:
+    """
+    Synthetic agency database with the value shapes of real data: whole-dollar prices,
+    per square foot prices and averages with fractional cents, microsecond dates
+    """
+    rng = random.Random(seed)
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    estates, buildings, units = 1_000, 10_000, transactions // 3
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute(
+            "INSERT INTO regions (region_id, region_name_zh, region_name_en) VALUES ('R1', 'r', 'r');"
+        )
+        conn.execute(
+            "INSERT INTO subregions (subregion_id, subregion_name_zh, subregion_name_en, region_id) "
+            "VALUES ('S1', 's', 's', 'R1');"
+        )
+        conn.execute(
+            "INSERT INTO districts (district_id, district_name_zh, district_name_en, subregion_id) "
+            "VALUES ('D1', 'd', 'd', 'S1');"
+        )
+        conn.executemany(
+            "INSERT INTO estates (estate_id, estate_name_zh, estate_name_en, region_id, "
+            "subregion_id, district_id, address_en) VALUES (?, 'e', 'e', 'R1', 'S1', 'D1', 'a');",
+            [(f"E{idx:09d}",) for idx in range(estates)],
+        )
+        conn.executemany(
+            "INSERT INTO estate_monthly_market_info (estate_id, record_date, avg_ft_price, "
+            "avg_net_ft_price, total_tx_amount) VALUES (?, ?, ?, ?, ?);",
+            [
+                (
+                    f"E{idx:09d}",
+                    f"2024-{month:02d}-01 00:00:00.000000",
+                    rng.uniform(8_000, 20_000),
+                    round(rng.uniform(10_000, 25_000), 2),
+                    float(rng.randrange(1_000_000, 90_000_000)),
+                )
+                for idx in range(estates)
+                for month in range(1, 13)
+            ],
+        )
+        conn.executemany(
+            "INSERT INTO buildings (building_id, building_name_zh, building_name_en, estate_id) "
+            "VALUES (?, 'b', 'b', ?);",
+            [(f"B{idx:09d}", f"E{idx % estates:09d}") for idx in range(buildings)],
+        )
+        conn.executemany(
+            "INSERT INTO units (unit_id, floor, flat, area, net_area, bedroom, sitting_room, "
+            "building_id) VALUES (?, '1', 'A', ?, ?, 2, 1, ?);",
+            [
+                (f"U{idx:09d}", float(rng.randrange(300, 1500)), None, f"B{idx % buildings:09d}")
+                for idx in range(units)
+            ],
+        )
+        rows = []
+        for idx in range(transactions):
+            price = float(rng.randrange(2_000_000, 20_000_000, 1_000))
+            area = rng.randrange(300, 1500)
+            rows.append(
+                (
+                    f"I{idx:011d}",
+                    f"2024-05-01 10:{idx % 60:02d}:00.{idx % 1_000_000:06d}",
+                    price,
+                    price / area,
+                    f"U{idx % units:09d}",
+                )
+            )
+        conn.executemany(
+            "INSERT INTO transactions (tx_id, tx_date, price, net_ft_price, unit_id) "
+            "VALUES (?, ?, ?, ?, ?);",
+            rows,
+        )
+    conn.close()
+
+
+def main() -> int:
+    """
+    Migrate the database given as argument, or a synthetic one, verify and benchmark it
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        source_path = sys.argv[1] if len(sys.argv) > 1 else None
+        if source_path is None:
+            source_path = os.path.join(tmp_dir, "agency_data.db")
+            build_sample_database(source_path)
+        compact_migrator = CompactSchemaMigrator(
+            source_path=source_path,
+            target_path=os.path.join(tmp_dir, "agency_data_compact.db"),
+        )
+        compact_migrator.migrate()
+        differences = compact_migrator.verify()
+        print(
+            "Scaled to cents: "
+            + ", ".join(f"{table}.{column}" for table, column in sorted(compact_migrator.scaled_columns))
+        )
+        print(f"Differences: {sum(differences.values())} rows")
+        results = compact_migrator.benchmark()
+        print(
+            f"Size: {results['source_bytes'] / 1e6:.1f} -> {results['compact_bytes'] / 1e6:.1f} MB, "
+            f"join: {results['source_join_ms']:.1f} -> {results['compact_join_ms']:.1f} ms"
+        )
+    return 1 if any(differences.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+import json
+import logging
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from pydantic import BaseModel
+
+import decoders
+from logger import housing_logger
+from models.agency.responses import (
+    BuildingInfoResponse,
+    EstateInfoResponse,
+    SingleEstateInfoResponse,
+)
+from .samples import API_RESPONSES_PATH, make_building_payloads
+
+# Documented responses decoded by every backend, next to the generated building payloads
+SAMPLE_RESPONSES = {
+    "estate_info.json": EstateInfoResponse,
+    "single_estate_info_no_phases.json": SingleEstateInfoResponse,
+    "single_estate_info_has_phases.json": SingleEstateInfoResponse,
+}
+
+
+def available_backends() -> list[str]:
+    """Decoder backends whose optional dependency is installed"""
+    installed = {"msgspec": decoders.msgspec}
+    return [
+        name
+        for name in decoders._DECODER_BACKENDS
+        if installed.get(name, True) is not None
+    ]
+
+
+def normalize(value):
+    """
+    Builtin view of a decoded response, pydantic models and msgspec structs alike
+    """
+    if isinstance(value, BaseModel):
+        return {name: normalize(getattr(value, name)) for name in type(value).model_fields}
+    struct_fields = getattr(type(value), "__struct_fields__", None)
+    if struct_fields is not None:
+        return {name: normalize(getattr(value, name)) for name in struct_fields}
+    if isinstance(value, (list, tuple)):
+        return [normalize(item) for item in value]
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _decode(backend, content: bytes, model: type[BaseModel]):
+    try:
+        return normalize(backend.decode(content, model))
+    except (ValueError, TypeError):
+        # Backends raise their own error types, only rejecting the payload has to match
+        return ValueError
+
+
+def check_equivalence(samples: list[tuple[bytes, type[BaseModel]]]) -> int:
+    """
+    Decode every sample with each backend, returns the number of results that differ
+    from the pydantic reference decoder
+    """
+    reference = decoders.get_decoder("pydantic")
+    mismatches = 0
+    for name in available_backends():
+        backend = decoders.get_decoder(name)
+        for content, model in samples:
+            if _decode(backend, content, model) != _decode(reference, content, model):
+                mismatches += 1
+                print(f"Mismatch ({name}, {model.__name__}) for payload {content[:60]!r}")
+    return mismatches
+
+
+def benchmark(payloads: list[bytes], rounds: int = 3) -> dict[str, float]:
+    """Best time in seconds to decode all payloads into BuildingInfoResponse, per backend"""
+    timings = {}
+    for name in available_backends():
+        backend = decoders.get_decoder(name)
+        best = float("inf")
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for payload in payloads:
+                backend.decode(payload, BuildingInfoResponse)
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+    return timings
+
+
+def measure_memory(payloads: list[bytes]) -> dict[str, dict[str, int]]:
+    """
+    Traced memory while decoding all payloads into BuildingInfoResponse and keeping
+    the results, per backend: peak bytes, retained bytes and live allocations
+    """
+    measurements = {}
+    for name in available_backends():
+        backend = decoders.get_decoder(name)
+        # Warm up per-model caches so only the decoded responses are measured
+        backend.decode(payloads[0], BuildingInfoResponse)
+        tracemalloc.start()
+        try:
+            responses = [backend.decode(payload, BuildingInfoResponse) for payload in payloads]
+            retained, peak = tracemalloc.get_traced_memory()
+            allocations = sum(
+                stat.count for stat in tracemalloc.take_snapshot().statistics("filename")
+            )
+        finally:
+            tracemalloc.stop()
+        del responses
+        measurements[name] = {
+            "peak_bytes": peak,
+            "retained_bytes": retained,
+            "allocations": allocations,
+        }
+    return measurements
+
+
+def main() -> int:
+    # Edge case payloads that fail to validate are logged, keep the output readable
+    housing_logger.setLevel(logging.CRITICAL)
+    samples = [
+        ((API_RESPONSES_PATH / file_name).read_bytes(), model)
+        for file_name, model in SAMPLE_RESPONSES.items()
+    ]
+    samples += [
+        (payload, BuildingInfoResponse)
+        for payload in make_building_payloads(count=50, edge_cases=True)
+    ]
+    mismatches = check_equivalence(samples)
+    print(f"Backends: {', '.join(available_backends())}")
+    print(f"Equivalence: {mismatches} mismatching decodes")
+
+    payloads = make_building_payloads(edge_cases=False)
+    megabytes = sum(len(payload) for payload in payloads) / 1e6
+    timings = benchmark(payloads)
+    for name, seconds in timings.items():
+        print(
+            f"{name:>13}: {seconds:.3f}s, {megabytes / seconds:,.1f} MB/s, "
+            f"{timings['pydantic'] / seconds:.1f}x"
+        )
+
+    memory = measure_memory(payloads)
+    reference = memory["pydantic"]
+    for name, measured in memory.items():
+        print(
+            f"{name:>13}: peak {measured['peak_bytes'] / 1e6:,.1f} MB, "
+            f"retained {measured['retained_bytes'] / 1e6:,.1f} MB, "
+            f"{measured['allocations'] / len(payloads):,.0f} allocations per response, "
+            f"{measured['peak_bytes'] / reference['peak_bytes']:.2f}x peak"
+        )
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+import random
+import sys
+import time
+import tracemalloc
+
+from processors.agency.pk_index import PkIndex
+
+
+def _keys(count: int, offset: int = 0):
+    """Primary keys shaped like the unit feature keys, (unit_id, feature_id)"""
+    for idx in range(offset, offset + count):
+        yield (f"U{idx:09d}", f"feature_{idx % 7}")
+
+
+def check_dedup(partitions: int = 50, partition_keys: int = 2_000, seed: int = 1) -> int:
+    """
+    Admit keys partition by partition like _claim_pk, with repeats inside a partition,
+    across partitions and of seeded keys. Returns the number of keys admitted or
+    dropped differently than with an exact set.
+    """
+    rng = random.Random(seed)
+    stored = set(_keys(partition_keys))
+    on_disk = PkIndex(exists_in_db=lambda pk: pk in stored)
+    on_disk.seed(stored)
+    run_index, reference = PkIndex(), set()
+    mismatches = 0
+    for partition_idx in range(partitions):
+        offset = (partition_idx + 1) * partition_keys
+        keys = list(_keys(partition_keys, offset))
+        # Repeats within the partition, of earlier partitions and of stored rows
+        keys += rng.sample(keys, partition_keys // 4)
+        keys += list(_keys(partition_keys // 4, rng.randrange(partition_keys, offset + 1)))
+        keys += list(_keys(partition_keys // 4, rng.randrange(0, partition_keys)))
+        rng.shuffle(keys)
+        for pk in keys:
+            admitted = pk not in run_index and pk not in on_disk
+            if admitted:
+                run_index.add(pk)
+            expected = pk not in reference and pk not in stored
+            if expected:
+                reference.add(pk)
+            mismatches += admitted != expected
+        run_index.hand_off()
+    print(
+        f"Dedup: {len(reference):,} keys admitted, {mismatches} mismatches, "
+        f"{on_disk.db_checks:,} database checks"
+    )
+    return mismatches
+
+
+def _measure(build) -> tuple[int, float]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    structure = build()
+    seconds = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del structure
+    return size, seconds
+
+
+def benchmark_memory(count: int) -> None:
+    """Retained memory of count handed off keys, set of tuples vs. PkIndex"""
+
+    def build_set():
+        return set(_keys(count))
+
+    def build_index():
+        index = PkIndex()
+        for pk in _keys(count):
+            index.add(pk)
+        index.hand_off()
+        return index
+
+    for name, build in (("set", build_set), ("PkIndex", build_index)):
+        size, seconds = _measure(build)
+        print(
+            f"{name:>8}: {count:,} keys, {size / 1e6:,.1f} MB "
+            f"({size / count:.1f} B/key), built in {seconds:.2f}s"
+        )
+
+
+def main() -> int:
+    mismatches = check_dedup()
+    for count in (100_000, 1_000_000):
+        benchmark_memory(count)
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
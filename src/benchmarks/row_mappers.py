@@ -0,0 +1,71 @@
+import logging
+import sys
+import time
+
+from logger import housing_logger
+from processors.agency.buildings import map_building_payload_to_rows
+from .samples import make_building_payloads
+
+
+def _map(payload: bytes, keep_latest: bool, fast: bool, skip_transaction=None):
+    try:
+        return map_building_payload_to_rows(payload, keep_latest, fast, skip_transaction)
+    except Exception as e:
+        return type(e)
+
+
+def check_equivalence(payloads: list[bytes]) -> int:
+    """
+    Map every payload with the compiled row mappers and with the pydantic models,
+    returns the number of payloads whose rows differ
+    """
+    skip_transaction = lambda tx_id: tx_id.endswith("3")
+    mismatches = 0
+    for keep_latest in (False, True):
+        for skip in (None, skip_transaction):
+            for payload in payloads:
+                reference = _map(payload, keep_latest, False, skip)
+                fast = _map(payload, keep_latest, True, skip)
+                if reference != fast:
+                    mismatches += 1
+                    print(
+                        f"Mismatch (keep_latest={keep_latest}, skip={skip is not None}) "
+                        f"for payload {payload[:60]!r}"
+                    )
+    return mismatches
+
+
+def benchmark(payloads: list[bytes], rounds: int = 3) -> dict[str, float]:
+    """Best time in seconds to map all payloads, per path"""
+    timings = {}
+    for name, fast in (("pydantic", False), ("row_mappers", True)):
+        best = float("inf")
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for payload in payloads:
+                map_building_payload_to_rows(payload, False, fast)
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+    return timings
+
+
+def main() -> int:
+    # Edge case payloads that fail to validate are logged by both paths, keep the output readable
+    housing_logger.setLevel(logging.CRITICAL)
+    mismatches = check_equivalence(make_building_payloads(edge_cases=True))
+    print(f"Equivalence: {mismatches} mismatching payloads")
+
+    payloads = make_building_payloads(edge_cases=False)
+    rows = sum(
+        len(table_rows)
+        for table_rows in map_building_payload_to_rows(payloads[0], False, True)[1].values()
+    ) * len(payloads)
+    timings = benchmark(payloads)
+    for name, seconds in timings.items():
+        print(f"{name:>12}: {seconds:.3f}s, {rows / seconds:,.0f} rows/s")
+    print(f"     speedup: {timings['pydantic'] / timings['row_mappers']:.1f}x")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+import copy
+import json
+import random
+from pathlib import Path
+
+# Sample API responses documented with the repo
+API_RESPONSES_PATH = Path(__file__).resolve().parents[2] / "docs" / "api_responses"
+
+
+def load_sample_building() -> dict:
+    """Documented building transaction info response"""
+    with open(API_RESPONSES_PATH / "transactions.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _vary_transaction(transaction: dict, rng: random.Random) -> None:
+    """Edge cases seen in real responses: nulls, missing keys, numeric strings"""
+    roll = rng.random()
+    if roll < 0.1:
+        transaction["bedroom"] = None
+    elif roll < 0.2:
+        transaction["gain"] = None
+    elif roll < 0.25:
+        transaction["price"] = 6800000
+    elif roll < 0.3:
+        transaction.pop("last_tx_date", None)
+    elif roll < 0.35:
+        transaction["feature"] = []
+    elif roll < 0.4:
+        transaction["net_ft_price"] = 9985.37
+    elif roll < 0.42:
+        transaction["bedroom"] = "3.5"
+    elif roll < 0.44:
+        transaction["sitting_room"] = None
+
+
+def make_building_payloads(
+    count: int = 200,
+    units: int = 30,
+    transactions: int = 5,
+    edge_cases: bool = True,
+    seed: int = 1,
+) -> list[bytes]:
+    """
+    Raw building payloads cloned from the sample response, with unique IDs and
+    dated transactions; with edge_cases, fields are randomly nulled, dropped or retyped
+    """
+    rng = random.Random(seed)
+    sample = load_sample_building()
+    sample_unit = sample["data"][0]
+    sample_transaction = sample_unit["transactions"][0]
+    payloads = []
+    for building_idx in range(count):
+        building = copy.deepcopy(sample)
+        building_id = f"B{building_idx:09d}"
+        building["building"]["id"] = building_id
+        building["data"] = []
+        for unit_idx in range(units):
+            unit = copy.deepcopy(sample_unit)
+            unit["unit_id"] = f"U{building_idx:06d}{unit_idx:04d}"
+            unit["transactions"] = []
+            for tx_idx in range(transactions):
+                transaction = copy.deepcopy(sample_transaction)
+                transaction["id"] = f"I{building_idx:06d}{unit_idx:04d}{tx_idx:02d}"
+                transaction["tx_date"] = f"{2010 + tx_idx}-0{1 + unit_idx % 9}-09T16:00:00.000Z"
+                if edge_cases:
+                    _vary_transaction(transaction, rng)
+                unit["transactions"].append(transaction)
+            if edge_cases and rng.random() < 0.1:
+                unit["area"] = None
+            building["data"].append(unit)
+        payloads.append(json.dumps(building, ensure_ascii=False).encode("utf-8"))
+    return payloads
@@ -1,5 +1,5 @@
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, Literal, Optional, Union
 import yaml
 from pydantic import BaseModel, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -35,6 +35,57 @@ class AgencyApiUrls(BaseModel):
     single_estate_info: str
     estate_monthly_market_info: str
     building_transactions: str
+    district_transactions: str
+
+
+class RateLimitConfig(BaseModel):
+    # Requests per second, adjusted at runtime between min_rate and max_rate
+    initial_rate: float = 5.0
+    min_rate: float = 0.5
+    max_rate: float = 20.0
+    burst: float = 5.0
+    # AIMD: add increase_step after success_threshold consecutive successes,
+    # multiply by decrease_factor on 429/5xx (at most once per decrease_cooldown seconds)
+    increase_step: float = 0.5
+    success_threshold: int = 20
+    decrease_factor: float = 0.5
+    decrease_cooldown: float = 1.0
+    # Exponential backoff with full jitter between retries, in seconds
+    backoff_base: float = 1.0
+    backoff_cap: float = 60.0
+
+
+class AgencyCrawlerConfig(BaseModel):
+    # Number of building, estate info and district feed requests kept in flight by the async engine
+    max_concurrency: int = 8
+    # Estates per market_stat request, batches are split on error
+    market_info_batch_size: int = 100
+    # Responses above this size shrink the batch size for the next requests
+    market_info_max_response_bytes: int = 5_000_000
+    # Response decoder backend: auto, msgspec, pydantic_json or pydantic (reference)
+    decoder: str = "auto"
+
+
+class AgencyPipelineConfig(BaseModel):
+    # Threads parsing and mapping payloads when map_processes is 0, merging into caches runs on one worker
+    parse_workers: int = 2
+    # Processes mapping raw building payloads to rows, 0 maps on a single thread
+    map_processes: int = 0
+    # Map building rows with compiled mappers straight from the decoded JSON
+    fast_row_mappers: bool = True
+    # Items buffered between stages before the upstream stage blocks
+    queue_size: int = 100
+    # Seconds between per-stage throughput logs
+    stats_interval: float = 30.0
+
+
+class AgencyPartitionConfig(BaseModel):
+    # Process RSS budget in MB partitions are sized against, 0 keeps a fixed partition_size
+    memory_budget_mb: int = 0
+    # Share of the budget at which a partition is flushed early and the next one shrinks
+    high_watermark: float = 0.8
+    min_partition_size: int = 10
+    max_partition_size: int = 2000
 
 
 class WikiApiUrls(BaseModel):
@@ -46,13 +97,32 @@ class WikiApiUrls(BaseModel):
 class AgencyApiConfig(BaseModel):
     urls: AgencyApiUrls
     headers: Dict[str, str]
+    crawler: AgencyCrawlerConfig = AgencyCrawlerConfig()
+    pipeline: AgencyPipelineConfig = AgencyPipelineConfig()
+    partitioning: AgencyPartitionConfig = AgencyPartitionConfig()
+    rate_limit: RateLimitConfig = RateLimitConfig()
 
     # Load cookies from env file
     cookies_token: Optional[str] = Field(None, env="AGENCY_API_COOKIES_TOKEN")
 
 
+class WikiCrawlerConfig(BaseModel):
+    # Estates resolved concurrently across a partition, requests are still paced by the rate limit
+    max_concurrency: int = 16
+    # Candidate titles sent per query when resolving estates, 50 is the API limit for regular clients
+    titles_per_query: int = 50
+
+
+class WikiCacheConfig(BaseModel):
+    # Days before an estate without an article has its title variations resolved again
+    negative_ttl_days: float = 7
+
+
 class WikiApiConfig(BaseModel):
     urls: WikiApiUrls
+    crawler: WikiCrawlerConfig = WikiCrawlerConfig()
+    cache: WikiCacheConfig = WikiCacheConfig()
+    rate_limit: RateLimitConfig = RateLimitConfig()
 
 
 class CloudStorageConfig(BaseModel):
@@ -85,17 +155,39 @@ class BaseStorageConfig(BaseModel):
     files: Dict[str, str]
 
 
+class AgencyStorageConfig(BaseStorageConfig):
+    settings: Dict[str, int] = {}
+
+
+class WikiStorageConfig(BaseStorageConfig):
+    # Compression of the JSONL wiki output, "zstd" needs the zstandard package
+    compression: Optional[Literal["zstd"]] = None
+
+
 class RAGStorageConfig(BaseModel):
     path: str
     files: Dict[str, str]
     settings: Dict[str, int]
 
 
+class SqliteConfig(BaseModel):
+    # Pragma profile applied to every SQLite connection, journal_mode once per database
+    pragmas: Dict[str, Union[str, int]] = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -65536,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    }
+
+
 class StorageConfig(BaseModel):
     root_path: str
-    agency: BaseStorageConfig
-    wiki: BaseStorageConfig
+    agency: AgencyStorageConfig
+    wiki: WikiStorageConfig
     rag: RAGStorageConfig
+    sqlite: SqliteConfig = SqliteConfig()
 
 
 class Settings(BaseSettings):
@@ -1,3 +1,4 @@
 from .agency_base import AgencyCrawler
 from .estates import EstatesCrawler
-from .buildings import BuildingsCrawler
\ No newline at end of file
+from .buildings import BuildingsCrawler
+from .transactions import TransactionsCrawler
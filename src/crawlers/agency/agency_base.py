@@ -18,6 +18,7 @@ class AgencyCrawler(BaseCrawler):
     def __init__(self):
         super().__init__()
         self.headers = dict(housing_datahub_config.agency_api.headers)
+        self.rate_limit_config = housing_datahub_config.agency_api.rate_limit
         self._set_request_urls()
 
         # Init session to persist headers and cookies
@@ -1,21 +1,28 @@
 from ..base import BaseCrawler
 from logger import housing_logger
 from config import housing_datahub_config
-from typing import Optional
+from typing import AsyncIterator, Iterable, Iterator, Optional
 from requests import Session
-from utils import parse_response
-import time
+from utils import parse_content, parse_response
+import asyncio
+import queue
+from contextlib import aclosing
+import threading
 from models.agency.request_params import BuildingsRequestParams
 from models.agency.responses import (
     BuildingInfoResponse,
 )
 
+_DONE = object()
+
 
 class BuildingsCrawler(BaseCrawler):
     def __init__(self, agency_session: Session):
         super().__init__()
         self._set_request_urls()
         self.session = agency_session
+        self.rate_limit_config = housing_datahub_config.agency_api.rate_limit
+        self.max_concurrency = housing_datahub_config.agency_api.crawler.max_concurrency
 
     def _set_request_urls(self):
         self.buildings_url = housing_datahub_config.agency_api.urls.building_transactions
@@ -25,14 +32,129 @@ class BuildingsCrawler(BaseCrawler):
     ) -> Optional[list[BuildingInfoResponse]]:
         """
         Fetch buildings transaction info.
+        Synchronous wrapper around the async engine, keeps up to max_concurrency requests in flight.
+        """
+        return asyncio.run(self._collect_buildings_by_building_ids(building_ids))
+
+    async def _collect_buildings_by_building_ids(
+        self, building_ids: list[str]
+    ) -> list[BuildingInfoResponse]:
+        async with self:
+            return [
+                building
+                async for building in self.iter_buildings_by_building_ids(building_ids)
+            ]
+
+    async def iter_buildings_by_building_ids(
+        self, building_ids: list[str]
+    ) -> AsyncIterator[BuildingInfoResponse]:
+        """
+        Fetch buildings transaction info concurrently, yield responses as they finish.
+        Must be consumed within the crawler async context.
+        """
+        async for content in self.iter_building_contents_by_building_ids(building_ids):
+            parsed_response: Optional[BuildingInfoResponse] = parse_content(
+                content=content, model=BuildingInfoResponse
+            )
+            if parsed_response:
+                yield parsed_response
+
+    async def iter_building_contents_by_building_ids(
+        self, building_ids: Iterable[str]
+    ) -> AsyncIterator[bytes]:
+        """
+        Fetch raw building transaction info bodies concurrently, yield them as they finish.
+        max_concurrency workers pull building IDs, so at most that many requests are in flight
+        and at most that many finished bodies wait for the consumer.
+        Must be consumed within the crawler async context.
+        """
+        contents: asyncio.Queue = asyncio.Queue(maxsize=self.max_concurrency)
+        pending_ids = iter(building_ids)
+
+        async def worker() -> None:
+            for building_id in pending_ids:
+                content = await self._aio_fetch_building_content_by_building_id(
+                    building_id=building_id
+                )
+                if content:
+                    await contents.put(content)
+
+        async def run_workers() -> None:
+            try:
+                await asyncio.gather(*(worker() for _ in range(self.max_concurrency)))
+            finally:
+                await contents.put(_DONE)
+
+        producer = asyncio.create_task(run_workers())
+        try:
+            while (content := await contents.get()) is not _DONE:
+                yield content
+            # Surface worker errors
+            await producer
+        finally:
+            producer.cancel()
+
+    def iter_building_contents(
+        self, building_ids: Iterable[str], buffer_size: int = 100
+    ) -> Iterator[bytes]:
         """
-        output = []
-        for building_id in building_ids:
-            response = self._fetch_single_building_by_building_id(building_id=building_id)
-            if response:
-                output.append(response)
-            time.sleep(0.1)
-        return output
+        Blocking iterator over the async engine, which runs on its own event loop thread.
+        Used as the source of the staged building pipeline; at most buffer_size bodies wait
+        for the consumer, the engine pauses while the buffer is full.
+        """
+        contents: queue.Queue = queue.Queue(maxsize=buffer_size)
+        stopped = threading.Event()
+
+        async def pump() -> None:
+            loop = asyncio.get_running_loop()
+            async with self, aclosing(
+                self.iter_building_contents_by_building_ids(building_ids)
+            ) as building_contents:
+                async for content in building_contents:
+                    if stopped.is_set():
+                        break
+                    # Blocking put off the event loop, requests in flight keep going
+                    await loop.run_in_executor(None, contents.put, content)
+
+        def run() -> None:
+            try:
+                asyncio.run(pump())
+                contents.put(_DONE)
+            except BaseException as e:
+                contents.put(e)
+
+        thread = threading.Thread(target=run, name="building-crawl", daemon=True)
+        thread.start()
+        try:
+            while (content := contents.get()) is not _DONE:
+                if isinstance(content, BaseException):
+                    raise RuntimeError("Building crawl failed.") from content
+                yield content
+        finally:
+            stopped.set()
+            # Drain so the engine is never left blocked on a full buffer
+            while thread.is_alive():
+                try:
+                    contents.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+
+    async def _aio_fetch_building_content_by_building_id(
+        self, building_id: str
+    ) -> Optional[bytes]:
+        """
+        Fetch the raw building transaction info body asynchronously, parsing is left to the caller.
+        """
+        request_url = self.buildings_url.format(building_id=building_id)
+        request_params = BuildingsRequestParams(lang="en").model_dump()
+
+        content = await self._aio_make_request(url=request_url, params=request_params)
+        if not content:
+            housing_logger.error(
+                f"Failed to fetch building transaction info for building ID {building_id}."
+            )
+            return None
+        return content
 
     def _fetch_single_building_by_building_id(
         self, building_id: str
@@ -52,4 +174,4 @@ class BuildingsCrawler(BaseCrawler):
         parsed_response: BuildingInfoResponse = parse_response(
             response=response, model=BuildingInfoResponse
         )
-        return parsed_response
\ No newline at end of file
+        return parsed_response
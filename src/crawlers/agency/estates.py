@@ -3,8 +3,9 @@ from logger import housing_logger
 from config import housing_datahub_config
 from typing import Optional, Union
 from requests import Response, Session
-from utils import parse_response
-import time
+from utils import parse_content, parse_response, partition_ids
+import asyncio
+import math
 from models.agency.request_params import (
     EstateInfoRequestParams,
     SingleEstateInfoRequestParams,
@@ -23,6 +24,14 @@ class EstatesCrawler(BaseCrawler):
         super().__init__()
         self._set_request_urls()
         self.session = agency_session
+        self.rate_limit_config = housing_datahub_config.agency_api.rate_limit
+        self.max_concurrency = housing_datahub_config.agency_api.crawler.max_concurrency
+        self.market_info_batch_size = (
+            housing_datahub_config.agency_api.crawler.market_info_batch_size
+        )
+        self.market_info_max_response_bytes = (
+            housing_datahub_config.agency_api.crawler.market_info_max_response_bytes
+        )
 
     def _set_request_urls(self):
         self.all_estate_info_url = (
@@ -38,44 +47,73 @@ class EstatesCrawler(BaseCrawler):
     def fetch_estate_ids_from_all_estate_info(self) -> Optional[list]:
         """
         Fetch all estate info and return a list of estate IDs
+        Page 1 gives the total count, the remaining pages are fetched concurrently and merged in page order.
         """
         base_url = self.all_estate_info_url
         request_params = EstateInfoRequestParams(
             lang="zh-hk", limit=1000, page=1
         ).model_dump()
 
-        estate_count = float("inf")
-        estate_ids = []
-
         # Get estate ids
         housing_logger.info("Starting to fetch all estate info for estate IDs.")
-        while request_params["page"] * request_params["limit"] < estate_count:
-            response = self._make_request(url=base_url, params=request_params)
-            if not response:
-                housing_logger.error("Failed to fetch estate info.")
-                return None
-            estate_info: EstateInfoResponse = parse_response(
-                response=response, model=EstateInfoResponse
+        response = self._make_request(url=base_url, params=request_params)
+        if not response:
+            housing_logger.error("Failed to fetch estate info.")
+            return None
+        first_page: Optional[EstateInfoResponse] = parse_response(
+            response=response, model=EstateInfoResponse
+        )
+        if not first_page:
+            housing_logger.error("Failed to parse estate info page 1.")
+            return None
+        page_count = math.ceil(first_page.count / request_params["limit"])
+        housing_logger.info(
+            f"Fetched page 1 / {page_count}. Total estate count: {first_page.count}."
+        )
+
+        remaining_pages = asyncio.run(
+            self._fetch_estate_info_pages(
+                pages=list(range(2, page_count + 1)), request_params=request_params
             )
-            if estate_info.count < estate_count:
-                estate_count = estate_info.count
+        )
+        estate_ids = []
+        for page, estate_info in enumerate([first_page, *remaining_pages], start=1):
+            if not estate_info:
+                housing_logger.error(f"Failed to fetch estate info page {page}.")
+                return None
             # Only include estate IDs, not phase IDs
             estate_ids.extend(
                 [
                     estate.id
                     for estate in estate_info.result
-                    if estate.id.startswith("E")
+                    if estate and estate.id.startswith("E")
                 ]
             )
-            housing_logger.info(
-                f"Fetched page {request_params['page']}. Total estates fetched so far: {len(estate_ids)}."
-            )
-            request_params["page"] += 1
-            time.sleep(0.25)
 
-        housing_logger.info(f"Fetched {len(estate_ids)} estate IDs.")
+        housing_logger.info(f"Fetched {len(estate_ids)} estate IDs from {page_count} pages.")
         return estate_ids
 
+    async def _fetch_estate_info_pages(
+        self, pages: list[int], request_params: dict
+    ) -> list[Optional[EstateInfoResponse]]:
+        """
+        Fetch estate info pages concurrently, results are in the same order as pages
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def fetch(page: int) -> Optional[EstateInfoResponse]:
+            async with semaphore:
+                content = await self._aio_make_request(
+                    url=self.all_estate_info_url,
+                    params={**request_params, "page": page},
+                )
+            if not content:
+                return None
+            return parse_content(content=content, model=EstateInfoResponse)
+
+        async with self:
+            return await asyncio.gather(*(fetch(page) for page in pages))
+
     def fetch_single_estate_info_by_id_lang(
         self, estate_id: str, lang="en"
     ) -> Optional[SingleEstateInfoResponse]:
@@ -97,26 +135,91 @@ class EstatesCrawler(BaseCrawler):
         return estate_info
 
     def fetch_estate_monthly_market_info_by_estate_ids(
-        self, estate_id: Union[list, str]
+        self, estate_id: Union[list, str], retry: int = 3
     ) -> Optional[list[EstateMonthlyMarketInfoResponse]]:
         """
         Fetch estate monthly market info by estate IDs
         """
+        infos, _ = self._fetch_estate_monthly_market_info_batch(
+            estate_id=estate_id, retry=retry
+        )
+        return infos
+
+    def fetch_estate_monthly_market_info_in_batches(
+        self, estate_ids: list[str], batch_size: Optional[int] = None
+    ) -> list[EstateMonthlyMarketInfoResponse]:
+        """
+        Fetch estate monthly market info for many estates, sending comma-joined est_ids batches.
+        A failed batch is split in half and retried until single estates remain.
+        An oversized response is kept, as it is already downloaded and parsed; splitting
+        it would only fetch the same data again. It halves the batch size instead, and
+        the estates still pending are re-partitioned to that size.
+        """
+        batch_size = batch_size or self.market_info_batch_size
+        pending = partition_ids(estate_ids, batch_size)
+        output = []
+        request_count = 0
+        while pending:
+            batch = pending.pop(0)
+            # Splitting is the retry strategy for multi-estate batches
+            infos, response_size = self._fetch_estate_monthly_market_info_batch(
+                estate_id=batch, retry=1 if len(batch) > 1 else 3
+            )
+            request_count += 1
+            if infos is None:
+                if len(batch) == 1:
+                    housing_logger.warning(
+                        f"Skipping estate monthly market info for estate ID: {batch[0]}."
+                    )
+                    continue
+                middle = len(batch) // 2
+                pending[:0] = [batch[:middle], batch[middle:]]
+                housing_logger.info(
+                    f"Splitting failed market info batch of {len(batch)} estates into {middle} and {len(batch) - middle}."
+                )
+                continue
+            output.extend(infos)
+            # Oversized responses shrink the batches still pending, not the one already fetched
+            if response_size > self.market_info_max_response_bytes and batch_size > 1:
+                batch_size = max(1, batch_size // 2)
+                remaining = [estate for part in pending for estate in part]
+                pending = partition_ids(remaining, batch_size)
+                housing_logger.info(
+                    f"Market info response of {response_size} bytes, batch size reduced to {batch_size}."
+                )
+        housing_logger.info(
+            f"Fetched monthly market info for {len(output)} / {len(estate_ids)} estates in {request_count} requests."
+        )
+        return output
+
+    def _fetch_estate_monthly_market_info_batch(
+        self, estate_id: Union[list, str], retry: int = 3
+    ) -> tuple[Optional[list[EstateMonthlyMarketInfoResponse]], int]:
+        """
+        Fetch estate monthly market info for one est_ids batch, return parsed infos and response size in bytes
+        """
         base_url = self.estate_monthly_market_info_url
         if isinstance(estate_id, list):
             estate_id = ",".join(estate_id)
         request_params = EstateMonthlyMarketInfoRequestParams(
             lang="en", type="estate", est_ids=estate_id
-        )
-        response = self._make_request(url=base_url, params=request_params)
+        ).model_dump()
+        response = self._make_request(url=base_url, params=request_params, retry=retry)
         if not response:
             housing_logger.warning(
                 f"Failed to fetch estate monthly market info for estate IDs: {estate_id}."
             )
-            return None
+            return None, 0
         # Parsing nested list response
         estates_monthly_market_infos = []
-        for item in response.json():
+        try:
+            items = response.json()
+        except ValueError as e:
+            housing_logger.error(
+                f"Invalid JSON in estate monthly market info for estate IDs: {estate_id}. Error: {e}"
+            )
+            return None, len(response.content)
+        for item in items:
             try:
                 estate_monthly_market_info_response: Optional[EstateMonthlyMarketInfoResponse] = EstateMonthlyMarketInfoResponse(
                     id=item.get("id"),
@@ -128,5 +231,5 @@ class EstatesCrawler(BaseCrawler):
                 housing_logger.error(
                     f"Failed to parse estate monthly market info for estate IDs: {estate_id}. Error: {e}"
                 )
-                return None
-        return estates_monthly_market_infos
+                return None, len(response.content)
+        return estates_monthly_market_infos, len(response.content)
@@ -0,0 +1,97 @@
+from ..base import BaseCrawler
+from logger import housing_logger
+from config import housing_datahub_config
+from typing import Optional
+from requests import Session
+from utils import parse_content, parse_response
+import asyncio
+import math
+from models.agency.request_params import DistrictTransactionsRequestParams
+from models.agency.responses import (
+    DistrictTransactionRecord,
+    DistrictTransactionsResponse,
+)
+
+
+class TransactionsCrawler(BaseCrawler):
+    """
+    Crawler for the district transaction feed.
+    Pages through recent transactions of a whole district, a cheap source of daily deltas
+    compared with sweeping every building.
+    """
+
+    def __init__(self, agency_session: Session):
+        super().__init__()
+        self._set_request_urls()
+        self.session = agency_session
+        self.rate_limit_config = housing_datahub_config.agency_api.rate_limit
+        self.max_concurrency = housing_datahub_config.agency_api.crawler.max_concurrency
+
+    def _set_request_urls(self):
+        self.district_transactions_url = (
+            housing_datahub_config.agency_api.urls.district_transactions
+        )
+
+    def fetch_recent_transactions_by_district_id(
+        self, district_id: str, tx_date: str = "1month"
+    ) -> Optional[list[DistrictTransactionRecord]]:
+        """
+        Fetch recent transactions of a district within the tx_date window
+        Page 1 gives the total count, the remaining pages are fetched concurrently.
+        """
+        request_params = DistrictTransactionsRequestParams(
+            dist_ids=district_id, tx_date=tx_date
+        ).model_dump()
+        response = self._make_request(
+            url=self.district_transactions_url, params=request_params
+        )
+        if not response:
+            housing_logger.error(
+                f"Failed to fetch transactions for district ID {district_id}."
+            )
+            return None
+        first_page: Optional[DistrictTransactionsResponse] = parse_response(
+            response=response, model=DistrictTransactionsResponse
+        )
+        if not first_page:
+            return None
+        page_count = math.ceil(first_page.count / request_params["limit"])
+
+        remaining_pages = asyncio.run(
+            self._fetch_transaction_pages(
+                pages=list(range(2, page_count + 1)), request_params=request_params
+            )
+        )
+        records = []
+        for page, transactions in enumerate([first_page, *remaining_pages], start=1):
+            if not transactions:
+                housing_logger.error(
+                    f"Failed to fetch transactions page {page} for district ID {district_id}."
+                )
+                return None
+            records.extend(transactions.result)
+        housing_logger.info(
+            f"Fetched {len(records)} transactions for district ID {district_id} in {page_count} pages."
+        )
+        return records
+
+    async def _fetch_transaction_pages(
+        self, pages: list[int], request_params: dict
+    ) -> list[Optional[DistrictTransactionsResponse]]:
+        """
+        Fetch transaction pages concurrently, results are in the same order as pages
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def fetch(page: int) -> Optional[DistrictTransactionsResponse]:
+            async with semaphore:
+                content = await self._aio_make_request(
+                    url=self.district_transactions_url,
+                    params={**request_params, "page": page},
+                )
+            if not content:
+                return None
+            return parse_content(content=content, model=DistrictTransactionsResponse)
+
+        async with self:
+            return await asyncio.gather(*(fetch(page) for page in pages))
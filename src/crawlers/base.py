@@ -1,8 +1,17 @@
 from logger import housing_logger
 from typing import Optional
 import requests
+import aiohttp
+import asyncio
 from abc import ABC, abstractmethod
 import time
+from config.settings import RateLimitConfig
+from .rate_limiter import (
+    AdaptiveRateLimiter,
+    RETRYABLE_STATUS_CODES,
+    get_rate_limiter,
+    parse_retry_after,
+)
 
 
 class BaseCrawler(ABC):
@@ -12,33 +21,121 @@ class BaseCrawler(ABC):
     def __init__(self):
         self.session: Optional[requests.Session] = None
         self.headers: Optional[dict] = None
+        self.aio_session: Optional[aiohttp.ClientSession] = None
+        # Per-host adaptive rate limit, subclasses set it from their API config
+        self.rate_limit_config: RateLimitConfig = RateLimitConfig()
+
+    async def __aenter__(self):
+        """Async context manager entry."""
+        if self.aio_session is None:
+            self.aio_session = self._create_aio_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Async context manager exit."""
+        if self.aio_session:
+            await self.aio_session.close()
+            self.aio_session = None
+
+    def _create_aio_session(self) -> aiohttp.ClientSession:
+        """
+        Create an aiohttp session sharing headers and cookies with the requests session
+        """
+        headers = dict(self.session.headers) if self.session else self.headers
+        cookies = self.session.cookies.get_dict() if self.session else None
+        return aiohttp.ClientSession(headers=headers, cookies=cookies)
+
+    def _get_rate_limiter(self, url: str) -> AdaptiveRateLimiter:
+        return get_rate_limiter(url, self.rate_limit_config)
 
     def _make_request(
         self, url: str, params: dict = None, retry: int = 3
     ) -> Optional[requests.Response]:
         """
         Make a GET request to the specified URL with the given parameters. Retry on failure up to 'retry' times.
+        Requests are paced by the per-host adaptive rate limiter. Throttling responses (429/5xx)
+        and connection errors are retried with backoff, other HTTP errors fail immediately.
         """
-        retry_count = 0
-        while retry_count < retry:
-            response = self.session.get(url, params=params)
+        rate_limiter = self._get_rate_limiter(url)
+        for attempt in range(retry):
+            rate_limiter.acquire()
+            try:
+                response = self.session.get(url, params=params)
+            except requests.RequestException as e:
+                housing_logger.error(
+                    f"Request exception for URL: {url} with params: {params}. Error: {e}. Retry {attempt + 1}/{retry}"
+                )
+                rate_limiter.on_throttle()
+                if attempt + 1 < retry:
+                    time.sleep(rate_limiter.backoff_delay(attempt))
+                continue
+            if response.status_code in RETRYABLE_STATUS_CODES:
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                housing_logger.error(
+                    f"HTTP {response.status_code} for URL: {url} with params: {params}. Retry {attempt + 1}/{retry}"
+                )
+                rate_limiter.on_throttle(retry_after=retry_after)
+                # No backoff after the last attempt, the request is given up
+                if attempt + 1 < retry:
+                    time.sleep(rate_limiter.backoff_delay(attempt, retry_after=retry_after))
+                continue
             try:
                 response.raise_for_status()
             except requests.HTTPError as e:
-                retry_count += 1
                 housing_logger.error(
-                    f"HTTP error for URL: {url} with params: {params}. Error: {e}. Retry {retry_count}/{retry}"
+                    f"HTTP error for URL: {url} with params: {params}. Error: {e}. Not retrying."
+                )
+                return None
+            rate_limiter.on_success()
+            return response
+        housing_logger.error(
+            f"Failed to fetch URL: {url} with params: {params} after {retry} retries."
+        )
+        return None
+
+    async def _aio_make_request(
+        self, url: str, params: dict = None, retry: int = 3
+    ) -> Optional[bytes]:
+        """
+        Async counterpart of _make_request on the shared aiohttp session, returns the raw response body.
+        """
+        if self.aio_session is None:
+            self.aio_session = self._create_aio_session()
+        rate_limiter = self._get_rate_limiter(url)
+        for attempt in range(retry):
+            await rate_limiter.acquire_async()
+            try:
+                async with self.aio_session.get(url, params=params) as response:
+                    status = response.status
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    if status not in RETRYABLE_STATUS_CODES:
+                        response.raise_for_status()
+                        content = await response.read()
+            except aiohttp.ClientResponseError as e:
+                housing_logger.error(
+                    f"HTTP error for URL: {url} with params: {params}. Error: {e}. Not retrying."
                 )
-                time.sleep(2)  # Wait for 2 seconds before retrying
+                return None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                housing_logger.error(
+                    f"Async request error for URL: {url} with params: {params}. Error: {e}. Retry {attempt + 1}/{retry}"
+                )
+                rate_limiter.on_throttle()
+                if attempt + 1 < retry:
+                    await asyncio.sleep(rate_limiter.backoff_delay(attempt))
                 continue
-            except requests.RequestException as e:
-                retry_count += 1
+            if status in RETRYABLE_STATUS_CODES:
                 housing_logger.error(
-                    f"Request exception for URL: {url} with params: {params}. Error: {e}. Retry {retry_count}/{retry}"
+                    f"HTTP {status} for URL: {url} with params: {params}. Retry {attempt + 1}/{retry}"
                 )
-                time.sleep(2)
+                rate_limiter.on_throttle(retry_after=retry_after)
+                if attempt + 1 < retry:
+                    await asyncio.sleep(
+                        rate_limiter.backoff_delay(attempt, retry_after=retry_after)
+                    )
                 continue
-            return response
+            rate_limiter.on_success()
+            return content
         housing_logger.error(
             f"Failed to fetch URL: {url} with params: {params} after {retry} retries."
         )
@@ -0,0 +1,132 @@
+import asyncio
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from urllib.parse import urlparse
+from config.settings import RateLimitConfig
+
+# Status codes signalling the host is overloaded or throttling us
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket limiter shared by all requests to a single host.
+    The refill rate follows AIMD: additive increase after a streak of successes,
+    multiplicative decrease on throttling responses (429/5xx) or connection errors.
+    Usable from both threads (acquire) and coroutines (acquire_async).
+    """
+
+    def __init__(self, config: RateLimitConfig):
+        self.config = config
+        self.rate = config.initial_rate
+        self.burst = config.burst
+        self._tokens = self.burst
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._success_streak = 0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """
+        Take one token, return the number of seconds to wait before using it
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._last_refill) * self.rate
+            )
+            self._last_refill = now
+            self._tokens -= 1
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+            # Honour a host-wide pause requested by Retry-After
+            return max(wait, self._blocked_until - now)
+
+    def acquire(self) -> None:
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def on_success(self) -> None:
+        """
+        Additive increase once enough consecutive requests succeeded
+        """
+        with self._lock:
+            self._success_streak += 1
+            if self._success_streak >= self.config.success_threshold:
+                self._success_streak = 0
+                self.rate = min(
+                    self.config.max_rate, self.rate + self.config.increase_step
+                )
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> None:
+        """
+        Multiplicative decrease, at most once per cooldown so that a burst of
+        concurrent failures does not collapse the rate to the minimum
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._success_streak = 0
+            if now - self._last_decrease >= self.config.decrease_cooldown:
+                self._last_decrease = now
+                self.rate = max(
+                    self.config.min_rate, self.rate * self.config.decrease_factor
+                )
+                self._tokens = min(self._tokens, 0)
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Seconds to wait before retry number attempt (0-based).
+        Retry-After from the server wins, otherwise exponential backoff with full jitter.
+        """
+        if retry_after is not None:
+            return min(retry_after, self.config.backoff_cap)
+        ceiling = min(
+            self.config.backoff_cap, self.config.backoff_base * (2**attempt)
+        )
+        return random.uniform(0, ceiling)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header, given either as delay seconds or as an HTTP date
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+_rate_limiters: dict[str, AdaptiveRateLimiter] = {}
+_registry_lock = threading.Lock()
+
+
+def get_rate_limiter(url: str, config: RateLimitConfig) -> AdaptiveRateLimiter:
+    """
+    Get the limiter for the host of url, creating it on first use
+    """
+    host = urlparse(url).netloc
+    with _registry_lock:
+        if host not in _rate_limiters:
+            _rate_limiters[host] = AdaptiveRateLimiter(config=config)
+        return _rate_limiters[host]
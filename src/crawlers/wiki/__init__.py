@@ -1 +1 @@
-from .wiki import WikiCrawler
\ No newline at end of file
+from .wiki import NoHongKongPageError, WikiCrawler
\ No newline at end of file
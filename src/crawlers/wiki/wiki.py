@@ -1,15 +1,22 @@
 import requests
 import asyncio
-import aiohttp
-from wikipediaapi import Wikipedia, WikipediaPage
+import json
 from logger import housing_logger
 from typing import Optional, Dict
 from crawlers.base import BaseCrawler
-from models.wiki.request_params import WikiPageRequestParams
+from models.wiki.request_params import (
+    WikiPageQueryRequestParams,
+    WikiTitleResolveRequestParams,
+)
+from models.wiki.responses import WikiPageContent
 from config import housing_datahub_config
 import time
 from utils import generate_wikipedia_title_variations
 
+class NoHongKongPageError(LookupError):
+    """Every candidate page was fetched and none is about a Hong Kong estate"""
+
+
 class WikiCrawler(BaseCrawler):
     """
     Wikipedia Crawler to fetch Estate information.
@@ -21,61 +28,38 @@ class WikiCrawler(BaseCrawler):
         self.language = language
         self.session = requests.Session()
         self.session.headers.update({"User-Agent": "HK_Housing_Datahub_Crawler"})
-        self.wiki = Wikipedia(
-            user_agent="HK_Housing_Datahub_Crawler", language=self.language
-        )
+        self.rate_limit_config = housing_datahub_config.wiki_api.rate_limit
         self._set_request_urls()
-        self.aio_session = None
-
-    async def __aenter__(self):
-        """Async context manager entry."""
-        if self.aio_session is None:
-            self.aio_session = aiohttp.ClientSession(headers={"User-Agent": "HK_Housing_Datahub_Crawler"})
-        return self
-
-    async def __aexit__(self, exc_type, exc_val, exc_tb):
-        """Async context manager exit."""
-        if self.aio_session:
-            await self.aio_session.close()
-            self.aio_session = None
 
     def _set_request_urls(self):
         self.base_url = housing_datahub_config.wiki_api.urls.search.format(
             language=self.language
         )
 
-    def _make_request(
-        self, url: str, params: dict = None
-    ) -> Optional[requests.Response]:
-        """Make a request to the API."""
-        try:
-            response = self.session.get(url, params=params)
-            response.raise_for_status()
-            return response
-        except Exception as e:
-            housing_logger.error(f"Request failed: {e}")
-            return None
-
-    def get_page_content(self, page_title: str) -> Optional[WikipediaPage]:
-
-
+    async def get_page_content(
+        self, page_title: str, candidate_titles: Optional[list[str]] = None
+    ) -> Optional[WikiPageContent]:
+        """
+        Resolve the page of an estate on the shared aiohttp session.
+        candidate_titles are the pages found by resolve_titles, resolved here when not given.
+        Only candidates are fetched, in order, skipping non-HK pages.
+        Raises NoHongKongPageError when every candidate was fetched and skipped as non-HK,
+        returns None when no candidate could be fetched.
+        """
         start_time = time.time()
-        # Try different title variations to handle case sensitivity
-        title_variations = generate_wikipedia_title_variations(page_title)
+        if candidate_titles is None:
+            candidate_titles = (await self.resolve_titles([page_title]))[page_title] or []
 
-        for title in title_variations:
+        non_hk_count = 0
+        for title in candidate_titles:
             try:
-                page = self.wiki.page(title)
-                if page.exists():
-                    # Check if the page is a disambiguation page by looking for "消歧義" in categories
-                    if any("消歧義" in category for category in page.categories):
-                        housing_logger.warning(f"Page '{title}' is a disambiguation page, skipping.")
-                        continue  # Skip to next variation
-
+                page = await self._fetch_page(title)
+                if page is not None:
                     # Verify the page is related to Hong Kong by checking for "香港" in the text
                     if "香港" not in page.text:
                         housing_logger.warning(f"Page '{title}' does not mention '香港', likely not an HK estate, skipping.")
-                        continue  # Skip to next variation
+                        non_hk_count += 1
+                        continue  # Skip to next candidate
 
                     fetch_time = time.time() - start_time
                     housing_logger.info(f"Successfully fetched page '{title}' in {fetch_time:.2f}s")
@@ -84,118 +68,163 @@ class WikiCrawler(BaseCrawler):
                 housing_logger.debug(f"Error fetching page '{title}': {e}")
                 continue
 
-        # If none of the variations work, log the failure
+        # If none of the candidates work, log the failure
         fetch_time = time.time() - start_time
         housing_logger.warning(
-            f"Page '{page_title}' does not exist in Wikipedia ({self.language}). Tried variations: {title_variations}. Total time: {fetch_time:.2f}s"
+            f"Page '{page_title}' does not exist in Wikipedia ({self.language}). Candidate pages: {candidate_titles}. Total time: {fetch_time:.2f}s"
         )
+        if candidate_titles and non_hk_count == len(candidate_titles):
+            raise NoHongKongPageError(page_title)
         return None
 
-    async def _aio_make_request(self, url: str, params: dict = None) -> Optional[dict]:
-        """Make an async request to the API."""
-        if self.aio_session is None:
-            self.aio_session = aiohttp.ClientSession(headers={"User-Agent": "HK_Housing_Datahub_Crawler"})
-        try:
-            async with self.aio_session.get(url, params=params) as response:
-                response.raise_for_status()
-                return await response.json()
-        except Exception as e:
-            housing_logger.error(f"Async request failed: {e}")
-            return None
-
-    async def _fetch_single_section_wikitext(
-        self, page_title: str, section_title: str, section_index: int
-    ) -> tuple[str, str]:
-        """Fetch wikitext for a single section asynchronously."""
+    async def resolve_titles(
+        self, page_titles: list[str]
+    ) -> Dict[str, Optional[list[str]]]:
+        """
+        Resolve the title variations of many estates in bulk.
+        Variations of all estates are deduplicated and checked titles_per_query at a time,
+        following normalization and redirects. Returns, per estate, the existing
+        non-disambiguation pages in the order of its variations,
+        None for estates whose variations could not all be checked.
+        """
         start_time = time.time()
-        try:
-            api_url = self.base_url
-            params = WikiPageRequestParams(
-                page=page_title, prop="wikitext", section=section_index
-            ).model_dump()
-            data = await self._aio_make_request(api_url, params=params)
-            if data and "parse" in data and "wikitext" in data["parse"]:
-                fetch_time = time.time() - start_time
-                # Removed detailed debug logging for cleaner output
-                return section_title, data["parse"]["wikitext"]["*"]
-            else:
-                fetch_time = time.time() - start_time
-                housing_logger.warning(f"No data for section wikitext '{section_title}' in {fetch_time:.2f}s")
-                return section_title, ""
-        except Exception as e:
-            fetch_time = time.time() - start_time
-            housing_logger.warning(
-                f"Failed to fetch section wikitext for '{section_title}': {e}. Time: {fetch_time:.2f}s"
+        # Try different title variations to handle case sensitivity
+        title_variations = {
+            page_title: generate_wikipedia_title_variations(page_title)
+            for page_title in page_titles
+        }
+        unique_titles = list(
+            dict.fromkeys(
+                title for variations in title_variations.values() for title in variations
             )
-            return section_title, ""
-
-    async def fetch_section_wikitexts_concurrent(
-        self, page_content: WikipediaPage
-    ) -> Dict[str, str]:
-        """Fetch wikitext for all sections concurrently."""
-        section_wikitexts = {}
-
-        # Prepare tasks for sections with titles
-        tasks = []
-        for i, section in enumerate(page_content.sections):
-            if section.title:  # Only fetch for sections with titles
-                tasks.append(
-                    self._fetch_single_section_wikitext(
-                        page_content.title, section.title, i
-                    )
-                )
-
-        # Execute all tasks concurrently
-        if tasks:
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            for result in results:
-                if isinstance(result, Exception):
-                    housing_logger.error(f"Exception in concurrent fetch: {result}")
-                else:
-                    section_title, wikitext = result
-                    section_wikitexts[section_title] = wikitext
-
-        return section_wikitexts
+        )
+        pages = await self._query_titles(unique_titles, prop="categories|info")
 
-    def get_section_wikitext(
-        self, page_content: WikipediaPage, section_title: str
-    ) -> str:
-        """Get the raw wikitext for a specific section (synchronous fallback)."""
-        start_time = time.time()
-        # Find the section index
-        section_index = None
-        for i, section in enumerate(page_content.sections):
-            if section.title == section_title:
-                section_index = i
+        candidates = {}
+        for page_title, variations in title_variations.items():
+            if any(title not in pages for title in variations):
+                candidates[page_title] = None
+                continue
+            resolved = []
+            for title in variations:
+                page = pages[title]
+                if page is None:
+                    continue
+                # Check if the page is a disambiguation page by looking for "消歧義" in categories
+                if any("消歧義" in category["title"] for category in page["categories"]):
+                    housing_logger.debug(f"Page '{page['title']}' is a disambiguation page, skipping.")
+                    continue
+                resolved.append(page["title"])
+            candidates[page_title] = list(dict.fromkeys(resolved))
+        housing_logger.info(
+            f"Resolved {len(unique_titles)} title variations of {len(page_titles)} estates "
+            f"in {time.time() - start_time:.2f}s"
+        )
+        return candidates
+
+    async def get_latest_revids(self, titles: list[str]) -> Dict[str, int]:
+        """
+        Latest revision id of each existing page, checked titles_per_query at a time.
+        Pages redirected since they were fetched report the revision of the redirect target.
+        """
+        pages = await self._query_titles(titles, prop="info")
+        return {
+            title: page["lastrevid"]
+            for title, page in pages.items()
+            if page is not None and "lastrevid" in page
+        }
+
+    async def _query_titles(
+        self, titles: list[str], prop: str
+    ) -> Dict[str, Optional[dict]]:
+        """
+        Map each title to the page it resolves to, None for missing and invalid pages.
+        Titles are queried titles_per_query at a time, titles of failed queries are left out.
+        """
+        batch_size = housing_datahub_config.wiki_api.crawler.titles_per_query
+        batches = [
+            titles[i : i + batch_size] for i in range(0, len(titles), batch_size)
+        ]
+        pages: Dict[str, Optional[dict]] = {}
+        for batch_pages in await asyncio.gather(
+            *(self._query_title_batch(batch, prop) for batch in batches)
+        ):
+            pages.update(batch_pages)
+        return pages
+
+    async def _query_title_batch(
+        self, titles: list[str], prop: str
+    ) -> Dict[str, Optional[dict]]:
+        params = WikiTitleResolveRequestParams(
+            titles="|".join(titles), prop=prop
+        ).model_dump()
+        normalized, redirects, pages = {}, {}, {}
+        while True:
+            data = await self._aio_make_request(self.base_url, params=params)
+            if not data or "query" not in data:
+                housing_logger.warning(f"Failed to query titles: {titles}")
+                return {}
+            query = data["query"]
+            normalized.update({item["from"]: item["to"] for item in query.get("normalized", [])})
+            redirects.update({item["from"]: item["to"] for item in query.get("redirects", [])})
+            for page in query.get("pages", []):
+                # Categories of one page may be split over continued responses
+                entry = pages.setdefault(page["title"], {**page, "categories": []})
+                entry["categories"].extend(page.get("categories", []))
+            if "continue" not in data:
                 break
-        if section_index is None:
-            housing_logger.debug(f"Section '{section_title}' not found in page '{page_content.title}'")
-            return ""
+            params = {**params, **data["continue"]}
+
+        resolved = {}
+        for title in titles:
+            target = normalized.get(title, title)
+            target = redirects.get(target, target)
+            page = pages.get(target)
+            if page is None or page.get("missing") or page.get("invalid"):
+                resolved[title] = None
+            else:
+                resolved[title] = page
+        return resolved
+
+    async def _fetch_page(self, title: str) -> Optional[WikiPageContent]:
+        """
+        Fetch the full wikitext, revision id and categories of a page in one request,
+        sections are split locally. None if the page does not exist.
+        """
+        params = WikiPageQueryRequestParams(titles=title).model_dump()
+        data = await self._aio_make_request(self.base_url, params=params)
+        if not data or "query" not in data:
+            return None
+        pages = data["query"].get("pages") or []
+        if not pages or pages[0].get("missing") or pages[0].get("invalid"):
+            return None
+        page = pages[0]
+        revision = (page.get("revisions") or [{}])[0]
+        return WikiPageContent.from_wikitext(
+            title=page["title"],
+            pageid=page.get("pageid"),
+            revid=revision.get("revid"),
+            wikitext=revision.get("slots", {}).get("main", {}).get("content") or "",
+            categories=[category["title"] for category in page.get("categories", [])],
+        )
 
-        # Fetch section wikitext via MediaWiki API
+    async def _aio_make_request(self, url: str, params: dict = None) -> Optional[dict]:
+        """Make an async request to the API, rate limited per host."""
+        content = await super()._aio_make_request(url, params=params)
+        if content is None:
+            return None
         try:
-            api_url = self.base_url
-            params = WikiPageRequestParams(
-                page=page_content.title, prop="wikitext", section=section_index
-            ).model_dump()
-            response = self._make_request(api_url, params=params)
-            if response:
-                data = response.json()
-            else:
-                fetch_time = time.time() - start_time
-                housing_logger.warning(f"No response for section wikitext '{section_title}' in {fetch_time:.2f}s")
-                return ""
-            if "parse" in data and "wikitext" in data["parse"]:
-                fetch_time = time.time() - start_time
-                housing_logger.debug(f"Successfully fetched wikitext for section '{section_title}' in {fetch_time:.2f}s")
-                return data["parse"]["wikitext"]["*"]
-        except Exception as e:
-            fetch_time = time.time() - start_time
-            housing_logger.warning(
-                f"Failed to fetch section wikitext for '{section_title}': {e}. Time: {fetch_time:.2f}s"
-            )
+            return json.loads(content)
+        except ValueError as e:
+            housing_logger.error(f"Async request returned invalid JSON: {e}")
+            return None
 
-        # Fallback: return parsed text
-        fetch_time = time.time() - start_time
-        housing_logger.debug(f"Using fallback parsed text for section '{section_title}' in {fetch_time:.2f}s")
-        return page_content.sections[section_index].text
+    def get_section_wikitext(
+        self, page_content: WikiPageContent, section_title: str
+    ) -> str:
+        """Get the raw wikitext for a specific section, split from the page wikitext."""
+        for section in page_content.sections:
+            if section.title == section_title:
+                return section.wikitext
+        housing_logger.debug(f"Section '{section_title}' not found in page '{page_content.title}'")
+        return ""
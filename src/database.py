@@ -0,0 +1,61 @@
+import threading
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+
+from config import housing_datahub_config
+from logger import housing_logger
+
+# Pooled engines shared by all processors and orchestrators, keyed by (database path, read_only)
+_engines: dict[tuple[str, bool], Engine] = {}
+_lock = threading.Lock()
+
+
+def get_engine(db_path: str, read_only: bool = False) -> Engine:
+    """
+    Get the shared engine for the SQLite database at db_path, created on first use.
+    The journal mode is set once per database, the other pragmas of the profile
+    are applied to every new pooled connection.
+    Read-only engines open the file in read-only mode, for readers that never write.
+    """
+    key = (str(db_path), read_only)
+    with _lock:
+        if key not in _engines:
+            _engines[key] = _create_engine(str(db_path), read_only)
+        return _engines[key]
+
+
+def dispose_engines() -> None:
+    """
+    Close all pooled connections, engines are recreated on the next get_engine
+    """
+    with _lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+
+
+def _create_engine(db_path: str, read_only: bool) -> Engine:
+    pragmas = dict(housing_datahub_config.storage.sqlite.pragmas)
+    journal_mode = pragmas.pop("journal_mode", None)
+    if read_only:
+        engine = create_engine(f"sqlite:///file:{db_path}?mode=ro&uri=true")
+        pragmas["query_only"] = "ON"
+    else:
+        engine = create_engine(f"sqlite:///{db_path}")
+
+    @event.listens_for(engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value};")
+        cursor.close()
+
+    # Journal mode is persistent in the database file, set once by the writer
+    if journal_mode and not read_only:
+        with engine.connect() as conn:
+            conn.execute(text(f"PRAGMA journal_mode={journal_mode};"))
+            conn.commit()
+        housing_logger.info(
+            f"Enabled {journal_mode} journal mode for SQLite database {db_path}."
+        )
+    return engine
@@ -0,0 +1,124 @@
+import json
+from typing import Optional, Union, get_args, get_origin
+
+from pydantic import BaseModel
+from pydantic_core import PydanticUndefined
+from logger import housing_logger
+
+try:
+    import msgspec
+except ImportError:  # Optional, faster decoding into structs
+    msgspec = None
+
+
+class PydanticDecoder:
+    """
+    Reference decoder: parse JSON to dicts, then validate into the pydantic model
+    """
+
+    name = "pydantic"
+
+    def decode(self, content: bytes, model: type[BaseModel]):
+        return model(**json.loads(content))
+
+
+class PydanticJsonDecoder:
+    """
+    Validate straight from the JSON bytes in pydantic-core, without intermediate dicts.
+    There is no orjson backend: parsing to dicts with orjson still validates them in a
+    second pass, which kept it at the memory of the reference and no faster than this one.
+    """
+
+    name = "pydantic_json"
+
+    def decode(self, content: bytes, model: type[BaseModel]):
+        return model.model_validate_json(content)
+
+
+class MsgspecDecoder:
+    """
+    Decode straight from the JSON bytes into msgspec structs with the fields of the pydantic model.
+    Structs support the same attribute access as the response models, but not the pydantic API.
+    """
+
+    name = "msgspec"
+
+    def __init__(self):
+        self._decoders: dict[type, "msgspec.json.Decoder"] = {}
+        self._structs: dict[type, type] = {}
+
+    def decode(self, content: bytes, model: type[BaseModel]):
+        decoder = self._decoders.get(model)
+        if decoder is None:
+            # Lax mode coerces numeric strings like pydantic does
+            decoder = msgspec.json.Decoder(self.struct_for(model), strict=False)
+            self._decoders[model] = decoder
+        try:
+            return decoder.decode(content)
+        except msgspec.MsgspecError as e:
+            raise ValueError(str(e)) from e
+
+    def struct_for(self, model: type[BaseModel]) -> type:
+        """
+        Struct type mirroring the fields of a pydantic model, nested models included
+        """
+        if model not in self._structs:
+            fields = []
+            for field_name, field_info in model.model_fields.items():
+                field_type = self._convert_annotation(field_info.annotation)
+                if field_info.default_factory is not None:
+                    fields.append(
+                        (
+                            field_name,
+                            field_type,
+                            msgspec.field(default_factory=field_info.default_factory),
+                        )
+                    )
+                elif field_info.default is PydanticUndefined:
+                    fields.append((field_name, field_type))
+                else:
+                    fields.append((field_name, field_type, field_info.default))
+            self._structs[model] = msgspec.defstruct(
+                model.__name__, fields, kw_only=True
+            )
+        return self._structs[model]
+
+    def _convert_annotation(self, annotation):
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            return self.struct_for(annotation)
+        origin = get_origin(annotation)
+        if origin is None:
+            return annotation
+        args = tuple(self._convert_annotation(arg) for arg in get_args(annotation))
+        if origin is Union:
+            return Union[args]
+        return origin[args]
+
+
+_DECODER_BACKENDS = {
+    "pydantic": lambda: PydanticDecoder(),
+    "pydantic_json": lambda: PydanticJsonDecoder(),
+    "msgspec": lambda: MsgspecDecoder() if msgspec else None,
+}
+
+_decoders: dict[str, object] = {}
+
+
+def get_decoder(name: str = "auto"):
+    """
+    Get the decoder backend by name, "auto" picks the fastest available.
+    Falls back to pydantic_json when an optional backend is not installed.
+    """
+    if name == "auto":
+        name = "msgspec" if msgspec else "pydantic_json"
+    if name not in _decoders:
+        if name not in _DECODER_BACKENDS:
+            raise ValueError(f"Unknown decoder backend: {name}")
+        decoder = _DECODER_BACKENDS[name]()
+        if decoder is None:
+            housing_logger.warning(
+                f"Decoder backend {name} is not installed, using pydantic_json."
+            )
+            decoder = _DECODER_BACKENDS["pydantic_json"]()
+        _decoders[name] = decoder
+    return _decoders[name]
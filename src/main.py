@@ -4,6 +4,7 @@ from orchestrators import (
     RAGOrchestrator,
     CloudUploadOrchestrator,
 )
+from database import dispose_engines
 
 
 def main():
@@ -13,6 +14,8 @@ def main():
     #     keep_latest_transaction_only=False,
     # )
     # agency_orchestrator.run_estates_info_data_pipeline()
+    # # Daily incremental update from the district transaction feed
+    # agency_orchestrator.run_district_transactions_pipeline(tx_date="1month")
     # wiki_orchestrator = WikiOrchestrator()
     # wiki_orchestrator.run_estate_wiki_data_pipeline()
 
@@ -26,4 +29,8 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        # Close the pooled SQLite connections, the last close checkpoints the WAL file
+        dispose_engines()
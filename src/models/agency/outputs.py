@@ -337,6 +337,33 @@ class BuildingsTableModel(BilingualBaseModel):
         return buildings
 
 
+class EstateMarketStatTableModel(SingleLanguageBaseModel):
+    estate_id: str
+    net_ft_price: Optional[float] = None
+    tx_count: Optional[int] = None
+    tx_amount: Optional[float] = None
+    synced: bool = False
+    updated_at: datetime
+
+    @classmethod
+    def from_response(
+        cls, response: SingleEstateInfoResponse
+    ) -> "EstateMarketStatTableModel":
+        market_stat = response.market_stat
+        return cls(
+            estate_id=response.id,
+            net_ft_price=market_stat.net_ft_price if market_stat else None,
+            tx_count=market_stat.tx_count if market_stat else None,
+            tx_amount=market_stat.tx_amount if market_stat else None,
+            updated_at=datetime.now(),
+        )
+
+    @property
+    def change_key(self) -> tuple:
+        """Fields compared against the last seen stat to detect new transactions"""
+        return (self.tx_count, self.tx_amount)
+
+
 # Estate monthly market info related table models ---------------------------------------
 
 
@@ -486,3 +513,14 @@ class TransactionsDetailModel(BaseModel):
             net_ft_price=response.net_ft_price,
             unit_id=unit_id,
         )
+
+
+# Crawl ledger models ---------------------------------------
+
+
+class CrawlLedgerTableModel(BaseModel):
+    run_id: int
+    stage: str
+    item_id: str
+    partition_idx: Optional[int] = None
+    committed_at: datetime
@@ -22,4 +22,13 @@ class EstateMonthlyMarketInfoRequestParams(BaseModel):
 
 class BuildingsRequestParams(BaseModel):
     lang: Literal["en", "zh-hk", "zh-cn"] = Field(default="zh-hk")
-    firsthand: Literal["true", "false"] = Field(default="false")
\ No newline at end of file
+    firsthand: Literal["true", "false"] = Field(default="false")
+
+
+class DistrictTransactionsRequestParams(BaseModel):
+    lang: Literal["en", "zh-hk", "zh-cn"] = Field(default="zh-hk")
+    dist_ids: str  # Comma-separated district IDs
+    tx_type: Literal["S", "L"] = Field(default="S")
+    tx_date: str = Field(default="1month")  # Lookback window, e.g. 1month, 1year, 3year
+    limit: int = Field(default=100, ge=1)
+    page: int = Field(default=1, ge=1)
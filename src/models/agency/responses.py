@@ -143,3 +143,37 @@ class UnitInfoField(IgnoreExtraModel):
 class BuildingInfoResponse(IgnoreExtraModel):
     building: IdNameOnlyField
     data: list[UnitInfoField]
+
+
+# search/v1/transactions (transactions by district)----------------------------
+
+
+class DistrictTransactionRecord(IgnoreExtraModel):
+    """
+    Transaction record of the district feed, carries the same transaction fields
+    as TransactionsDetailField plus the unit and building it belongs to
+    """
+
+    id: str
+    tx_date: str
+    feature: Optional[list[IdNameOnlyField]] = None
+    price: float
+    last_tx_date: Optional[str] = None
+    gain: Optional[float] = None
+    bedroom: Optional[int] = None
+    sitting_room: Optional[int] = None
+    net_ft_price: Optional[float] = None
+
+    unit_id: Optional[str] = None
+    floor: Optional[str] = None
+    flat: Optional[str] = None
+    area: Optional[float] = None
+    net_area: Optional[float] = None
+    building: Optional[IdNameOnlyField] = None
+
+
+class DistrictTransactionsResponse(IgnoreExtraModel):
+    count: int = Field(..., description="Total number of transactions")
+    result: list[DistrictTransactionRecord] = Field(
+        ..., description="List of transaction records"
+    )
@@ -4,6 +4,7 @@ from sqlalchemy import (
     String,
     Float,
     DateTime,
+    Boolean,
     ForeignKey,
     PrimaryKeyConstraint,
 )
@@ -101,6 +102,17 @@ class Building(Base):
     estate_id = Column(String, ForeignKey("estates.estate_id"), nullable=False)
     phase_id = Column(String, ForeignKey("phases.phase_id"))
 
+# Last seen market stat per estate, drives incremental refresh
+class EstateMarketStat(Base):
+    __tablename__ = "estate_market_stats"
+    estate_id = Column(String, ForeignKey("estates.estate_id"), primary_key=True)
+    net_ft_price = Column(Float)
+    tx_count = Column(Integer)
+    tx_amount = Column(Float)
+    # False until the buildings of the estate were crawled after this stat was seen
+    synced = Column(Boolean, nullable=False, default=False)
+    updated_at = Column(DateTime, nullable=False)
+
 # Estate monthly Market Info
 class EstateMonthlyMarketInfo(Base):
     __tablename__ = 'estate_monthly_market_info'
@@ -156,3 +168,21 @@ class Transactions(Base):
     gain = Column(Float)
     net_ft_price = Column(Float)
     unit_id = Column(String, ForeignKey("units.unit_id"), nullable=False)
+
+
+# Crawl ledger for resumable pipeline runs
+class CrawlRun(Base):
+    __tablename__ = "crawl_runs"
+    run_id = Column(Integer, primary_key=True, autoincrement=True)
+    started_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime)
+
+
+class CrawlLedgerEntry(Base):
+    __tablename__ = "crawl_ledger"
+    run_id = Column(Integer, ForeignKey("crawl_runs.run_id"), nullable=False)
+    stage = Column(String, nullable=False)
+    item_id = Column(String, nullable=False)
+    partition_idx = Column(Integer)
+    committed_at = Column(DateTime, nullable=False)
+    __table_args__ = (PrimaryKeyConstraint("run_id", "stage", "item_id"),)
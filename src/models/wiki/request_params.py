@@ -2,9 +2,27 @@ from pydantic import BaseModel, Field
 from typing import Literal
 
 
-class WikiPageRequestParams(BaseModel):
-    action: Literal["parse"] = Field(default="parse")
-    page: str
-    prop: Literal["wikitext", "text", "sections"] = Field(default="wikitext")
-    section: int | None = None
+class WikiPageQueryRequestParams(BaseModel):
+    """Full wikitext, revision id and categories of a page, following redirects"""
+
+    action: Literal["query"] = Field(default="query")
+    titles: str
+    prop: str = Field(default="revisions|categories")
+    rvprop: str = Field(default="ids|content")
+    rvslots: Literal["main"] = Field(default="main")
+    cllimit: str = Field(default="max")
+    redirects: int = Field(default=1)
+    format: Literal["json"] = Field(default="json")
+    formatversion: int = Field(default=2)
+
+
+class WikiTitleResolveRequestParams(BaseModel):
+    """Existence, redirects, categories and latest revision of up to 50 pipe-separated titles"""
+
+    action: Literal["query"] = Field(default="query")
+    titles: str
+    prop: str = Field(default="categories|info")
+    cllimit: str = Field(default="max")
+    redirects: int = Field(default=1)
     format: Literal["json"] = Field(default="json")
+    formatversion: int = Field(default=2)
@@ -0,0 +1,121 @@
+import re
+import mwparserfromhell
+from mwparserfromhell.nodes import Heading, Tag, Wikilink
+from mwparserfromhell.wikicode import Wikicode
+from pydantic import BaseModel, Field
+from typing import Optional
+
+# Tags without prose, tables are parsed separately from the section wikitext
+NON_TEXT_TAGS = {"ref", "references", "table", "gallery"}
+# Links to files and categories render no text, e.g. [[File:a.jpg|thumb|caption]]
+RE_NON_TEXT_LINK = re.compile(
+    r"^\s*:?\s*(file|image|category|檔案|文件|图像|圖像|分類|分类)\s*:", re.IGNORECASE
+)
+
+
+def _remove_non_text_nodes(wikicode: Wikicode) -> None:
+    for node in wikicode.filter(
+        forcetype=(Tag, Wikilink),
+        matches=lambda node: (
+            isinstance(node, Tag) and str(node.tag).strip().lower() in NON_TEXT_TAGS
+        )
+        or (isinstance(node, Wikilink) and RE_NON_TEXT_LINK.match(str(node.title))),
+    ):
+        try:
+            wikicode.remove(node)
+        except ValueError:
+            # Already removed with an enclosing node
+            pass
+
+
+def _plain_text(wikicode: Wikicode) -> str:
+    """Plain text of wikitext, one line per non-empty paragraph or list item"""
+    lines = wikicode.strip_code().splitlines()
+    return "\n".join(line.strip() for line in lines if line.strip())
+
+
+class WikiPageSection(BaseModel):
+    title: str
+    level: int
+    text: str = ""
+    # Wikitext of the section including its heading and subsections
+    wikitext: str = ""
+    sections: list["WikiPageSection"] = Field(default_factory=list)
+
+
+class WikiPageContent(BaseModel):
+    """
+    Page resolved from the MediaWiki API, with the section tree of its wikitext.
+    Mirrors the attributes of wikipediaapi pages used by the wiki processor.
+    """
+
+    title: str
+    pageid: Optional[int] = None
+    revid: Optional[int] = None
+    wikitext: str = ""
+    text: str = ""
+    summary: str = ""
+    sections: list[WikiPageSection] = Field(default_factory=list)
+    categories: list[str] = Field(default_factory=list)
+
+    @classmethod
+    def from_wikitext(
+        cls,
+        title: str,
+        wikitext: str,
+        pageid: Optional[int] = None,
+        revid: Optional[int] = None,
+        categories: Optional[list[str]] = None,
+    ) -> "WikiPageContent":
+        """
+        Split the wikitext into the lead summary and nested sections by heading level.
+        Each section keeps its wikitext for table parsing and its plain text.
+        """
+        parsed = mwparserfromhell.parse(wikitext)
+        flat_sections = parsed.get_sections(flat=True, include_lead=True)
+        # Capture the wikitext before non-text nodes are removed for the plain text
+        section_wikitexts = [str(section) for section in flat_sections]
+        _remove_non_text_nodes(parsed)
+
+        page = cls(
+            title=title,
+            pageid=pageid,
+            revid=revid,
+            wikitext=wikitext,
+            categories=categories or [],
+        )
+        # Stack of open sections, the page itself collects level 1 sections
+        section_stack: list = [page]
+        text_parts = []
+        for section_code, section_wikitext in zip(flat_sections, section_wikitexts):
+            headings = section_code.filter_headings(recursive=False)
+            if not headings or not isinstance(section_code.nodes[0], Heading):
+                page.summary = _plain_text(section_code)
+                text_parts.append(page.summary)
+                continue
+            heading = headings[0]
+            section = WikiPageSection(
+                title=_plain_text(heading.title),
+                # "== Title ==" is level 1, like the section levels of the MediaWiki API
+                level=max(heading.level - 1, 1),
+                text=_plain_text(Wikicode(section_code.nodes[1:])),
+            )
+            # Close sections at the same or a deeper level before opening this one
+            while len(section_stack) > section.level:
+                section_stack.pop()
+            section_stack[-1].sections.append(section)
+            section_stack.append(section)
+            # Open sections include the wikitext of their subsections
+            for open_section in section_stack[1:]:
+                open_section.wikitext += section_wikitext
+            text_parts.append(
+                f"{'=' * heading.level} {section.title} {'=' * heading.level}\n{section.text}"
+            )
+        page.text = "\n\n".join(part for part in text_parts if part)
+        return page
+
+    def section_wikitexts(self) -> dict[str, str]:
+        """Wikitext of each titled top-level section, keyed by section title"""
+        return {
+            section.title: section.wikitext for section in self.sections if section.title
+        }
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text
+from sqlalchemy.ext.declarative import declarative_base
+
+Base = declarative_base()
+
+
+# Revision-aware cache of fetched and processed wiki pages
+class WikiPage(Base):
+    __tablename__ = "wiki_pages"
+    title = Column(String, primary_key=True)
+    pageid = Column(Integer)
+    revid = Column(Integer, nullable=False)
+    wikitext = Column(Text, nullable=False)
+    wiki_data = Column(Text, nullable=False)  # Processed output as JSON
+    fetched_at = Column(DateTime, nullable=False)
+
+
+# Page resolved for each estate, page_title is NULL when no article was found
+class WikiEstate(Base):
+    __tablename__ = "wiki_estates"
+    estate_name = Column(String, primary_key=True)
+    page_title = Column(String)
+    checked_at = Column(DateTime, nullable=False)
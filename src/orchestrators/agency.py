@@ -1,13 +1,28 @@
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from contextlib import nullcontext
 from typing import Optional
-from crawlers.agency import AgencyCrawler, EstatesCrawler, BuildingsCrawler
-from models.agency.responses import (
-    BuildingInfoResponse,
-    EstateMonthlyMarketInfoResponse,
+from crawlers.agency import (
+    AgencyCrawler,
+    EstatesCrawler,
+    BuildingsCrawler,
+    TransactionsCrawler,
 )
-from processors.agency import EstatesProcessor, BuildingsProcessor
+from models.agency.responses import EstateMonthlyMarketInfoResponse
+from processors.agency import (
+    EstatesProcessor,
+    BuildingsProcessor,
+    CrawlLedger,
+    CompactSchemaMigrator,
+    DbWriter,
+    map_building_payload_to_rows,
+)
+from config import housing_datahub_config
 from logger import housing_logger
-import time
-from utils import partition_ids, timer
+from processors.columnar import remove_stale_segments
+from utils import timer
+from .partitioning import AdaptivePartitionSizer
+from .pipeline import Stage, StagedPipeline
 
 
 class AgencyOrchestrator:
@@ -20,7 +35,8 @@ class AgencyOrchestrator:
         debug_mode: bool = False,
         partition_size: int = 100,
         keep_latest_transaction_only: bool = False,
-        allow_cleanup_db: bool = False
+        allow_cleanup_db: bool = False,
+        incremental: bool = False,
     ):
         self._init_crawlers()
         self._init_processors(keep_latest_transaction_only=keep_latest_transaction_only)
@@ -32,74 +48,266 @@ class AgencyOrchestrator:
         self.debug_estate_limit = 20  # Limit number of estates to process in debug mode
         self.allow_cleanup_db = allow_cleanup_db
         self.partition_size = partition_size  # For batch processing
+        self._init_partition_sizer()
+        # Incremental mode only re-crawls estates whose market_stat changed
+        self.incremental = incremental
+        self.skipped_requests = {"estate_monthly_market_infos": 0, "buildings": 0}
 
     def _init_crawlers(self):
         self.agency_crawler = AgencyCrawler()
         self.agency_session = self.agency_crawler.request_session
         self.estates_crawler = EstatesCrawler(agency_session=self.agency_session)
         self.buildings_crawler = BuildingsCrawler(agency_session=self.agency_session)
+        self.transactions_crawler = TransactionsCrawler(
+            agency_session=self.agency_session
+        )
+
+    def _init_partition_sizer(self):
+        # One sizer per stage, the rows of an estate and of a building differ in size and count
+        self.estate_partition_sizer = self._create_partition_sizer()
+        self.building_partition_sizer = self._create_partition_sizer()
+
+    def _create_partition_sizer(self) -> AdaptivePartitionSizer:
+        # Starts at partition_size, adapted to the memory budget if one is configured
+        partition_config = housing_datahub_config.agency_api.partitioning
+        return AdaptivePartitionSizer(
+            initial_size=self.partition_size,
+            memory_budget_mb=partition_config.memory_budget_mb,
+            high_watermark=partition_config.high_watermark,
+            min_size=partition_config.min_partition_size,
+            max_size=partition_config.max_partition_size,
+        )
 
     def _init_processors(self, keep_latest_transaction_only: bool = False):
         self.estates_processor = EstatesProcessor()
         self.buildings_processor = BuildingsProcessor(
             keep_latest_transaction_only=keep_latest_transaction_only
         )
+        # Crawl ledger shares the estates processor session for resumable runs
+        self.ledger = CrawlLedger(session=self.estates_processor.session)
+        # Background writer, started for the duration of each pipeline run
+        self.db_writer: Optional[DbWriter] = None
+        # Spilled cache segments left by killed runs, removed once before any cache spills
+        removed_segments = remove_stale_segments(self.estates_processor.staging_path)
+        if removed_segments:
+            housing_logger.info(f"Removed {removed_segments} stale cache segments.")
+
+    def _start_db_writer(self) -> None:
+        # Single background writer for both processors, crawling continues while it commits
+        self.db_writer = DbWriter(
+            engine=self.estates_processor.engine,
+            max_pending=housing_datahub_config.storage.agency.settings.get(
+                "writer_queue_size", 4
+            ),
+        )
+        self.estates_processor.db_writer = self.db_writer
+        self.buildings_processor.db_writer = self.db_writer
+
+    def _stop_db_writer(self) -> None:
+        """
+        Commit pending writes and stop the writer thread, raises if the writer failed
+        """
+        db_writer, self.db_writer = self.db_writer, None
+        self.estates_processor.db_writer = None
+        self.buildings_processor.db_writer = None
+        if db_writer is not None:
+            db_writer.close()
 
     def run_estates_info_data_pipeline(self) -> None:
         """
         Run the complete data pipeline for estates data.
         """
-        housing_logger.info("Starting estates data pipeline.")
-        # Prompt for confirmation before cleaning DB
-        if self.allow_cleanup_db:
-            confirm = input("The database will be cleaned completely before starting the pipeline. Confirm? (y/n): ")
-            if confirm.lower() != 'y':
-                housing_logger.info("Database cleaning cancelled. Aborting pipeline.")
-                return
-            # Clean local DB before starting pipeline
-            self.estates_processor.clean_local_db()
-            self.buildings_processor.clean_local_db()
-
-        # Step 1: Fetch all estate IDs
-        housing_logger.info("#1 Fetching all estate IDs.")
-        self._estate_ids()
-
-        # Large volume data, partition processing required
-        partitioned_estate_ids = partition_ids(
-            self.estates_processor.caches["estate_ids_cache"], self.partition_size
-        )
-        # Step 2: Fetch and process single estate info for each estate ID in zh and en
-        # Step 3: Fetch estate monthly market info
-        housing_logger.info("#2 Fetching and processing single estate info.")
-        housing_logger.info("#3 Fetching and processing estate monthly market info.")
-        for idx, estate_id_partition in enumerate(partitioned_estate_ids):
-            housing_logger.info(
-                f"Processing estate info and monthly market info partition {idx + 1} / {len(partitioned_estate_ids)}."
-            )
-            self._estate_infos(estate_ids=estate_id_partition)
-            self._estate_monthly_market_infos(estate_ids=estate_id_partition)
-            housing_logger.info(
-                f"Completed processing partition {idx + 1} / {len(partitioned_estate_ids)}."
+        self._start_db_writer()
+        try:
+            housing_logger.info("Starting estates data pipeline.")
+            # Prompt for confirmation before cleaning DB
+            if self.allow_cleanup_db:
+                confirm = input("The database will be cleaned completely before starting the pipeline. Confirm? (y/n): ")
+                if confirm.lower() != 'y':
+                    housing_logger.info("Database cleaning cancelled. Aborting pipeline.")
+                    return
+                # Clean local DB before starting pipeline
+                self.estates_processor.clean_local_db()
+                self.buildings_processor.clean_local_db()
+
+            # Resume the last unfinished run if the previous one was interrupted
+            self.ledger.start_or_resume_run()
+
+            # Step 1: Fetch all estate IDs
+            housing_logger.info("#1 Fetching all estate IDs.")
+            self._estate_ids()
+
+            # Large volume data, partition processing required
+            # Partitions are cut as they go, sized by the partition sizer
+            estate_ids = self.estates_processor.caches["estate_ids_cache"]
+            processed_estates = 0
+            committed_estate_infos = self.ledger.get_committed_item_ids("estate_infos")
+            committed_market_infos = self.ledger.get_committed_item_ids(
+                "estate_monthly_market_infos"
             )
+            # Step 2: Fetch and process single estate info for each estate ID in zh and en
+            # Step 3: Fetch estate monthly market info
+            housing_logger.info("#2 Fetching and processing single estate info.")
+            housing_logger.info("#3 Fetching and processing estate monthly market info.")
+            for idx, estate_id_partition in enumerate(
+                self.estate_partition_sizer.iter_partitions(estate_ids)
+            ):
+                processed_estates += len(estate_id_partition)
+                partition_label = f"{idx + 1} (estates {processed_estates} / {len(estate_ids)})"
+                pending_estate_infos = [
+                    estate_id
+                    for estate_id in estate_id_partition
+                    if estate_id not in committed_estate_infos
+                ]
+                pending_market_infos = [
+                    estate_id
+                    for estate_id in estate_id_partition
+                    if estate_id not in committed_market_infos
+                ]
+                if not pending_estate_infos and not pending_market_infos:
+                    housing_logger.info(f"Skipping committed partition {partition_label}.")
+                    continue
+                housing_logger.info(
+                    f"Processing estate info and monthly market info partition {partition_label}."
+                )
+                if pending_estate_infos:
+                    self._estate_infos(estate_ids=pending_estate_infos, partition_idx=idx)
+                if self.incremental:
+                    changed_estate_ids = self.estates_processor.get_unsynced_estate_ids(
+                        pending_market_infos
+                    )
+                    self.skipped_requests["estate_monthly_market_infos"] += len(
+                        pending_market_infos
+                    ) - len(changed_estate_ids)
+                    pending_market_infos = changed_estate_ids
+                if pending_market_infos:
+                    self._estate_monthly_market_infos(
+                        estate_ids=pending_market_infos, partition_idx=idx
+                    )
+                housing_logger.info(f"Completed processing partition {partition_label}.")
 
-        # Step 4: Fetch buildings transaction info
-        housing_logger.info("#4 Fetching and processing buildings transaction info.")
-        partitioned_building_ids = partition_ids(
-            self.estates_processor.caches["building_ids_cache"], self.partition_size
-        )
-        for idx, building_id_partition in enumerate(partitioned_building_ids):
+            # Step 4: Fetch buildings transaction info
+            housing_logger.info("#4 Fetching and processing buildings transaction info.")
+            # Building IDs come from the committed buildings table, also when resuming
+            refresh_estate_ids = self._select_estates_for_building_refresh()
+            self.estates_processor.load_building_ids_from_db(estate_ids=refresh_estate_ids)
+            committed_buildings = self.ledger.get_committed_item_ids("buildings")
+            pending_buildings = [
+                building_id
+                for building_id in self.estates_processor.caches["building_ids_cache"]
+                if building_id not in committed_buildings
+            ]
             housing_logger.info(
-                f"Processing building info partition {idx + 1} / {len(partitioned_building_ids)}."
+                f"{len(pending_buildings)} buildings to process, "
+                f"{len(committed_buildings)} already committed in this run."
             )
-            self._buildings(building_ids=building_id_partition)
+            self._buildings(building_ids=pending_buildings)
             housing_logger.info(
-                f"Completed processing partition {idx + 1} / {len(partitioned_building_ids)}."
+                "#4 Completed fetching and processing buildings transaction info."
             )
-        housing_logger.info(
-            "#4 Completed fetching and processing buildings transaction info."
+
+            # Only estates whose buildings were all committed are synced, estates with
+            # failed building fetches stay unsynced and are picked up by the next incremental run
+            self.estates_processor.flush_writes()
+            synced_estate_ids = self.estates_processor.get_fully_crawled_estate_ids(
+                refresh_estate_ids, self.ledger.get_committed_item_ids("buildings")
+            )
+            if len(synced_estate_ids) < len(refresh_estate_ids):
+                housing_logger.warning(
+                    f"{len(refresh_estate_ids) - len(synced_estate_ids)} estates have buildings "
+                    "that failed to crawl, their market stats are left unsynced."
+                )
+            self.estates_processor.mark_market_stats_synced(synced_estate_ids)
+            if self.incremental:
+                housing_logger.info(
+                    f"Incremental refresh skipped {self.skipped_requests['buildings']} building requests "
+                    f"and {self.skipped_requests['estate_monthly_market_infos']} estates of monthly market info."
+                )
+
+            # Ledger entries must be committed before the run is closed
+            self.estates_processor.flush_writes()
+            self.ledger.finish_run()
+            if housing_datahub_config.storage.agency.settings.get("build_compact_db", False):
+                self._build_compact_db()
+            housing_logger.info("Completed estates data pipeline.")
+        finally:
+            self._stop_db_writer()
+
+    def run_district_transactions_pipeline(self, tx_date: str = "1month") -> None:
+        """
+        Daily incremental update from the district transaction feed.
+        Pulls recent transactions of every known district instead of re-crawling all buildings,
+        requires districts from a previous estates pipeline run.
+        """
+        self._start_db_writer()
+        try:
+            housing_logger.info("Starting district transactions pipeline.")
+            district_ids = self.estates_processor.load_district_ids_from_db()
+            if not district_ids:
+                housing_logger.warning(
+                    "No districts found in database. Run the estates pipeline first."
+                )
+                return
+
+            for idx, district_id in enumerate(district_ids):
+                housing_logger.info(
+                    f"Processing district transactions {idx + 1} / {len(district_ids)}."
+                )
+                records = self.transactions_crawler.fetch_recent_transactions_by_district_id(
+                    district_id=district_id, tx_date=tx_date
+                )
+                if not records:
+                    continue
+                self.buildings_processor.map_district_transaction_records_to_table_dicts(
+                    records=records
+                )
+                # Feed overlaps existing rows: transactions are upserted in full, units and
+                # features are only added, the feed lacks fields the building crawl stored
+                self.buildings_processor.upsert_cache_into_db_tables(
+                    config_maps=[self.buildings_processor.zh_table_configs],
+                    insert_only_caches={"units_cache", "unit_features_cache"},
+                )
+                self.buildings_processor.clear_data_caches(cache_excluded=[])
+
+            self.buildings_processor.flush_writes()
+            self.buildings_processor.close_session()
+            self.estates_processor.close_session()
+            housing_logger.info("Completed district transactions pipeline.")
+        finally:
+            self._stop_db_writer()
+
+    def _build_compact_db(self) -> None:
+        """
+        Rebuild the read-optimized compact copy of the agency database and check it against the source
+        """
+        compact_migrator = CompactSchemaMigrator(
+            source_path=self.estates_processor.local_db_path,
+            target_path=self.estates_processor.agency_data_storage_path
+            / housing_datahub_config.storage.agency.files.get(
+                "compact_db", "agency_data_compact.db"
+            ),
         )
+        compact_migrator.migrate()
+        compact_migrator.verify()
 
-        housing_logger.info("Completed estates data pipeline.")
+    def _select_estates_for_building_refresh(self) -> list[str]:
+        """
+        All estates in full mode, only estates with changed market stats in incremental mode
+        """
+        estate_ids = self.estates_processor.caches["estate_ids_cache"]
+        if not self.incremental:
+            return estate_ids
+        changed_estate_ids = self.estates_processor.get_unsynced_estate_ids(estate_ids)
+        self.estates_processor.load_building_ids_from_db(estate_ids=estate_ids)
+        total_buildings = len(self.estates_processor.caches["building_ids_cache"])
+        self.estates_processor.load_building_ids_from_db(estate_ids=changed_estate_ids)
+        self.skipped_requests["buildings"] = total_buildings - len(
+            self.estates_processor.caches["building_ids_cache"]
+        )
+        housing_logger.info(
+            f"Incremental refresh: {len(changed_estate_ids)} / {len(estate_ids)} estates changed market stats."
+        )
+        return changed_estate_ids
 
     def _estate_ids(self) -> None:
         if not self.estates_processor.caches["estate_ids_cache"]:
@@ -120,8 +328,15 @@ class AgencyOrchestrator:
                 ]
             )
 
-    def _estate_infos(self, estate_ids: list[str]) -> None:
+    def _estate_infos(self, estate_ids: list[str], partition_idx: Optional[int] = None) -> None:
+        fetched_estate_ids = []
         for estate_id in estate_ids:
+            # Flush what is cached so far if memory runs high mid-partition
+            if fetched_estate_ids and self.estate_partition_sizer.is_full(
+                len(fetched_estate_ids)
+            ):
+                self._hand_off_estate_infos(fetched_estate_ids, partition_idx)
+                fetched_estate_ids = []
             single_estate_info_zh = (
                 self.estates_crawler.fetch_single_estate_info_by_id_lang(
                     estate_id, lang="zh-hk"
@@ -136,74 +351,184 @@ class AgencyOrchestrator:
                 self.estates_processor.map_single_estate_info_responses_to_table_dicts(
                     single_estate_info_zh, single_estate_info_en
                 )
-            time.sleep(0.1)
-        # After processing all estates in the partition, create building IDs cache
-        self.estates_processor.create_building_ids_cache_from_building_cache()
+                fetched_estate_ids.append(estate_id)
+        self._hand_off_estate_infos(fetched_estate_ids, partition_idx)
 
-        # Push to db and clear caches
-        self.estates_processor.bulk_insert_cache_into_db_tables(
+    def _hand_off_estate_infos(
+        self, estate_ids: list[str], partition_idx: Optional[int] = None
+    ) -> None:
+        # Hand off to the db writer together with ledger entries and clear caches
+        self.estate_partition_sizer.add_rows(self.estates_processor.cached_row_count())
+        self.estates_processor.cache_ledger_entries(
+            cache_name=self.ledger.cache_name,
+            entries=self.ledger.create_ledger_entries(
+                stage="estate_infos",
+                item_ids=estate_ids,
+                partition_idx=partition_idx,
+            ),
+        )
+        # Changed market stats commit in the same transaction as the ledger entries,
+        # a crash before the commit re-crawls the estates and detects the change again
+        self.estates_processor.upsert_cache_into_db_tables(
             config_maps=[
                 self.estates_processor.zh_table_configs,
                 self.estates_processor.table_configs,
+                self.estates_processor.market_stat_table_configs,
+                self.ledger.table_configs,
             ]
         )
         self.estates_processor.clear_data_caches(
             cache_excluded=[
+                "estate_ids_cache",
                 "building_ids_cache",
             ]
         )
 
-    def _estate_monthly_market_infos(self, estate_ids: list[str]) -> None:
-        for estate_id in estate_ids:
-            # List of monthly market info per estate
-            market_info_response: Optional[list[EstateMonthlyMarketInfoResponse]] = (
-                self.estates_crawler.fetch_estate_monthly_market_info_by_estate_ids(
-                    estate_id
-                )
+    def _estate_monthly_market_infos(
+        self, estate_ids: list[str], partition_idx: Optional[int] = None
+    ) -> None:
+        # Whole partition in comma-joined batches, one market info response per estate
+        market_info_responses: list[EstateMonthlyMarketInfoResponse] = (
+            self.estates_crawler.fetch_estate_monthly_market_info_in_batches(
+                estate_ids=estate_ids
+            )
+        )
+        for info in market_info_responses:
+            self.estates_processor.map_single_estate_market_info_responses_to_table_dicts(
+                response=info
             )
-            if not market_info_response:
-                continue
-            # Process each estate's market info response
-            for info in market_info_response:
-                self.estates_processor.map_single_estate_market_info_responses_to_table_dicts(
-                    response=info
-                )
-            time.sleep(0.1)
 
-        # Push to db and clear caches
-        self.estates_processor.bulk_insert_cache_into_db_tables(
+        # Hand off to the db writer together with ledger entries and clear caches
+        self.estate_partition_sizer.add_rows(self.estates_processor.cached_row_count())
+        self.estates_processor.cache_ledger_entries(
+            cache_name=self.ledger.cache_name,
+            entries=self.ledger.create_ledger_entries(
+                stage="estate_monthly_market_infos",
+                item_ids=[info.id for info in market_info_responses],
+                partition_idx=partition_idx,
+            ),
+        )
+        self.estates_processor.upsert_cache_into_db_tables(
             config_maps=[
                 self.estates_processor.zh_table_configs,
                 self.estates_processor.table_configs,
+                self.ledger.table_configs,
             ]
         )
         self.estates_processor.clear_data_caches(
             cache_excluded=[
+                "estate_ids_cache",
                 "building_ids_cache",
             ]
         )
 
     def _buildings(self, building_ids: list[str]) -> None:
+        """
+        Crawl, map and merge buildings as overlapping stages, written by the db writer.
+        Building bodies come from the async engine of the buildings crawler,
+        mapping runs on threads or, with map_processes set, in a process pool;
+        merged buildings are handed off to the db writer whenever the partition sizer
+        reports the partition full, at its planned size or early on high memory.
+        """
         if not building_ids:
             housing_logger.warning("No building IDs found to process.")
             return
 
-        buildings: Optional[list[BuildingInfoResponse]] = (
-            self.buildings_crawler.fetch_buildings_by_building_ids(
-                building_ids=building_ids
-            )
+        pipeline_config = housing_datahub_config.agency_api.pipeline
+        mapped_building_ids: list[str] = []
+        partition_count = 0
+        self.building_partition_sizer.start_partition()
+
+        def merge_building_rows(mapped: tuple[str, dict[str, list[dict]]]) -> str:
+            nonlocal mapped_building_ids, partition_count
+            building_id, rows = mapped
+            self.buildings_processor.merge_table_rows(rows)
+            mapped_building_ids.append(building_id)
+            if self.building_partition_sizer.is_full(len(mapped_building_ids)):
+                self._hand_off_buildings(mapped_building_ids, partition_count)
+                self.building_partition_sizer.finish_partition(len(mapped_building_ids))
+                self.building_partition_sizer.start_partition()
+                mapped_building_ids = []
+                partition_count += 1
+            return building_id
+
+        # Merging runs on a single worker as it owns the processor caches
+        merge_stage = Stage(
+            name="merge",
+            func=merge_building_rows,
+            workers=1,
+            queue_size=pipeline_config.queue_size,
         )
-        for building in buildings:
-            self.buildings_processor.map_building_info_response_to_table_dicts(
-                building_info_response=building
-            )
+        keep_latest = self.buildings_processor.keep_latest_transaction_only
+        fast_row_mappers = pipeline_config.fast_row_mappers
+        map_processes = pipeline_config.map_processes
 
-        # Push to db and clear caches
-        self.buildings_processor.bulk_insert_cache_into_db_tables(
-            config_maps=[self.buildings_processor.zh_table_configs]
+        # Optionally parse and map raw payloads in worker processes, one feeding thread per process.
+        # Spawned, not forked: the db writer and crawl threads may hold locks at fork time
+        with (
+            ProcessPoolExecutor(
+                max_workers=map_processes, mp_context=multiprocessing.get_context("spawn")
+            )
+            if map_processes > 0
+            else nullcontext()
+        ) as executor:
+            if executor:
+                map_func = lambda content: executor.submit(
+                    map_building_payload_to_rows, content, keep_latest, fast_row_mappers
+                ).result()
+            else:
+                # Transactions stored by previous runs are skipped before mapping,
+                # the process pool relies on the dedup at merge instead
+                map_func = lambda content: map_building_payload_to_rows(
+                    content,
+                    keep_latest,
+                    fast_row_mappers,
+                    skip_transaction=lambda tx_id: self.buildings_processor.is_on_disk(
+                        "transactions_cache", (tx_id,)
+                    ),
+                )
+            map_stage = Stage(
+                name="map",
+                func=map_func,
+                workers=map_processes or pipeline_config.parse_workers,
+                queue_size=pipeline_config.queue_size,
+            )
+            # The async engine keeps max_concurrency requests in flight and feeds
+            # raw bodies to the map stage as they finish
+            StagedPipeline(
+                stages=[map_stage, merge_stage],
+                stats_interval=pipeline_config.stats_interval,
+            ).run(
+                self.buildings_crawler.iter_building_contents(
+                    building_ids, buffer_size=pipeline_config.queue_size
+                )
+            )
+        if mapped_building_ids:
+            self._hand_off_buildings(mapped_building_ids, partition_count)
+        housing_logger.info(
+            f"Stage write: {self.db_writer.committed_batches} batches committed, "
+            f"queue depth {self.db_writer.pending}."
         )
-        self.buildings_processor.clear_data_caches(cache_excluded=[])
 
         # Close database sessions
         self.estates_processor.close_session()
         self.buildings_processor.close_session()
+
+    def _hand_off_buildings(self, building_ids: list[str], partition_idx: int) -> None:
+        # Hand off to the db writer together with ledger entries and clear caches
+        self.building_partition_sizer.add_rows(self.buildings_processor.cached_row_count())
+        self.buildings_processor.cache_ledger_entries(
+            cache_name=self.ledger.cache_name,
+            entries=self.ledger.create_ledger_entries(
+                stage="buildings",
+                item_ids=building_ids,
+                partition_idx=partition_idx,
+            ),
+        )
+        self.buildings_processor.upsert_cache_into_db_tables(
+            config_maps=[
+                self.buildings_processor.zh_table_configs,
+                self.ledger.table_configs,
+            ]
+        )
+        self.buildings_processor.clear_data_caches(cache_excluded=[])
@@ -0,0 +1,122 @@
+from typing import Iterator, Optional
+
+from logger import housing_logger
+from utils import get_process_rss
+
+_MB = 1024 * 1024
+
+
+class AdaptivePartitionSizer:
+    """
+    Sizes partitions from a process RSS budget instead of a fixed item count.
+    After each partition the bytes per cached row are measured from the RSS growth,
+    the next partition is sized to fit the remaining headroom: it shrinks when memory
+    is high and grows when there is room, at most halving or doubling per partition.
+    Without a budget the initial size is used for every partition.
+    """
+
+    def __init__(
+        self,
+        initial_size: int,
+        memory_budget_mb: int = 0,
+        high_watermark: float = 0.8,
+        min_size: int = 10,
+        max_size: int = 2000,
+    ):
+        self.size = initial_size
+        self.memory_budget = memory_budget_mb * _MB
+        self.high_watermark = high_watermark
+        self.min_size = min_size
+        self.max_size = max_size
+        self.bytes_per_row: Optional[float] = None
+        self._start_rss = 0
+        self._peak_rss = 0
+        self._row_count = 0
+        self.early_flushes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.memory_budget > 0
+
+    @property
+    def _target_rss(self) -> float:
+        return self.memory_budget * self.high_watermark
+
+    def iter_partitions(self, ids: list[str]) -> Iterator[list[str]]:
+        """
+        Cut ids into partitions as they are consumed, each sized after the previous one
+        """
+        start = 0
+        while start < len(ids):
+            partition = ids[start : start + self.size]
+            start += len(partition)
+            self.start_partition()
+            yield partition
+            self.finish_partition(len(partition))
+
+    def start_partition(self) -> None:
+        """
+        Record the baseline RSS, memory retained from earlier partitions is not counted
+        """
+        self._row_count = 0
+        if self.enabled:
+            self._start_rss = self._peak_rss = get_process_rss()
+
+    def add_rows(self, row_count: int) -> None:
+        """
+        Count rows cached for the current partition, called before each hand-off
+        """
+        self._row_count += row_count
+
+    def is_full(self, item_count: int) -> bool:
+        """
+        Whether the partition holding item_count items should be flushed now,
+        either at the planned size or early when RSS crossed the high watermark
+        """
+        if item_count >= self.size:
+            return True
+        if not self.enabled or item_count == 0:
+            return False
+        rss = get_process_rss()
+        self._peak_rss = max(self._peak_rss, rss)
+        if rss < self._target_rss:
+            return False
+        self.early_flushes += 1
+        housing_logger.warning(
+            f"Process RSS {rss / _MB:.0f} MB above the high watermark, "
+            f"flushing partition early at {item_count} / {self.size} items."
+        )
+        return True
+
+    def finish_partition(self, item_count: int) -> None:
+        """
+        Size the next partition from the rows cached for its item_count items
+        """
+        row_count = self._row_count
+        # Partitions skipped as already committed say nothing about memory
+        if not self.enabled or item_count == 0 or row_count == 0:
+            return
+        rss = get_process_rss()
+        self._peak_rss = max(self._peak_rss, rss)
+        previous_size = self.size
+        if self._peak_rss > self._start_rss:
+            self.bytes_per_row = (self._peak_rss - self._start_rss) / row_count
+
+        if rss >= self._target_rss:
+            next_size = previous_size // 2
+        elif self.bytes_per_row:
+            rows_per_item = row_count / item_count
+            headroom = self._target_rss - self._start_rss
+            next_size = int(headroom / (self.bytes_per_row * rows_per_item))
+            next_size = max(previous_size // 2, min(next_size, previous_size * 2))
+        else:
+            # No measurable growth, memory is not the constraint
+            next_size = previous_size * 2
+        self.size = max(self.min_size, min(next_size, self.max_size))
+
+        if self.size != previous_size:
+            housing_logger.info(
+                f"Partition size {previous_size} -> {self.size}: RSS {rss / _MB:.0f} MB "
+                f"of {self.memory_budget / _MB:.0f} MB budget, "
+                f"{self.bytes_per_row or 0:.0f} bytes per row."
+            )
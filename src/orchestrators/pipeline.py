@@ -0,0 +1,162 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterable, Optional
+
+from logger import housing_logger
+
+_STOP = object()
+
+
+class Stage:
+    """
+    One step of a StagedPipeline, func is applied to each item by workers threads.
+    Returning None drops the item, anything else is passed to the next stage.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[Any], Any],
+        workers: int = 1,
+        queue_size: int = 100,
+    ):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        # Bounded input queue, upstream stages block when this stage falls behind
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.processed = 0
+        self.dropped = 0
+        self.busy_seconds = 0.0
+        self._running_workers = 0
+        self._lock = threading.Lock()
+
+    def stats(self, elapsed: float) -> dict:
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "queue_depth": self.queue.qsize(),
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "items_per_sec": round(self.processed / elapsed, 2) if elapsed else 0.0,
+            # Share of worker time spent in func, close to 1 marks the bottleneck
+            "utilization": round(self.busy_seconds / (elapsed * self.workers), 2)
+            if elapsed
+            else 0.0,
+        }
+
+
+class StagedPipeline:
+    """
+    Producer/consumer pipeline of stages connected by bounded queues.
+    Every stage runs its own worker threads, so network, CPU and disk work overlap.
+    """
+
+    def __init__(self, stages: list[Stage], stats_interval: float = 30.0):
+        self.stages = stages
+        self.stats_interval = stats_interval
+        self._started_at: Optional[float] = None
+        self._error: Optional[BaseException] = None
+        self._failed = threading.Event()
+
+    def run(self, items: Iterable) -> None:
+        """
+        Feed items through all stages, blocks until every item is processed
+        """
+        self._started_at = time.monotonic()
+        threads = []
+        for idx, stage in enumerate(self.stages):
+            stage._running_workers = stage.workers
+            for worker_idx in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._work,
+                    args=(idx,),
+                    name=f"{stage.name}-{worker_idx}",
+                    daemon=True,
+                )
+                thread.start()
+                threads.append(thread)
+
+        feeder = threading.Thread(target=self._feed, args=(items,), daemon=True)
+        feeder.start()
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=self.stats_interval)
+                if thread.is_alive():
+                    self.log_stats()
+        feeder.join()
+        self.log_stats()
+
+        if self._error is not None:
+            raise RuntimeError("Staged pipeline failed.") from self._error
+
+    def stats(self) -> list[dict]:
+        """
+        Per-stage queue depth and throughput since the pipeline started
+        """
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        return [stage.stats(elapsed) for stage in self.stages]
+
+    def log_stats(self) -> None:
+        for stage_stats in self.stats():
+            housing_logger.info(
+                f"Stage {stage_stats['stage']}: {stage_stats['processed']} processed "
+                f"({stage_stats['items_per_sec']}/s), {stage_stats['dropped']} dropped, "
+                f"queue depth {stage_stats['queue_depth']}, "
+                f"utilization {stage_stats['utilization']}."
+            )
+
+    def _feed(self, items: Iterable) -> None:
+        first_stage = self.stages[0]
+        try:
+            for item in items:
+                if self._failed.is_set():
+                    break
+                first_stage.queue.put(item)
+        except Exception as e:
+            # items may be a generator doing I/O, such as the async building crawl
+            housing_logger.error(f"Pipeline source failed: {e}")
+            self._error = e
+            self._failed.set()
+        finally:
+            for _ in range(first_stage.workers):
+                first_stage.queue.put(_STOP)
+
+    def _work(self, stage_idx: int) -> None:
+        stage = self.stages[stage_idx]
+        next_stage = (
+            self.stages[stage_idx + 1] if stage_idx + 1 < len(self.stages) else None
+        )
+        while True:
+            item = stage.queue.get()
+            if item is _STOP:
+                break
+            # Keep draining after a failure so upstream stages never block
+            if self._failed.is_set():
+                continue
+            started_at = time.monotonic()
+            try:
+                result = stage.func(item)
+            except Exception as e:
+                housing_logger.error(f"Stage {stage.name} failed: {e}")
+                self._error = e
+                self._failed.set()
+                continue
+            finally:
+                with stage._lock:
+                    stage.busy_seconds += time.monotonic() - started_at
+            with stage._lock:
+                stage.processed += 1
+                if result is None:
+                    stage.dropped += 1
+            if result is not None and next_stage is not None:
+                next_stage.queue.put(result)
+
+        # Last worker of the stage out signals the next stage to stop
+        with stage._lock:
+            stage._running_workers -= 1
+            last_worker = stage._running_workers == 0
+        if last_worker and next_stage is not None:
+            for _ in range(next_stage.workers):
+                next_stage.queue.put(_STOP)
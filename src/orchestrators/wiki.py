@@ -1,14 +1,14 @@
-from crawlers.wiki import WikiCrawler
-from processors.wiki import WikiProcessor
+from crawlers.wiki import NoHongKongPageError, WikiCrawler
+from processors.wiki import WikiProcessor, WikiPageCache, WikiJsonlWriter
 from models.agency.sql_db import Estate
-from sqlalchemy import create_engine
+from models.wiki.sql_db import Base as WikiBase
 from sqlalchemy.orm import sessionmaker
+from database import get_engine
 from config import housing_datahub_config
 from logger import housing_logger
-import json
 import pathlib
 import asyncio
-from typing import Dict, Any, Optional
+from typing import Dict, Optional
 
 
 class WikiOrchestrator:
@@ -19,8 +19,10 @@ class WikiOrchestrator:
         self.crawler = WikiCrawler()
         self.wiki_processor = WikiProcessor()
         self.estate_list = []
+        self.estate_ids: Dict[str, list[str]] = {}
         self._init_db_connection()
         self._read_estate_list_from_db()
+        self._init_wiki_cache()
 
     def _init_db_connection(self):
         """Initialize database connection to read estate data"""
@@ -33,15 +35,20 @@ class WikiOrchestrator:
                 "sqlite_db", "agency_data.db"
             )
         )
-        self.engine = create_engine(f"sqlite:///{db_path}")
+        # Estates are only read, shares the pooled read-only engine of the agency database
+        self.engine = get_engine(str(db_path), read_only=True)
         Session = sessionmaker(bind=self.engine)
         self.session = Session()
 
     def _read_estate_list_from_db(self):
         """Read estate list from the estates table in the database"""
         try:
-            estates = self.session.query(Estate.estate_name_zh).all()
-            self.estate_list = [estate[0] for estate in estates if estate[0]]
+            estates = self.session.query(Estate.estate_id, Estate.estate_name_zh).all()
+            # Estates sharing a name resolve to the same page, keep all their IDs for the index
+            for estate_id, estate_name in estates:
+                if estate_name:
+                    self.estate_ids.setdefault(estate_name, []).append(estate_id)
+            self.estate_list = list(self.estate_ids)
             housing_logger.info(
                 f"Loaded {len(self.estate_list)} estates from database."
             )
@@ -52,6 +59,15 @@ class WikiOrchestrator:
             # Close the session to free up database connections
             self.session.close()
 
+    def _init_wiki_cache(self):
+        """Open the wiki page cache next to the wiki data files"""
+        cache_engine = get_engine(str(self.wiki_processor.wiki_cache_db_path))
+        WikiBase.metadata.create_all(cache_engine)
+        self.wiki_cache = WikiPageCache(
+            sessionmaker(bind=cache_engine)(),
+            negative_ttl_days=housing_datahub_config.wiki_api.cache.negative_ttl_days,
+        )
+
     def _calculate_partition_size(self, total_estates: int) -> int:
         """Calculate the size of each partition for processing estates."""
         partition_size = total_estates // self.partition_count
@@ -74,70 +90,120 @@ class WikiOrchestrator:
         return self.estate_list[start_idx:end_idx]
 
     async def _process_estate_partition(
-        self, partition_estates: list[str]
-    ) -> Dict[str, Any]:
-        """Process a partition of estates and return the wiki data."""
-        partition_data = {}
+        self, partition_estates: list[str], writer: WikiJsonlWriter
+    ) -> int:
+        """
+        Process a partition of estates and stream the wiki data to writer.
+        Cached pages are reused when their latest revision is unchanged, estates
+        cached without an article are skipped. Title variations of the remaining
+        estates are resolved in bulk, then pages are fetched concurrently,
+        at most max_concurrency in flight at once. Each estate is written as soon
+        as it is processed, the partition is never held in memory.
+        Returns the number of estates written.
+        """
+        cached_titles, missing_estates = self.wiki_cache.lookup_estates(
+            partition_estates
+        )
+        # Only revisions are loaded up front, wiki data is read per unchanged estate
+        cached_revids = self.wiki_cache.get_revids(list(set(cached_titles.values())))
+        latest_revids = await self.crawler.get_latest_revids(list(cached_revids))
+
+        unchanged_count, candidates, unresolved = 0, {}, []
         for estate in partition_estates:
-            try:
-                page_content = self.crawler.get_page_content(estate)
-                if not page_content:
-                    housing_logger.warning(
-                        f"No page content found for estate: {estate}"
-                    )
-                    continue
-
-                # Fetch wikitext for all sections concurrently
-                section_wikitexts = (
-                    await self.crawler.fetch_section_wikitexts_concurrent(page_content)
-                )
+            if estate in missing_estates:
+                continue
+            title = cached_titles.get(estate)
+            if title not in cached_revids or title not in latest_revids:
+                unresolved.append(estate)
+            elif latest_revids[title] == cached_revids[title]:
+                self._write_estate(writer, estate, self.wiki_cache.get_wiki_data(title))
+                unchanged_count += 1
+            else:
+                # Revised since it was cached, fetch the known page again
+                candidates[estate] = [title]
+        revised_count = len(candidates)
+        if unresolved:
+            candidates.update(await self.crawler.resolve_titles(unresolved))
+        housing_logger.info(
+            f"Wiki cache: {unchanged_count} unchanged, "
+            f"{revised_count} revised, {len(unresolved)} to resolve, "
+            f"{len(missing_estates)} without article skipped."
+        )
 
-                # Process the page content with the fetched wikitext data
-                wiki_data = self.wiki_processor.process_page_content(
-                    page_content, section_wikitexts
-                )
+        semaphore = asyncio.Semaphore(
+            housing_datahub_config.wiki_api.crawler.max_concurrency
+        )
 
-                if wiki_data is not None:
-                    partition_data[estate] = wiki_data
-                else:
-                    housing_logger.warning(
-                        f"Failed to process page content for estate: {estate}"
-                    )
+        async def process_estate(estate: str) -> None:
+            if candidates[estate] == []:
+                # Resolved and no article exists, checked again after the TTL
+                self.wiki_cache.put_missing(estate)
+                return
+            async with semaphore:
+                wiki_data = await self._process_estate(estate, candidates[estate])
+            if wiki_data is not None:
+                self._write_estate(writer, estate, wiki_data)
 
-            except Exception as e:
-                housing_logger.error(f"Failed to process estate '{estate}': {e}")
-                continue
+        # Pages and negative entries are committed as each estate is stored
+        await asyncio.gather(*(process_estate(estate) for estate in candidates))
+        return len(writer)
 
-        return partition_data
+    def _write_estate(
+        self, writer: WikiJsonlWriter, estate: str, wiki_data: dict
+    ) -> None:
+        writer.write(estate, self.estate_ids.get(estate, []), wiki_data)
 
-    def _flush_partition_to_local(
-        self, partition_data: Dict[str, Any], partition_idx: int
-    ):
-        """Flush partition data to local storage"""
-        partition_file_path = (
-            self.wiki_processor.wiki_data_storage_path
-            / housing_datahub_config.storage.wiki.files["pages"]
-        ).format(num=partition_idx)
+    async def _process_estate(
+        self, estate: str, candidate_titles: Optional[list[str]] = None
+    ) -> Optional[dict]:
+        """
+        Fetch the page of a single estate, process it into wiki data and cache it.
+        Estates whose candidates are all non-HK pages are cached as without article,
+        failed fetches are not cached and retried on the next run.
+        """
         try:
-            with open(partition_file_path, "w", encoding="utf-8") as f:
-                json.dump(partition_data, f, ensure_ascii=False, indent=4)
-            housing_logger.info(
-                f"Successfully flushed partition {partition_idx} to {partition_file_path}"
+            page_content = await self.crawler.get_page_content(
+                estate, candidate_titles
             )
-        except Exception as e:
-            housing_logger.error(
-                f"Failed to flush partition {partition_idx} to local: {e}"
+            if not page_content:
+                housing_logger.warning(f"No page content found for estate: {estate}")
+                return None
+
+            # Sections were split from the page wikitext, no request per section
+            section_wikitexts = page_content.section_wikitexts()
+
+            # Process the page content with the fetched wikitext data
+            wiki_data = self.wiki_processor.process_page_content(
+                page_content, section_wikitexts
             )
+            if wiki_data is None:
+                housing_logger.warning(
+                    f"Failed to process page content for estate: {estate}"
+                )
+            else:
+                self.wiki_cache.put_page(estate, page_content, wiki_data)
+            return wiki_data
+
+        except NoHongKongPageError:
+            # No candidate qualified, checked again after the TTL
+            self.wiki_cache.put_missing(estate)
+            return None
+        except Exception as e:
+            housing_logger.error(f"Failed to process estate '{estate}': {e}")
+            return None
 
-    async def _fetch_estate_wiki_data_async(self) -> Dict[str, Any]:
-        """Asynchronously fetch Wikipedia data for all estates using partitioned processing."""
-        estate_wiki_data = {}
+    async def _fetch_estate_wiki_data_async(self) -> int:
+        """
+        Asynchronously fetch Wikipedia data for all estates using partitioned processing.
+        Each partition is streamed to its own JSONL file, returns the number of estates written.
+        """
         housing_logger.info(
             f"Starting to fetch wiki data for {len(self.estate_list)} estates."
         )
 
         total_estates = len(self.estate_list)
         partition_size = self._calculate_partition_size(total_estates)
+        successful_count = 0
 
         for partition_idx in range(self.partition_count):
             partition_estates = self._get_partition_estates(
@@ -148,23 +214,27 @@ class WikiOrchestrator:
                 f"Processing partition {partition_idx + 1}/{self.partition_count} with {len(partition_estates)} estates."
             )
 
-            partition_data = await self._process_estate_partition(partition_estates)
-
-            # Flush partition data to local storage
-            if partition_data:
-                self._flush_partition_to_local(partition_data, partition_idx)
-                estate_wiki_data.update(partition_data)
+            partition_file_path = self.wiki_processor.get_partition_file_path(
+                partition_idx
+            )
+            with WikiJsonlWriter(
+                partition_file_path,
+                compression=housing_datahub_config.storage.wiki.compression,
+            ) as writer:
+                successful_count += await self._process_estate_partition(
+                    partition_estates, writer
+                )
 
-            housing_logger.info(f"Partition {partition_idx + 1} processed and flushed.")
+            housing_logger.info(
+                f"Partition {partition_idx + 1} processed and written to {partition_file_path}."
+            )
 
-        successful_count = len(estate_wiki_data)
-        total_count = len(self.estate_list)
         housing_logger.info(
-            f"Successfully processed {successful_count}/{total_count} estates."
+            f"Successfully processed {successful_count}/{total_estates} estates."
         )
-        return estate_wiki_data
+        return successful_count
 
-    def _fetch_estate_wiki_data(self) -> Dict[str, Any]:
+    def _fetch_estate_wiki_data(self) -> int:
         """Synchronous wrapper for async method."""
         try:
             # Create a new event loop if one doesn't exist
@@ -183,25 +253,24 @@ class WikiOrchestrator:
 
         except Exception as e:
             housing_logger.error(f"Failed to fetch estate wiki data: {e}")
-            return {}
+            return 0
 
-    def run_estate_wiki_data_pipeline(self) -> Optional[Dict[str, Any]]:
-        """Run the complete Wikipedia data pipeline for estates."""
+    def run_estate_wiki_data_pipeline(self) -> Optional[int]:
+        """
+        Run the complete Wikipedia data pipeline for estates.
+        Wiki data is written per partition as JSONL with an offset index,
+        returns the number of estates written.
+        """
         try:
-            wiki_data = self._fetch_estate_wiki_data()
-            if not wiki_data:
+            estate_count = self._fetch_estate_wiki_data()
+            if not estate_count:
                 housing_logger.warning("No wiki data was successfully fetched")
                 return None
-
-            # Save the complete aggregated data
-            with open(
-                self.wiki_processor.wiki_data_file_path, "w", encoding="utf-8"
-            ) as f:
-                json.dump(wiki_data, f, ensure_ascii=False, indent=4)
             housing_logger.info(
-                f"Successfully saved complete wiki data to {self.wiki_processor.wiki_data_file_path}"
+                f"Successfully saved wiki data of {estate_count} estates to "
+                f"{self.wiki_processor.wiki_data_storage_path}"
             )
-            return wiki_data
+            return estate_count
 
         except Exception as e:
             housing_logger.error(f"Failed to run wiki data pipeline: {e}")
@@ -1,2 +1,5 @@
 from .estates import EstatesProcessor
-from .buildings import BuildingsProcessor
\ No newline at end of file
+from .buildings import BuildingsProcessor, map_building_payload_to_rows
+from .ledger import CrawlLedger
+from .db_writer import DbWriter
+from .compact_schema import CompactSchemaMigrator
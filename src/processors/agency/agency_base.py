@@ -2,12 +2,23 @@ from ..base import BaseProcessor
 from config import housing_datahub_config
 from logger import housing_logger
 from abc import abstractmethod
-from sqlalchemy import create_engine, text
+from database import get_engine
 import os
 import json
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import sessionmaker
+from typing import Optional, Union
 from models.agency.sql_db import Base
+from .db_writer import DbWriter, WriteBatch, execute_write_batch
+from .pk_index import PkIndex
+from ..columnar import ColumnarBuffer
+from sqlalchemy import and_, func, select
 
+# Dialect specific insert constructs supporting ON CONFLICT
+DIALECT_INSERTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
 
 class AgencyProcessor(BaseProcessor):
     def __init__(self):
@@ -16,6 +27,10 @@ class AgencyProcessor(BaseProcessor):
         self._init_sql_db()
         # Primary key map for upsert operations
         self.pk_map = {}
+        # Background writer shared by processors, writes run inline when not set
+        self.db_writer: Optional[DbWriter] = None
+        # Primary keys already stored in the database, per seeded cache
+        self.on_disk_pks: dict[str, Union[set[tuple], PkIndex]] = {}
 
     @abstractmethod
     def _create_tables(self):
@@ -42,6 +57,8 @@ class AgencyProcessor(BaseProcessor):
                 "estate_ids", "estate_ids.txt"
             )
         )
+        # Staging area for cache rows spilled to disk, stale segments are removed by the orchestrator
+        self.staging_path = self.agency_data_storage_path / "staging"
 
     def _init_sql_db(self) -> None:
         """
@@ -54,12 +71,9 @@ class AgencyProcessor(BaseProcessor):
             )
         )
         self.remote_db_path = None  # To be set for remote DBs like Neon
-        self.engine = create_engine(f"sqlite:///{self.local_db_path}")
-        # Enable WAL mode for better concurrency
-        with self.engine.connect() as conn:
-            conn.execute(text("PRAGMA journal_mode=WAL;"))
-            housing_logger.info("Enabled WAL journal mode for SQLite database.")
-            conn.commit()
+        # Pooled engines shared by all processors, reads that never write use the read-only one
+        self.engine = get_engine(str(self.local_db_path))
+        self.read_engine = get_engine(str(self.local_db_path), read_only=True)
         Session = sessionmaker(bind=self.engine)
         self.session = Session()
 
@@ -73,31 +87,189 @@ class AgencyProcessor(BaseProcessor):
         for cache_name, data_list in self.caches.items():
             output_file_path = os.path.join(output_directory, f"{cache_name}.json")
             with open(output_file_path, "w", encoding="utf-8") as f:
-                json.dump(data_list, f, ensure_ascii=False, indent=4)
+                # Columnar buffers yield their rows as dicts, dates are written as strings
+                json.dump(list(data_list), f, ensure_ascii=False, indent=4, default=str)
             housing_logger.info(f"Exported {cache_name} to {output_file_path}.")
 
 
-    def bulk_insert_cache_into_db_tables(self, config_maps: list[dict] = None) -> None:
+    def upsert_cache_into_db_tables(
+        self,
+        config_maps: list[dict] = None,
+        insert_only_caches: Optional[set[str]] = None,
+    ) -> None:
         """
-        Bulk insert cached data into database tables without upsert
-        Suitable for tables where duplicates are not a concern
+        Upsert cached data into database tables, one INSERT ... ON CONFLICT executemany per table
+        Conflicts are resolved on pk_map, falling back to the table primary key,
+        so repeated runs update existing rows instead of failing.
+        Caches in insert_only_caches only add new rows, existing rows are left untouched.
+        All tables are written in a single transaction, handed off to the db writer if attached.
         """
-        housing_logger.info("Bulk inserting cached data into database tables.")
-        total_inserted = 0
+        batch: WriteBatch = []
+        total_upserted = 0
 
         for table_config in config_maps:
             for cache_name, (_, db_table_class) in table_config.items():
                 data_list = self.caches.get(cache_name, [])
                 if not data_list:
                     continue
-                objects = [db_table_class(**data) for data in data_list]
-                self.session.bulk_save_objects(objects)
-                housing_logger.debug(
-                    f"{len(data_list)} records to be inserted into {db_table_class.__tablename__}."
+                pk_columns = self.pk_map.get(cache_name) or [
+                    column.name for column in db_table_class.__table__.primary_key
+                ]
+                batch.append(
+                    (
+                        self._build_upsert_statement(
+                            db_table_class,
+                            data_list,
+                            pk_columns,
+                            update=cache_name not in (insert_only_caches or ()),
+                        ),
+                        data_list,
+                    )
                 )
-                total_inserted += len(data_list)
+                total_upserted += len(data_list)
+        self._write(batch)
+        # Rows of these caches are handed off, their keys no longer need to be kept exactly
+        for table_config in config_maps:
+            for cache_name in table_config:
+                if cache_name in self.pk_sets:
+                    self.pk_sets[cache_name].hand_off()
+        housing_logger.info(f"Bulk data upsert of {total_upserted} records handed off.")
+
+    def _build_upsert_statement(
+        self,
+        db_table_class: type,
+        rows: list[dict],
+        pk_columns: list[str],
+        update: bool = True,
+    ):
+        """
+        Build INSERT ... ON CONFLICT DO UPDATE for rows, executed as a single executemany
+        Rows must share the same keys, as produced by the table models
+        Without update, conflicting rows are skipped with DO NOTHING
+        """
+        dialect_insert = DIALECT_INSERTS.get(self.engine.dialect.name)
+        if dialect_insert is None:
+            raise NotImplementedError(
+                f"Upsert is not supported for {self.engine.dialect.name} databases."
+            )
+        stmt = dialect_insert(db_table_class.__table__)
+        update_columns = [column for column in rows[0] if column not in pk_columns]
+        if update and update_columns:
+            return stmt.on_conflict_do_update(
+                index_elements=pk_columns,
+                set_={column: stmt.excluded[column] for column in update_columns},
+            )
+        return stmt.on_conflict_do_nothing(index_elements=pk_columns)
+
+    def _write(self, batch: WriteBatch) -> None:
+        """
+        Commit a batch of statements in one transaction, on the db writer if attached
+        """
+        if not batch:
+            return
+        if self.db_writer:
+            self.db_writer.submit(batch)
+            return
+        execute_write_batch(self.session, batch)
         self.session.commit()
-        housing_logger.info(f"Bulk data insertion completed, {total_inserted} records inserted.")
+
+    def flush_writes(self) -> None:
+        """
+        Wait for handed off writes and start a fresh read transaction to see them
+        """
+        if self.db_writer:
+            self.db_writer.flush()
+        self.session.commit()
+
+    def _seed_on_disk_pks(self, cache_name: str, db_table_class: type) -> None:
+        """
+        Stream the primary keys stored in db_table_class into a read-only index,
+        rows already on disk are then skipped before mapping and writing.
+        Tables up to on_disk_pks_exact_limit rows are kept as an exact set, answered without
+        the database; larger ones as hashes, a hash hit is confirmed with a point query.
+        """
+        pk_columns = self.pk_map[cache_name]
+        table = db_table_class.__table__
+        exact_limit = housing_datahub_config.storage.agency.settings.get(
+            "on_disk_pks_exact_limit", 500_000
+        )
+        with self.read_engine.connect() as conn:
+            row_count = conn.execute(select(func.count()).select_from(table)).scalar()
+            if row_count <= exact_limit:
+                on_disk_pks = set()
+                seed = on_disk_pks.update
+            else:
+                on_disk_pks = PkIndex(
+                    exists_in_db=self._make_on_disk_lookup(table, pk_columns),
+                    initial_capacity=int(row_count / PkIndex._max_load) + 1,
+                )
+                seed = on_disk_pks.seed
+            # Selecting only PK columns is answered from the primary key index
+            result = conn.execution_options(stream_results=True, yield_per=50_000).execute(
+                select(*(table.c[column] for column in pk_columns))
+            )
+            for partition in result.partitions():
+                seed(tuple(row) for row in partition)
+        self.on_disk_pks[cache_name] = on_disk_pks
+        housing_logger.info(
+            f"Seeded {len(on_disk_pks)} primary keys of {table.name} from database."
+        )
+
+    def _make_on_disk_lookup(self, table, pk_columns: list[str]):
+        def exists_in_db(pk_tuple: tuple) -> bool:
+            # Pooled read-only connection per lookup, safe to call from mapping threads
+            condition = and_(
+                *(table.c[column] == value for column, value in zip(pk_columns, pk_tuple))
+            )
+            with self.read_engine.connect() as conn:
+                return (
+                    conn.execute(select(1).select_from(table).where(condition).limit(1)).first()
+                    is not None
+                )
+
+        return exists_in_db
+
+    def is_on_disk(self, cache_name: str, pk_tuple: tuple) -> bool:
+        """
+        Whether the row was stored by a previous run, thread safe
+        """
+        on_disk_pks = self.on_disk_pks.get(cache_name)
+        return on_disk_pks is not None and pk_tuple in on_disk_pks
+
+    def _claim_pk(self, cache_name: str, pk_tuple: tuple) -> bool:
+        """
+        Register pk_tuple for cache_name, False if the row is a duplicate within the run or already on disk
+        """
+        if pk_tuple in self.pk_sets[cache_name] or self.is_on_disk(cache_name, pk_tuple):
+            return False
+        self.pk_sets[cache_name].add(pk_tuple)
+        return True
+
+    def _create_cache_buffer(self, table_model: type) -> ColumnarBuffer:
+        """
+        Columnar cache for rows of table_model, spilled to the staging area past the configured size
+        """
+        return ColumnarBuffer.for_model(
+            table_model,
+            spill_rows=housing_datahub_config.storage.agency.settings.get(
+                "cache_spill_rows", 0
+            ),
+            spill_dir=self.staging_path,
+        )
+
+    def cached_row_count(self) -> int:
+        """
+        Number of table rows waiting in the columnar caches
+        """
+        return sum(
+            len(cache) for cache in self.caches.values() if isinstance(cache, ColumnarBuffer)
+        )
+
+    def cache_ledger_entries(self, cache_name: str, entries: list[dict]) -> None:
+        """
+        Queue crawl ledger entries to be committed together with the cached data
+        """
+        self.caches.setdefault(cache_name, []).extend(entries)
 
     def close_session(self) -> None:
         """Close the database session"""
@@ -112,4 +284,6 @@ class AgencyProcessor(BaseProcessor):
         housing_logger.info("Cleaning local SQLite database.")
         Base.metadata.drop_all(self.engine)
         Base.metadata.create_all(self.engine)
+        # Nothing is on disk anymore
+        self.on_disk_pks = {}
         housing_logger.info("Local SQLite database cleaned and tables recreated.")
@@ -1,10 +1,15 @@
-from typing import Optional
+from collections import defaultdict
+from typing import Callable, Optional
 from logger import housing_logger
 from time import time
+from utils import parse_content
+import json
 
 from .agency_base import AgencyProcessor
+from .pk_index import PkIndex
 from models.agency.responses import (
     BuildingInfoResponse,
+    DistrictTransactionRecord,
     IdNameOnlyField,
 )
 from models.agency.responses import (
@@ -19,6 +24,7 @@ from models.agency.outputs import (
     UnitInfoModel,
 )
 from models.agency.sql_db import Base, Transactions, Unit, UnitFeature
+from .row_mappers import map_building_json_to_rows
 
 
 class BuildingsProcessor(AgencyProcessor):
@@ -36,136 +42,91 @@ class BuildingsProcessor(AgencyProcessor):
             "unit_features_cache": ["unit_id", "feature_id"],
             "transactions_cache": ["tx_id"],
         }
+        # Caches whose stored rows change over time, always written again
+        self.refreshed_caches = {"units_cache"}
         self._create_data_cache()
         # Create tables if not exist
         self._create_tables()
-        # Initialize persistent PK sets for deduplication across partitions
+        # Initialize persistent PK indexes for deduplication across partitions
         self._init_pk_sets()
 
     def _create_data_cache(self):
-        for cache_name in self.zh_table_configs.keys():
-            self.caches[cache_name] = []
-        for cache_name in self.table_configs.keys():
-            self.caches[cache_name] = []
+        # Table rows are buffered column by column
+        for cache_name, (table_model, _) in self.zh_table_configs.items():
+            self.caches[cache_name] = self._create_cache_buffer(table_model)
+        for cache_name, (table_model, _) in self.table_configs.items():
+            self.caches[cache_name] = self._create_cache_buffer(table_model)
 
     def _create_tables(self):
         Base.metadata.create_all(self.engine)
 
     def _init_pk_sets(self):
-        """Initialize persistent PK sets for deduplication across partitions"""
+        """Initialize persistent PK indexes for deduplication across partitions"""
         self.pk_sets = {}
-        for cache_name in self.zh_table_configs.keys():
-            self.pk_sets[cache_name] = set()
+        for cache_name, (_, db_table_class) in self.zh_table_configs.items():
+            self.pk_sets[cache_name] = PkIndex()
+            # Units are refined by later transactions, their upserts keep them current
+            if cache_name not in self.refreshed_caches:
+                self._seed_on_disk_pks(cache_name, db_table_class)
 
     def map_building_info_response_to_table_dicts(
         self, building_info_response: BuildingInfoResponse
     ) -> None:
-        building_id = building_info_response.building.id
-        if not building_id:
-            housing_logger.error(
-                "Building ID is missing in the building info response."
+        self.merge_table_rows(
+            map_building_info_response_to_rows(
+                building_info_response=building_info_response,
+                keep_latest_transaction_only=self.keep_latest_transaction_only,
             )
-            return
-        for unit_info in building_info_response.data:
-            if not unit_info.unit_id:
-                continue
-
-            # Get unit transactions
-            unit_features_data = self._map_transactions_to_table_dicts(
-                transactions=unit_info.transactions,
-                unit_id=unit_info.unit_id,
-            )
-            # Get unit info
-            self._map_unit_info_to_table_dicts(
-                building_id=building_id,
-                unit_info=unit_info,
-                unit_features_data=unit_features_data,
-            )
-            # Get unit features
-            if unit_features_data.features:
-                self._map_unit_features_to_table_dicts(
-                    unit_id=unit_info.unit_id,
-                    unit_features=unit_features_data.features,
-                )
+        )
 
-    def _map_transactions_to_table_dicts(
-        self,
-        transactions: list[TransactionsDetailField],
-        unit_id: str,
-    ) -> "UnitFeaturesFromTransactions":
+    def map_district_transaction_records_to_table_dicts(
+        self, records: list[DistrictTransactionRecord]
+    ) -> None:
         """
-        Map transaction to TransactionsDetailModel
-        If keep_latest_transaction_only is True, only keep the latest transaction per unit
+        Map district feed transactions to table dicts
+        Records are regrouped into building info responses, so units, features and
+        transactions are mapped exactly as in the building crawl
         """
-        unit_features, bedroom, sitting_room = None, None, None
-        if self.keep_latest_transaction_only:
-            # Sort transactions by tx_date descending and take the first (latest)
-            sorted_transactions = sorted(transactions, key=lambda t: t.tx_date, reverse=True)
-            transactions = [sorted_transactions[0]] if sorted_transactions else transactions
-
-        for transaction in transactions:
-            # Get unit features from transactions info
-            # Keep overwriting bedroom and sitting_room if multiple transactions exist, in case renovation
-            unit_features = transaction.feature
-            bedroom = (
-                transaction.bedroom if transaction.bedroom is not None else bedroom
-            )
-            sitting_room = (
-                transaction.sitting_room
-                if transaction.sitting_room is not None
-                else sitting_room
+        buildings: dict[str, IdNameOnlyField] = {}
+        units_by_building: dict[str, dict[str, UnitInfoField]] = defaultdict(dict)
+        for record in records:
+            if not (record.building and record.building.id and record.unit_id):
+                continue
+            if record.floor is None or record.flat is None:
+                continue
+            buildings[record.building.id] = record.building
+            units = units_by_building[record.building.id]
+            if record.unit_id not in units:
+                units[record.unit_id] = UnitInfoField(
+                    unit_id=record.unit_id,
+                    floor=record.floor,
+                    flat=record.flat,
+                    area=record.area,
+                    net_area=record.net_area,
+                )
+            units[record.unit_id].transactions.append(
+                TransactionsDetailField.model_validate(record, from_attributes=True)
             )
-            parsed_transaction = TransactionsDetailModel.from_response(
-                unit_id=unit_id, response=transaction
+
+        for building_id, units in units_by_building.items():
+            self.map_building_info_response_to_table_dicts(
+                building_info_response=BuildingInfoResponse.model_validate(
+                    {"building": buildings[building_id], "data": list(units.values())},
+                    from_attributes=True,
+                )
             )
-            tx_dict = parsed_transaction.model_dump()
-            pk_tuple = tuple(tx_dict[key] for key in self.pk_map["transactions_cache"])
-            if pk_tuple not in self.pk_sets["transactions_cache"]:
-                self.pk_sets["transactions_cache"].add(pk_tuple)
-                self.caches["transactions_cache"].append(tx_dict)
-        return UnitFeaturesFromTransactions(
-            features=unit_features, bedroom=bedroom, sitting_room=sitting_room
-        )
 
-    def _map_unit_info_to_table_dicts(
-        self,
-        building_id: str,
-        unit_info: UnitInfoField,
-        unit_features_data: "UnitFeaturesFromTransactions",
-    ) -> None:
-        """
-        Map unit info to UnitInfoModel
-        """
-        unit_info_model = UnitInfoModel.from_response(
-            response=unit_info,
-            building_id=building_id,
-            bedroom=unit_features_data.bedroom,
-            sitting_room=unit_features_data.sitting_room,
-        ).model_dump()
-        if unit_info_model:
-            pk_tuple = tuple(unit_info_model[key] for key in self.pk_map["units_cache"])
-            if pk_tuple not in self.pk_sets["units_cache"]:
-                self.pk_sets["units_cache"].add(pk_tuple)
-                self.caches["units_cache"].append(unit_info_model)
-
-    def _map_unit_features_to_table_dicts(
-        self,
-        unit_id: str,
-        unit_features: Optional[list[IdNameOnlyField]],
-    ) -> None:
+    def merge_table_rows(self, rows: dict[str, list[dict]]) -> None:
         """
-        Map unit features to UnitFeaturesModel
+        Merge mapped rows into the caches, deduplicated by PK across partitions and runs
         """
-        for feature in unit_features:
-            # Unit Features: IDs are english names
-            feature_dict = UnitFeaturesModel.from_response(
-                unit_id=unit_id, response=feature
-            ).model_dump()
-            pk_tuple = tuple(feature_dict[key] for key in self.pk_map["unit_features_cache"])
-            if pk_tuple not in self.pk_sets["unit_features_cache"]:
-                self.pk_sets["unit_features_cache"].add(pk_tuple)
-                self.caches["unit_features_cache"].append(feature_dict)
-
+        for cache_name, cache_rows in rows.items():
+            pk_columns = self.pk_map[cache_name]
+            cache = self.caches[cache_name]
+            for row in cache_rows:
+                pk_tuple = tuple(row[key] for key in pk_columns)
+                if self._claim_pk(cache_name, pk_tuple):
+                    cache.append(row)
 
 class UnitFeaturesFromTransactions(SingleLanguageBaseModel):
     """
@@ -175,3 +136,126 @@ class UnitFeaturesFromTransactions(SingleLanguageBaseModel):
     features: Optional[list[IdNameOnlyField]]
     bedroom: Optional[int]
     sitting_room: Optional[int]
+
+
+# Pure mapping functions, importable by process pool workers -------------------
+
+
+def map_building_payload_to_rows(
+    content: bytes,
+    keep_latest_transaction_only: bool = False,
+    fast_row_mappers: bool = False,
+    skip_transaction: Optional[Callable[[str], bool]] = None,
+) -> Optional[tuple[str, dict[str, list[dict]]]]:
+    """
+    Parse a raw building transaction info body and map it to table rows
+    Returns the building ID with rows per cache, PK dedup is left to the parent process.
+    With fast_row_mappers, rows are mapped straight from the decoded JSON by compiled mappers,
+    payloads they cannot handle fall back to the pydantic path.
+    Transactions for which skip_transaction returns True are not mapped to rows.
+    """
+    if fast_row_mappers:
+        try:
+            return map_building_json_to_rows(
+                data=json.loads(content),
+                keep_latest_transaction_only=keep_latest_transaction_only,
+                skip_transaction=skip_transaction,
+            )
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            housing_logger.debug(f"Fast row mapping failed, using pydantic path: {e}")
+    building_info_response = parse_content(content=content, model=BuildingInfoResponse)
+    if not building_info_response:
+        return None
+    return building_info_response.building.id, map_building_info_response_to_rows(
+        building_info_response=building_info_response,
+        keep_latest_transaction_only=keep_latest_transaction_only,
+        skip_transaction=skip_transaction,
+    )
+
+
+def map_building_info_response_to_rows(
+    building_info_response: BuildingInfoResponse,
+    keep_latest_transaction_only: bool = False,
+    skip_transaction: Optional[Callable[[str], bool]] = None,
+) -> dict[str, list[dict]]:
+    """
+    Map building info response to rows of units, unit features and transactions
+    """
+    rows = {"units_cache": [], "unit_features_cache": [], "transactions_cache": []}
+    building_id = building_info_response.building.id
+    if not building_id:
+        housing_logger.error(
+            "Building ID is missing in the building info response."
+        )
+        return rows
+    for unit_info in building_info_response.data:
+        if not unit_info.unit_id:
+            continue
+
+        # Get unit transactions
+        unit_features_data = _map_transactions_to_rows(
+            transactions=unit_info.transactions,
+            unit_id=unit_info.unit_id,
+            keep_latest_transaction_only=keep_latest_transaction_only,
+            rows=rows["transactions_cache"],
+            skip_transaction=skip_transaction,
+        )
+        # Get unit info
+        rows["units_cache"].append(
+            UnitInfoModel.from_response(
+                response=unit_info,
+                building_id=building_id,
+                bedroom=unit_features_data.bedroom,
+                sitting_room=unit_features_data.sitting_room,
+            ).model_dump()
+        )
+        # Get unit features, IDs are english names
+        for feature in unit_features_data.features or []:
+            rows["unit_features_cache"].append(
+                UnitFeaturesModel.from_response(
+                    unit_id=unit_info.unit_id, response=feature
+                ).model_dump()
+            )
+    return rows
+
+
+def _map_transactions_to_rows(
+    transactions: list[TransactionsDetailField],
+    unit_id: str,
+    keep_latest_transaction_only: bool,
+    rows: list[dict],
+    skip_transaction: Optional[Callable[[str], bool]] = None,
+) -> UnitFeaturesFromTransactions:
+    """
+    Map transactions to TransactionsDetailModel rows
+    If keep_latest_transaction_only is True, only keep the latest transaction per unit
+    Skipped transactions still provide the unit features, bedroom and sitting_room
+    """
+    unit_features, bedroom, sitting_room = None, None, None
+    if keep_latest_transaction_only:
+        # Sort transactions by tx_date descending and take the first (latest)
+        sorted_transactions = sorted(transactions, key=lambda t: t.tx_date, reverse=True)
+        transactions = [sorted_transactions[0]] if sorted_transactions else transactions
+
+    for transaction in transactions:
+        # Get unit features from transactions info
+        # Keep overwriting bedroom and sitting_room if multiple transactions exist, in case renovation
+        unit_features = transaction.feature
+        bedroom = transaction.bedroom if transaction.bedroom is not None else bedroom
+        sitting_room = (
+            transaction.sitting_room
+            if transaction.sitting_room is not None
+            else sitting_room
+        )
+        if skip_transaction is not None and skip_transaction(transaction.id):
+            continue
+        rows.append(
+            TransactionsDetailModel.from_response(
+                unit_id=unit_id, response=transaction
+            ).model_dump()
+        )
+    # from_attributes accepts features decoded as structs as well as pydantic models
+    return UnitFeaturesFromTransactions.model_validate(
+        {"features": unit_features, "bedroom": bedroom, "sitting_room": sitting_room},
+        from_attributes=True,
+    )
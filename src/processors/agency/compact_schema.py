@@ -0,0 +1,318 @@
+import os
+import sqlite3
+import time
+
+from sqlalchemy import Boolean, DateTime, Float, Integer, String, Table
+
+from logger import housing_logger
+from models.agency.sql_db import Base
+
+# Prefix of the compact tables, views with the original table names read from them
+COMPACT_PREFIX = "compact_"
+# Float columns holding money, stored as integer cents when every value has at most two decimals
+MONEY_MARKERS = ("price", "amount", "rent")
+PRICE_SCALE = 100
+# Dates are stored as unix microseconds, SQLAlchemy writes them as "YYYY-MM-DD HH:MM:SS.ffffff"
+_TO_MICROS = "CAST(strftime('%s', t.{name}) AS INTEGER) * 1000000 + CAST(substr(t.{name}, 21, 6) AS INTEGER)"
+_MICROS_PART = "((c.{name} % 1000000 + 1000000) % 1000000)"
+_FROM_MICROS = (
+    "strftime('%Y-%m-%d %H:%M:%S', (c.{name} - " + _MICROS_PART + ") / 1000000, 'unixepoch')"
+    " || printf('.%06d', " + _MICROS_PART + ")"
+)
+
+# Representative analytics join: transactions per estate through units and buildings
+_BENCHMARK_JOIN = """
+SELECT b.estate_id, COUNT(*), AVG(t.price)
+FROM {transactions} t
+JOIN {units} u ON u.unit_id = t.unit_id
+JOIN {buildings} b ON b.building_id = u.building_id
+GROUP BY b.estate_id
+"""
+
+
+# String keys referenced by foreign keys, the ones joins run on
+_REFERENCED_KEYS = {
+    foreign_key.column.name
+    for table in Base.metadata.sorted_tables
+    for column in table.columns
+    for foreign_key in column.foreign_keys
+}
+
+
+def _is_id_column(column) -> bool:
+    """
+    Join keys get integer surrogates, leaf IDs like tx_id are unique per row
+    and would only be stored twice through the dictionary
+    """
+    return isinstance(column.type, String) and column.name in _REFERENCED_KEYS
+
+
+def _is_money_column(column) -> bool:
+    return isinstance(column.type, Float) and any(
+        marker in column.name for marker in MONEY_MARKERS
+    )
+
+
+def _compact_type(column, scaled: bool = False) -> str:
+    if _is_id_column(column) or scaled:
+        return "INTEGER"
+    if isinstance(column.type, (Integer, Boolean, DateTime)):
+        return "INTEGER"
+    if isinstance(column.type, Float):
+        return "REAL"
+    return "TEXT"
+
+
+class CompactSchemaMigrator:
+    """
+    Converts an agency database into the compact schema, a read-optimized copy:
+    string IDs become integer surrogate keys resolved through the id_dictionary table,
+    dates become unix microseconds and money columns integer cents, when every stored
+    value converts back exactly; money columns with fractional cents like the per
+    square foot averages stay REAL.
+    Tables with composite or text keys are created WITHOUT ROWID, single integer keys alias the rowid.
+    Views named like the original tables expose the original columns and formats,
+    so existing queries run unchanged against the compact database.
+    """
+
+    def __init__(self, source_path: str, target_path: str):
+        self.source_path = str(source_path)
+        self.target_path = str(target_path)
+        self.tables: list[Table] = list(Base.metadata.sorted_tables)
+        # (table, column) of money columns stored as integer cents, found by migrate()
+        self.scaled_columns: set[tuple[str, str]] = set()
+
+    def migrate(self) -> None:
+        """
+        Build the compact database next to the target path and move it into place
+        """
+        if not os.path.exists(self.source_path):
+            raise FileNotFoundError(f"Source database not found: {self.source_path}")
+        building_path = f"{self.target_path}.building"
+        if os.path.exists(building_path):
+            os.remove(building_path)
+
+        started_at = time.monotonic()
+        conn = sqlite3.connect(f"file:{building_path}", uri=True)
+        try:
+            conn.execute("PRAGMA journal_mode=OFF;")
+            conn.execute("PRAGMA synchronous=OFF;")
+            conn.execute("ATTACH DATABASE ? AS src;", (f"file:{self.source_path}?mode=ro",))
+            source_tables = {
+                row[0]
+                for row in conn.execute(
+                    "SELECT name FROM src.sqlite_master WHERE type = 'table';"
+                )
+            }
+            self.scaled_columns = self._find_scaled_columns(conn, source_tables)
+            conn.execute(
+                "CREATE TABLE id_dictionary (id INTEGER PRIMARY KEY, value TEXT NOT NULL UNIQUE);"
+            )
+            with conn:
+                for table in self.tables:
+                    if table.name not in source_tables:
+                        housing_logger.warning(
+                            f"Table {table.name} not in source database, created empty."
+                        )
+                    self._create_compact_table(conn, table)
+                    if table.name in source_tables:
+                        self._copy_table(conn, table)
+                    self._create_view(conn, table)
+            conn.execute("DETACH DATABASE src;")
+            conn.execute("VACUUM;")
+        finally:
+            conn.close()
+        os.replace(building_path, self.target_path)
+        housing_logger.info(
+            f"Migrated {self.source_path} to compact schema at {self.target_path} "
+            f"in {time.monotonic() - started_at:.1f} seconds."
+        )
+
+    def verify(self) -> dict[str, int]:
+        """
+        Rows differing between each source table and its view in the compact database,
+        compared with EXCEPT in both directions; all zero when the migration is lossless
+        """
+        conn = sqlite3.connect(f"file:{self.target_path}?mode=ro", uri=True)
+        try:
+            conn.execute("ATTACH DATABASE ? AS src;", (f"file:{self.source_path}?mode=ro",))
+            source_tables = {
+                row[0]
+                for row in conn.execute(
+                    "SELECT name FROM src.sqlite_master WHERE type = 'table';"
+                )
+            }
+            differences = {}
+            for table in self.tables:
+                if table.name not in source_tables:
+                    continue
+                columns = ", ".join(column.name for column in table.columns)
+                source_select = f"SELECT {columns} FROM src.{table.name}"
+                view_select = f"SELECT {columns} FROM main.{table.name}"
+                differences[table.name] = sum(
+                    conn.execute(f"SELECT COUNT(*) FROM ({left} EXCEPT {right});").fetchone()[0]
+                    for left, right in (
+                        (source_select, view_select),
+                        (view_select, source_select),
+                    )
+                )
+        finally:
+            conn.close()
+        mismatched_tables = [name for name, count in differences.items() if count]
+        if mismatched_tables:
+            housing_logger.error(
+                f"Compact schema differs from source in tables: {', '.join(mismatched_tables)}."
+            )
+        return differences
+
+    def benchmark(self, repeat: int = 5) -> dict:
+        """
+        File size and best-of-repeat latency of the transactions-per-estate join,
+        on the source tables and on the compact tables
+        """
+        source_join = _BENCHMARK_JOIN.format(
+            transactions="transactions", units="units", buildings="buildings"
+        )
+        compact_join = _BENCHMARK_JOIN.format(
+            transactions=f"{COMPACT_PREFIX}transactions",
+            units=f"{COMPACT_PREFIX}units",
+            buildings=f"{COMPACT_PREFIX}buildings",
+        )
+        results = {
+            "source_bytes": self._database_bytes(self.source_path),
+            "compact_bytes": self._database_bytes(self.target_path),
+            "source_join_ms": self._time_query(self.source_path, source_join, repeat),
+            "compact_join_ms": self._time_query(self.target_path, compact_join, repeat),
+        }
+        housing_logger.info(
+            f"Compact schema benchmark: {results['source_bytes']} -> {results['compact_bytes']} bytes, "
+            f"join {results['source_join_ms']:.1f} -> {results['compact_join_ms']:.1f} ms."
+        )
+        return results
+
+    def _find_scaled_columns(
+        self, conn: sqlite3.Connection, source_tables: set[str]
+    ) -> set[tuple[str, str]]:
+        """
+        Money columns whose every value converts to integer cents and back unchanged
+        """
+        scaled_columns = set()
+        for table in self.tables:
+            if table.name not in source_tables:
+                continue
+            for column in table.columns:
+                if not _is_money_column(column):
+                    continue
+                has_fraction = conn.execute(
+                    f"SELECT EXISTS (SELECT 1 FROM src.{table.name} "
+                    f"WHERE {column.name} IS NOT NULL "
+                    f"AND CAST(ROUND({column.name} * {PRICE_SCALE}) AS INTEGER) "
+                    f"/ {float(PRICE_SCALE)} != {column.name});"
+                ).fetchone()[0]
+                if has_fraction:
+                    housing_logger.info(
+                        f"{table.name}.{column.name} has fractional cents, kept as REAL."
+                    )
+                else:
+                    scaled_columns.add((table.name, column.name))
+        return scaled_columns
+
+    def _is_scaled(self, table: Table, column) -> bool:
+        return (table.name, column.name) in self.scaled_columns
+
+    def _create_compact_table(self, conn: sqlite3.Connection, table: Table) -> None:
+        pk_columns = [column.name for column in table.primary_key.columns]
+        single_integer_pk = (
+            len(pk_columns) == 1
+            and _compact_type(table.primary_key.columns[pk_columns[0]]) == "INTEGER"
+        )
+        column_defs = []
+        for column in table.columns:
+            column_def = f"{column.name} {_compact_type(column, self._is_scaled(table, column))}"
+            if single_integer_pk and column.name == pk_columns[0]:
+                column_def += " PRIMARY KEY"
+            elif not column.nullable:
+                column_def += " NOT NULL"
+            column_defs.append(column_def)
+        if not single_integer_pk:
+            column_defs.append(f"PRIMARY KEY ({', '.join(pk_columns)})")
+        # Rows are found by their composite or text key, a separate rowid b-tree only adds size
+        without_rowid = "" if single_integer_pk else " WITHOUT ROWID"
+        conn.execute(
+            f"CREATE TABLE {COMPACT_PREFIX}{table.name} ({', '.join(column_defs)}){without_rowid};"
+        )
+        # Index foreign keys used by joins, unless they lead the primary key
+        for column in table.columns:
+            if column.foreign_keys and column.name != pk_columns[0]:
+                conn.execute(
+                    f"CREATE INDEX ix_{table.name}_{column.name} "
+                    f"ON {COMPACT_PREFIX}{table.name} ({column.name});"
+                )
+
+    def _copy_table(self, conn: sqlite3.Connection, table: Table) -> None:
+        for column in table.columns:
+            if _is_id_column(column):
+                conn.execute(
+                    f"INSERT OR IGNORE INTO id_dictionary (value) "
+                    f"SELECT DISTINCT {column.name} FROM src.{table.name} "
+                    f"WHERE {column.name} IS NOT NULL;"
+                )
+        select_exprs = [self._compact_expression(table, column) for column in table.columns]
+        column_names = ", ".join(column.name for column in table.columns)
+        conn.execute(
+            f"INSERT INTO {COMPACT_PREFIX}{table.name} ({column_names}) "
+            f"SELECT {', '.join(select_exprs)} FROM src.{table.name} t;"
+        )
+        housing_logger.info(f"Copied {table.name} to compact schema.")
+
+    def _compact_expression(self, table: Table, column) -> str:
+        """SQL converting a source column of alias t to its compact value"""
+        name = column.name
+        if _is_id_column(column):
+            return f"(SELECT id FROM id_dictionary WHERE value = t.{name})"
+        if self._is_scaled(table, column):
+            return f"CAST(ROUND(t.{name} * {PRICE_SCALE}) AS INTEGER)"
+        if isinstance(column.type, DateTime):
+            return _TO_MICROS.format(name=name)
+        return f"t.{name}"
+
+    def _create_view(self, conn: sqlite3.Connection, table: Table) -> None:
+        select_exprs, joins = [], []
+        for idx, column in enumerate(table.columns):
+            name = column.name
+            if _is_id_column(column):
+                joins.append(f"LEFT JOIN id_dictionary d{idx} ON d{idx}.id = c.{name}")
+                select_exprs.append(f"d{idx}.value AS {name}")
+            elif self._is_scaled(table, column):
+                select_exprs.append(f"c.{name} / {float(PRICE_SCALE)} AS {name}")
+            elif isinstance(column.type, DateTime):
+                # NULL dates stay NULL, concatenation with NULL is NULL
+                select_exprs.append(f"{_FROM_MICROS.format(name=name)} AS {name}")
+            else:
+                select_exprs.append(f"c.{name} AS {name}")
+        conn.execute(
+            f"CREATE VIEW {table.name} AS SELECT {', '.join(select_exprs)} "
+            f"FROM {COMPACT_PREFIX}{table.name} c {' '.join(joins)};"
+        )
+
+    @staticmethod
+    def _database_bytes(path: str) -> int:
+        # Include the WAL, rows committed to it are part of the database
+        return sum(
+            os.path.getsize(file_path)
+            for file_path in (path, f"{path}-wal")
+            if os.path.exists(file_path)
+        )
+
+    @staticmethod
+    def _time_query(path: str, query: str, repeat: int) -> float:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            timings = []
+            for _ in range(repeat):
+                started_at = time.perf_counter()
+                conn.execute(query).fetchall()
+                timings.append((time.perf_counter() - started_at) * 1000)
+            return min(timings)
+        finally:
+            conn.close()
@@ -0,0 +1,111 @@
+import queue
+import threading
+from typing import Optional, Union
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from logger import housing_logger
+from ..columnar import ColumnarBuffer
+
+# A write is a statement with its executemany parameters
+WriteBatch = list[tuple[object, Optional[Union[list[dict], ColumnarBuffer]]]]
+
+# Rows materialized as dicts at a time when executing a columnar buffer
+EXECUTE_BATCH_SIZE = 10_000
+
+_STOP = object()
+
+
+class DbWriter:
+    """
+    Single background writer owning the one write connection to the agency database.
+    Processors submit finished batches and continue crawling, each batch is committed
+    in its own transaction so data and ledger entries land together.
+    The queue is bounded: submit blocks once max_pending batches wait, applying
+    backpressure when the writer falls behind.
+    """
+
+    def __init__(self, engine: Engine, max_pending: int = 4):
+        self.engine = engine
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._error: Optional[BaseException] = None
+        self.committed_batches = 0
+        self._thread = threading.Thread(
+            target=self._run, name="agency-db-writer", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def pending(self) -> int:
+        """Batches waiting to be committed"""
+        return self._queue.qsize()
+
+    def submit(self, batch: WriteBatch) -> None:
+        """
+        Queue a batch for writing, blocks while the queue is full
+        """
+        self._raise_error()
+        self._queue.put(batch)
+
+    def flush(self) -> None:
+        """
+        Wait until all queued batches are committed, call before reading written data back
+        """
+        self._queue.join()
+        self._raise_error()
+
+    def close(self) -> None:
+        """
+        Commit pending batches and stop the writer thread
+        """
+        if not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._raise_error()
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise RuntimeError("Database writer failed.") from self._error
+
+    def _run(self) -> None:
+        with Session(bind=self.engine) as session:
+            while True:
+                batch = self._queue.get()
+                try:
+                    if batch is _STOP:
+                        return
+                    if self._error is None:
+                        self._write_batch(session, batch)
+                        self.committed_batches += 1
+                except Exception as e:
+                    # Keep draining so producers never block on a dead writer
+                    housing_logger.error(f"Database writer failed to commit batch: {e}")
+                    session.rollback()
+                    self._error = e
+                finally:
+                    self._queue.task_done()
+
+    @staticmethod
+    def _write_batch(session: Session, batch: WriteBatch) -> None:
+        total_rows = execute_write_batch(session, batch)
+        session.commit()
+        housing_logger.debug(f"Database writer committed {total_rows} rows.")
+
+
+def execute_write_batch(session: Session, batch: WriteBatch) -> int:
+    """
+    Execute the statements of a batch without committing, returns the number of rows
+    Columnar buffers are executed in chunks, so only one chunk of row dicts exists at a time
+    """
+    total_rows = 0
+    for statement, rows in batch:
+        if rows is None:
+            session.execute(statement)
+        elif isinstance(rows, ColumnarBuffer):
+            for chunk in rows.iter_dict_batches(EXECUTE_BATCH_SIZE):
+                session.execute(statement, chunk)
+        else:
+            session.execute(statement, rows)
+        total_rows += len(rows) if rows is not None else 0
+    return total_rows
@@ -2,10 +2,12 @@ from requests import Response
 from typing import Optional
 import os
 import json
+from sqlalchemy import select, update
 
-from utils import parse_response
+from utils import parse_response, partition_ids
 from logger import housing_logger
 from .agency_base import AgencyProcessor
+from .pk_index import PkIndex
 from models.agency.responses import (
     EstateInfoResponse,
     SingleEstateInfoResponse,
@@ -38,6 +40,10 @@ class EstatesProcessor(AgencyProcessor):
             "phases_cache": (PhasesTableModel, Phase),
             "buildings_cache": (BuildingsTableModel, Building),
         }
+        # Changed market stats, written in the same batch as the estate infos they came from
+        self.market_stat_table_configs = {
+            "estate_market_stats_cache": (EstateMarketStatTableModel, EstateMarketStat),
+        }
         # Primary key map for upsert operations
         self.pk_map = {
             "estate_info_cache": ["estate_id"],
@@ -51,12 +57,17 @@ class EstatesProcessor(AgencyProcessor):
             "estate_facilities_cache": ["estate_id", "facility_id"],
             "facilities_cache": ["facility_id"],
             "estate_monthly_market_info_cache": ["estate_id", "record_date"],
+            "estate_market_stats_cache": ["estate_id"],
         }
+        # Caches whose stored rows change over time, always written again
+        self.refreshed_caches = {"estate_info_cache", "estate_monthly_market_info_cache"}
         self._create_data_cache()
         # Create tables if not exist
         self._create_tables()
-        # Initialize persistent PK sets for deduplication across partitions
+        # Initialize persistent PK indexes for deduplication across partitions
         self._init_pk_sets()
+        # Last seen market stat change keys and sync state per estate, for incremental refresh
+        self._load_market_stats()
 
     def _create_data_cache(self) -> None:
         self.caches = {
@@ -76,21 +87,55 @@ class EstatesProcessor(AgencyProcessor):
                     line.strip() for line in f.readlines()
                 ]
 
-        for cache_name in self.zh_table_configs.keys():
-            self.caches[cache_name] = []
-        for cache_name in self.table_configs.keys():
-            self.caches[cache_name] = []
+        # Table rows are buffered column by column
+        for cache_name, (table_model, _) in self.zh_table_configs.items():
+            self.caches[cache_name] = self._create_cache_buffer(table_model)
+        for cache_name, (table_model, _) in self.table_configs.items():
+            self.caches[cache_name] = self._create_cache_buffer(table_model)
+        for cache_name, (table_model, _) in self.market_stat_table_configs.items():
+            self.caches[cache_name] = self._create_cache_buffer(table_model)
 
     def _create_tables(self):
         Base.metadata.create_all(self.engine)
 
     def _init_pk_sets(self):
-        """Initialize persistent PK sets for deduplication across partitions"""
+        """Initialize persistent PK indexes for deduplication across partitions"""
         self.pk_sets = {}
-        for cache_name in self.table_configs.keys():
-            self.pk_sets[cache_name] = set()
-        for cache_name in self.zh_table_configs.keys():
-            self.pk_sets[cache_name] = set()
+        for cache_name in {**self.table_configs, **self.zh_table_configs}:
+            self.pk_sets[cache_name] = PkIndex()
+        # Rows updated by later crawls are not seeded, their upserts keep them current
+        for cache_name, (_, db_table_class) in {
+            **self.table_configs,
+            **self.zh_table_configs,
+        }.items():
+            if cache_name not in self.refreshed_caches:
+                self._seed_on_disk_pks(cache_name, db_table_class)
+
+    def _load_market_stats(self) -> None:
+        """
+        Snapshot of the stored market stats, kept current in memory for the run:
+        change keys are updated by _track_market_stat and sync state by
+        mark_market_stats_synced, so reads never wait for the db writer
+        """
+        rows = self.session.execute(
+            select(
+                EstateMarketStat.estate_id,
+                EstateMarketStat.tx_count,
+                EstateMarketStat.tx_amount,
+                EstateMarketStat.synced,
+            )
+        )
+        self.market_stats = {}
+        self.unsynced_estate_ids = set()
+        for estate_id, tx_count, tx_amount, synced in rows:
+            self.market_stats[estate_id] = (tx_count, tx_amount)
+            if not synced:
+                self.unsynced_estate_ids.add(estate_id)
+
+    def clean_local_db(self) -> None:
+        super().clean_local_db()
+        # Nothing is stored anymore, every market stat is new again
+        self._load_market_stats()
 
     def process_all_estate_info_response(self, estate_info_response: Response) -> int:
         """
@@ -142,14 +187,16 @@ class EstatesProcessor(AgencyProcessor):
         - Phases
         - Buildings
         """
+        # Market stat change detection for incremental refresh
+        self._track_market_stat(estate_info_zh)
+
         # Single language: get from zh response
         facilities = EstateFacilitiesTableModel.from_response(response=estate_info_zh)
         if facilities:
             for facility in facilities:
                 facility_dict = facility.model_dump()
                 pk_tuple = tuple(facility_dict[key] for key in self.pk_map["estate_facilities_cache"])
-                if pk_tuple not in self.pk_sets["estate_facilities_cache"]:
-                    self.pk_sets["estate_facilities_cache"].add(pk_tuple)
+                if self._claim_pk("estate_facilities_cache", pk_tuple):
                     self.caches["estate_facilities_cache"].append(facility_dict)
 
         # Bilingual: get from both zh and en responses
@@ -163,14 +210,12 @@ class EstatesProcessor(AgencyProcessor):
                 for item in content:
                     item_dict = item.model_dump()
                     pk_tuple = tuple(item_dict[key] for key in self.pk_map[cache_name])
-                    if pk_tuple not in self.pk_sets[cache_name]:
-                        self.pk_sets[cache_name].add(pk_tuple)
+                    if self._claim_pk(cache_name, pk_tuple):
                         self.caches[cache_name].append(item_dict)
             else:
                 content_dict = content.model_dump()
                 pk_tuple = tuple(content_dict[key] for key in self.pk_map[cache_name])
-                if pk_tuple not in self.pk_sets[cache_name]:
-                    self.pk_sets[cache_name].add(pk_tuple)
+                if self._claim_pk(cache_name, pk_tuple):
                     self.caches[cache_name].append(content_dict)
 
     def map_single_estate_market_info_responses_to_table_dicts(
@@ -188,17 +233,97 @@ class EstatesProcessor(AgencyProcessor):
             for month_record in month_records:
                 record_dict = month_record.model_dump()
                 pk_tuple = tuple(record_dict[key] for key in self.pk_map["estate_monthly_market_info_cache"])
-                if pk_tuple not in self.pk_sets["estate_monthly_market_info_cache"]:
-                    self.pk_sets["estate_monthly_market_info_cache"].add(pk_tuple)
+                if self._claim_pk("estate_monthly_market_info_cache", pk_tuple):
                     self.caches["estate_monthly_market_info_cache"].append(record_dict)
 
-    def create_building_ids_cache_from_building_cache(self) -> None:
+    def _track_market_stat(self, estate_info: SingleEstateInfoResponse) -> None:
+        """
+        Cache the market stat of an estate if tx_count or tx_amount changed since last seen
+        """
+        market_stat = EstateMarketStatTableModel.from_response(response=estate_info)
+        if self.market_stats.get(market_stat.estate_id) == market_stat.change_key:
+            return
+        self.market_stats[market_stat.estate_id] = market_stat.change_key
+        # Written unsynced, its buildings are crawled again
+        self.unsynced_estate_ids.add(market_stat.estate_id)
+        self.caches["estate_market_stats_cache"].append(market_stat.model_dump())
+
+    def get_unsynced_estate_ids(self, estate_ids: list[str]) -> list[str]:
+        """
+        Estates whose market stat changed since their buildings were last crawled,
+        answered from memory without waiting for handed off writes
+        """
+        return [
+            estate_id for estate_id in estate_ids if estate_id in self.unsynced_estate_ids
+        ]
+
+    def mark_market_stats_synced(self, estate_ids: list[str]) -> None:
         """
-        Create building IDs cache from buildings cache
+        Mark market stats as synced after the buildings of the estates were crawled
         """
-        building_ids = set()
-        for building in self.caches.get("buildings_cache", []):
-            building_id = building.get("building_id")
-            if building_id:
-                building_ids.add(building_id)
-        self.caches["building_ids_cache"].extend(list(building_ids))
+        self.unsynced_estate_ids.difference_update(estate_ids)
+        self._write(
+            [
+                (
+                    update(EstateMarketStat)
+                    .where(EstateMarketStat.estate_id.in_(estate_id_partition))
+                    .values(synced=True),
+                    None,
+                )
+                for estate_id_partition in partition_ids(estate_ids, 500)
+            ]
+        )
+
+    def get_fully_crawled_estate_ids(
+        self, estate_ids: list[str], crawled_building_ids: set[str]
+    ) -> list[str]:
+        """
+        Estates whose buildings are all in crawled_building_ids, estates without buildings included
+        """
+        self.flush_writes()
+        incomplete_estate_ids = set()
+        for estate_id_partition in partition_ids(estate_ids, 500):
+            rows = self.session.execute(
+                select(Building.estate_id, Building.building_id).where(
+                    Building.estate_id.in_(estate_id_partition)
+                )
+            )
+            for estate_id, building_id in rows:
+                if building_id not in crawled_building_ids:
+                    incomplete_estate_ids.add(estate_id)
+        return [
+            estate_id for estate_id in estate_ids if estate_id not in incomplete_estate_ids
+        ]
+
+    def load_building_ids_from_db(self, estate_ids: Optional[list[str]] = None) -> None:
+        """
+        Rebuild building IDs cache from the buildings table, optionally limited to given estates
+        """
+        self.flush_writes()
+        query = select(Building.building_id).order_by(Building.building_id)
+        if estate_ids is None:
+            building_ids = list(self.session.execute(query).scalars())
+        else:
+            # Chunked like mark_market_stats_synced, full runs pass every estate
+            building_ids = sorted(
+                building_id
+                for estate_id_partition in partition_ids(estate_ids, 500)
+                for building_id in self.session.execute(
+                    query.where(Building.estate_id.in_(estate_id_partition))
+                ).scalars()
+            )
+        self.caches["building_ids_cache"] = building_ids
+        housing_logger.info(
+            f"Loaded {len(self.caches['building_ids_cache'])} building IDs from database."
+        )
+
+    def load_district_ids_from_db(self) -> list[str]:
+        """
+        District IDs from the districts table, filled by the estate info crawl
+        """
+        self.flush_writes()
+        return list(
+            self.session.execute(
+                select(District.district_id).order_by(District.district_id)
+            ).scalars()
+        )
@@ -0,0 +1,92 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from logger import housing_logger
+from models.agency.outputs import CrawlLedgerTableModel
+from models.agency.sql_db import CrawlLedgerEntry, CrawlRun
+
+
+class CrawlLedger:
+    """
+    Persistent crawl ledger stored in the agency database.
+    Records which items of each pipeline stage were committed in the current run,
+    so an interrupted pipeline resumes from the first unfinished partition.
+
+    Ledger entries are written through the processor caches, so they are
+    committed in the same transaction as the data they describe.
+    """
+
+    cache_name = "crawl_ledger_cache"
+    table_configs = {cache_name: (CrawlLedgerTableModel, CrawlLedgerEntry)}
+
+    def __init__(self, session: Session):
+        self.session = session
+        self.run_id: Optional[int] = None
+
+    def start_or_resume_run(self) -> int:
+        """
+        Resume the latest unfinished run, or start a new one
+        """
+        unfinished_run = self.session.execute(
+            select(CrawlRun)
+            .where(CrawlRun.finished_at.is_(None))
+            .order_by(CrawlRun.run_id.desc())
+        ).scalars().first()
+        if unfinished_run:
+            self.run_id = unfinished_run.run_id
+            housing_logger.info(
+                f"Resuming crawl run {self.run_id} started at {unfinished_run.started_at}."
+            )
+        else:
+            new_run = CrawlRun(started_at=datetime.now())
+            self.session.add(new_run)
+            self.session.commit()
+            self.run_id = new_run.run_id
+            housing_logger.info(f"Started crawl run {self.run_id}.")
+        return self.run_id
+
+    def get_committed_item_ids(self, stage: str) -> set[str]:
+        """
+        Item IDs of a stage already committed in the current run
+        """
+        rows = self.session.execute(
+            select(CrawlLedgerEntry.item_id).where(
+                CrawlLedgerEntry.run_id == self.run_id,
+                CrawlLedgerEntry.stage == stage,
+            )
+        )
+        return {row[0] for row in rows}
+
+    def create_ledger_entries(
+        self, stage: str, item_ids: list[str], partition_idx: Optional[int] = None
+    ) -> list[dict]:
+        """
+        Ledger rows marking item_ids of a stage as committed, to be inserted with the partition data
+        """
+        committed_at = datetime.now()
+        return [
+            CrawlLedgerTableModel(
+                run_id=self.run_id,
+                stage=stage,
+                item_id=item_id,
+                partition_idx=partition_idx,
+                committed_at=committed_at,
+            ).model_dump()
+            for item_id in item_ids
+        ]
+
+    def finish_run(self) -> None:
+        """
+        Mark the current run as finished and drop its ledger entries
+        """
+        run = self.session.get(CrawlRun, self.run_id)
+        if run is None:
+            return
+        run.finished_at = datetime.now()
+        self.session.execute(
+            delete(CrawlLedgerEntry).where(CrawlLedgerEntry.run_id == self.run_id)
+        )
+        self.session.commit()
+        housing_logger.info(f"Finished crawl run {self.run_id}.")
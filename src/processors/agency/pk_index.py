@@ -0,0 +1,109 @@
+from array import array
+from typing import Callable, Hashable, Iterable, Optional
+
+_EMPTY = 0
+
+
+class PkIndex:
+    """
+    Memory-bounded replacement for a set of primary key tuples, with the same
+    `in` / add() / len() API used by the processors for deduplication.
+
+    Keys are stored as 64-bit hashes in an open-addressing array (8 bytes per slot).
+    Keys added since the last hand_off() are also kept exactly, so the rows of a cache
+    that has not been written yet never contain a duplicate key. Once handed off,
+    keys are kept as hashes only and a hash hit is taken as a duplicate: the row was
+    already written in this run, or, with a chance of about n^2 / 2^65, a collision.
+
+    Seeded keys are rows stored by previous runs. A hash hit on an index with
+    exists_in_db is confirmed there, so a collision with a stored key never drops a new row.
+    """
+
+    _max_load = 0.7
+
+    def __init__(
+        self,
+        exists_in_db: Optional[Callable[[tuple], bool]] = None,
+        initial_capacity: int = 1024,
+    ):
+        capacity = 1
+        while capacity < initial_capacity:
+            capacity *= 2
+        self._slots = array("q", bytes(8 * capacity))
+        self._mask = capacity - 1
+        self._size = 0
+        # Exact keys added since the last hand off, their rows are still cached
+        self._pending: set[Hashable] = set()
+        self.exists_in_db = exists_in_db
+        self.db_checks = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, pk: Hashable) -> bool:
+        pk_hash = self._hash(pk)
+        if self._slots[self._find_slot(pk_hash)] == _EMPTY:
+            return False
+        if pk in self._pending:
+            return True
+        if self.exists_in_db is None:
+            # Added and handed off earlier in the run, a 64-bit hash match is taken as a duplicate
+            return True
+        self.db_checks += 1
+        return self.exists_in_db(pk)
+
+    def add(self, pk: Hashable) -> None:
+        self._insert_hash(self._hash(pk))
+        self._pending.add(pk)
+
+    def seed(self, pks: Iterable[Hashable]) -> None:
+        """
+        Add keys known to be stored already, as hashes only
+        """
+        for pk in pks:
+            self._insert_hash(self._hash(pk))
+
+    def hand_off(self) -> None:
+        """
+        Keep the keys added so far as hashes only, call once their rows are handed off for writing
+        """
+        self._pending = set()
+
+    def clear(self) -> None:
+        self.__init__(exists_in_db=self.exists_in_db)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes used by the hash array, excluding the pending keys"""
+        return self._slots.itemsize * len(self._slots)
+
+    @staticmethod
+    def _hash(pk: Hashable) -> int:
+        # Python hashes are 64-bit signed on 64-bit builds and never -1, 0 marks an empty slot
+        pk_hash = hash(pk)
+        return pk_hash if pk_hash != _EMPTY else 1
+
+    def _insert_hash(self, pk_hash: int) -> None:
+        slot = self._find_slot(pk_hash)
+        if self._slots[slot] == _EMPTY:
+            self._slots[slot] = pk_hash
+            self._size += 1
+            if self._size > len(self._slots) * self._max_load:
+                self._grow()
+
+    def _find_slot(self, pk_hash: int) -> int:
+        """Linear probing, slot holding pk_hash or the first empty slot"""
+        slots, mask = self._slots, self._mask
+        slot = pk_hash & mask
+        while slots[slot] != _EMPTY and slots[slot] != pk_hash:
+            slot = (slot + 1) & mask
+        return slot
+
+    def _grow(self) -> None:
+        old_slots = self._slots
+        capacity = len(old_slots) * 2
+        self._slots = array("q", bytes(8 * capacity))
+        self._mask = capacity - 1
+        for pk_hash in old_slots:
+            if pk_hash != _EMPTY:
+                self._slots[self._find_slot(pk_hash)] = pk_hash
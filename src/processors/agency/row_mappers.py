@@ -0,0 +1,202 @@
+from datetime import datetime
+from typing import Callable, Optional, Union, get_args, get_origin
+
+from pydantic import BaseModel
+
+from models.agency.outputs import (
+    TransactionsDetailModel,
+    UnitFeaturesModel,
+    UnitInfoModel,
+)
+
+
+class FastPathError(ValueError):
+    """
+    Raised by compiled row mappers when a value needs the pydantic path,
+    callers fall back to the pydantic mappers which validate and report it
+    """
+
+
+def _to_str(value) -> str:
+    if type(value) is not str:
+        raise FastPathError(f"Expected str, got {type(value).__name__}")
+    return value
+
+
+def _to_float(value) -> float:
+    if type(value) is bool:
+        raise FastPathError("Expected float, got bool")
+    return float(value)
+
+
+def _to_int(value) -> int:
+    value_type = type(value)
+    if value_type is int:
+        return value
+    if value_type is str:
+        return int(value)
+    if value_type is float and value.is_integer():
+        return int(value)
+    raise FastPathError(f"Expected int, got {value!r}")
+
+
+def _to_datetime(value) -> datetime:
+    if type(value) is not str:
+        raise FastPathError(f"Expected ISO date string, got {type(value).__name__}")
+    return datetime.fromisoformat(value)
+
+
+def _to_bool(value) -> bool:
+    if type(value) is not bool:
+        raise FastPathError(f"Expected bool, got {type(value).__name__}")
+    return value
+
+
+_CONVERTERS = {
+    str: _to_str,
+    float: _to_float,
+    int: _to_int,
+    datetime: _to_datetime,
+    bool: _to_bool,
+}
+
+
+def _field_type(annotation) -> type:
+    """Unwrap Optional[X] to X"""
+    if get_origin(annotation) is Union:
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        if len(args) == 1:
+            return args[0]
+    return annotation
+
+
+def compile_row_mapper(
+    model: type[BaseModel],
+    renames: Optional[dict[str, str]] = None,
+    context_fields: tuple[str, ...] = (),
+) -> Callable[..., dict]:
+    """
+    Compile a function mapping a decoded JSON object straight to a row dict of model,
+    with the same types and null handling as validating and dumping the model.
+    Fields are read from the source key of the same name unless renamed,
+    context_fields are passed as extra arguments and used as is.
+    """
+    renames = renames or {}
+    namespace: dict = {"FastPathError": FastPathError}
+    lines = [f"def map_row({', '.join(('source',) + context_fields)}):"]
+    row_items = []
+    for field_name, field_info in model.model_fields.items():
+        if field_name in context_fields:
+            row_items.append(f"{field_name!r}: {field_name}")
+            continue
+        field_type = _field_type(field_info.annotation)
+        if field_type not in _CONVERTERS:
+            raise TypeError(
+                f"No fast converter for {model.__name__}.{field_name} of type {field_type}."
+            )
+        converter_name = f"_convert_{field_name}"
+        namespace[converter_name] = _CONVERTERS[field_type]
+        source_key = renames.get(field_name, field_name)
+        lines.append(f"    value = source.get({source_key!r})")
+        lines.append("    if value is None:")
+        if field_info.is_required():
+            lines.append(f"        raise FastPathError({field_name!r} + ' is required')")
+        else:
+            lines.append(f"        {field_name} = {field_info.default!r}")
+        lines.append("    else:")
+        lines.append(f"        {field_name} = {converter_name}(value)")
+        row_items.append(f"{field_name!r}: {field_name}")
+    lines.append(f"    return {{{', '.join(row_items)}}}")
+    exec("\n".join(lines), namespace)
+    map_row = namespace["map_row"]
+    map_row.__name__ = f"map_{model.__name__}_row"
+    return map_row
+
+
+# Compiled mappers of the buildings processor zh_table_configs models
+map_transaction_row = compile_row_mapper(
+    TransactionsDetailModel, renames={"tx_id": "id"}, context_fields=("unit_id",)
+)
+map_unit_row = compile_row_mapper(
+    UnitInfoModel, context_fields=("building_id", "bedroom", "sitting_room")
+)
+map_unit_feature_row = compile_row_mapper(
+    UnitFeaturesModel,
+    renames={
+        "feature_id": "id",
+        "feature_name_zh": "name",
+        "feature_name_en": "id",
+    },
+    context_fields=("unit_id",),
+)
+
+
+def map_building_json_to_rows(
+    data: dict,
+    keep_latest_transaction_only: bool = False,
+    skip_transaction: Optional[Callable[[str], bool]] = None,
+) -> tuple[str, dict[str, list[dict]]]:
+    """
+    Fast path of map_building_info_response_to_rows on the decoded JSON body,
+    skips the response and table model round trip. Raises on anything unexpected.
+    """
+    building = data["building"]
+    building_id = _to_str(building["id"])
+    _to_str(building["name"])
+    if not building_id:
+        raise FastPathError("Building ID is missing")
+    rows = {"units_cache": [], "unit_features_cache": [], "transactions_cache": []}
+    transaction_rows = rows["transactions_cache"]
+    feature_rows = rows["unit_features_cache"]
+    for unit_info in data["data"]:
+        unit_id = _to_str(unit_info["unit_id"])
+        if not unit_id:
+            continue
+        # Every transaction is mapped to validate the whole payload, as the response model does
+        mapped_transactions = [
+            _map_transaction(transaction, unit_id)
+            # A missing list defaults to empty, a null one is invalid as in UnitInfoField
+            for transaction in unit_info.get("transactions", [])
+        ]
+        if keep_latest_transaction_only and mapped_transactions:
+            mapped_transactions = [
+                max(mapped_transactions, key=lambda mapped: mapped[1])
+            ]
+
+        unit_features, bedroom, sitting_room = None, None, None
+        for transaction_row, _, features, tx_bedroom, tx_sitting_room in mapped_transactions:
+            # Keep overwriting bedroom and sitting_room if multiple transactions exist, in case renovation
+            unit_features = features
+            bedroom = tx_bedroom if tx_bedroom is not None else bedroom
+            sitting_room = (
+                tx_sitting_room if tx_sitting_room is not None else sitting_room
+            )
+            if skip_transaction is None or not skip_transaction(transaction_row["tx_id"]):
+                transaction_rows.append(transaction_row)
+        rows["units_cache"].append(
+            map_unit_row(unit_info, building_id, bedroom, sitting_room)
+        )
+        for feature in unit_features or []:
+            feature_rows.append(map_unit_feature_row(feature, unit_id))
+    return building_id, rows
+
+
+def _map_transaction(transaction: dict, unit_id: str) -> tuple:
+    """
+    Map a transaction to its row, with the raw tx_date string for ordering
+    and the unit attributes carried by the transaction
+    """
+    tx_date = _to_str(transaction["tx_date"])
+    features = transaction.get("feature")
+    for feature in features or []:
+        _to_str(feature["id"])
+        _to_str(feature["name"])
+    bedroom = transaction.get("bedroom")
+    sitting_room = transaction.get("sitting_room")
+    return (
+        map_transaction_row(transaction, unit_id),
+        tx_date,
+        features,
+        _to_int(bedroom) if bedroom is not None else None,
+        _to_int(sitting_room) if sitting_room is not None else None,
+    )
@@ -1,5 +1,6 @@
 from config import housing_datahub_config
 from logger import housing_logger
+from .columnar import ColumnarBuffer
 import pathlib
 
 WORKING_DIR = pathlib.Path(__file__).parent.parent.parent.resolve()
@@ -27,7 +28,10 @@ class BaseProcessor:
         """
         Clear all data caches
         """
-        for cache_name in self.caches.keys():
+        for cache_name, cache in self.caches.items():
             if cache_name not in cache_excluded:
-                self.caches[cache_name] = []
+                # Replace rather than clear, handed off caches may still be written
+                self.caches[cache_name] = (
+                    cache.empty_like() if isinstance(cache, ColumnarBuffer) else []
+                )
         housing_logger.info("Cleared all data caches.")
\ No newline at end of file
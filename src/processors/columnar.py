@@ -0,0 +1,255 @@
+import os
+import pickle
+import sys
+import tempfile
+import weakref
+from array import array
+from itertools import islice
+from pathlib import Path
+from typing import Iterator, Optional, Union, get_args, get_origin
+
+import psutil
+from pydantic import BaseModel
+
+# Typecodes of numeric columns, anything else is kept in a list
+_TYPECODES = {float: "d", int: "q", bool: "b"}
+# Staging files are named cache_<pid>_<random>.seg after the process owning them
+SEGMENT_PREFIX = "cache_"
+
+
+def _field_type(annotation) -> type:
+    """Unwrap Optional[X] to X"""
+    if get_origin(annotation) is Union:
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        if len(args) == 1:
+            return args[0]
+    return annotation
+
+
+class _ArrayColumn:
+    """
+    Numeric column in a typed array, nulls tracked in a parallel byte mask
+    """
+
+    __slots__ = ("values", "nulls", "cast")
+
+    def __init__(self, typecode: str, cast: type):
+        self.values = array(typecode)
+        self.nulls = bytearray()
+        self.cast = cast
+
+    def append(self, value) -> None:
+        if value is None:
+            self.values.append(0)
+            self.nulls.append(1)
+        else:
+            self.values.append(value)
+            self.nulls.append(0)
+
+    def __getitem__(self, idx: int):
+        return None if self.nulls[idx] else self.cast(self.values[idx])
+
+    def __iter__(self):
+        cast = self.cast
+        if not any(self.nulls):
+            return iter(self.values) if cast is not bool else map(bool, self.values)
+        return (
+            None if is_null else cast(value)
+            for value, is_null in zip(self.values, self.nulls)
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.itemsize * len(self.values) + len(self.nulls)
+
+
+class _ListColumn(list):
+    """
+    Column of strings and other objects, strings are interned so repeated IDs share one object
+    """
+
+    __slots__ = ()
+
+    def append(self, value) -> None:
+        super().append(sys.intern(value) if type(value) is str else value)
+
+    @property
+    def nbytes(self) -> int:
+        return sys.getsizeof(self)
+
+
+class ColumnarBuffer:
+    """
+    Pending table rows stored column by column instead of one dict per row.
+    Accepts and yields the row dicts of the table models, so it can replace
+    a list cache: append(), extend(), len(), iteration and indexing.
+
+    With spill_rows set, every spill_rows rows the columns are appended as a segment
+    to a staging file in spill_dir and memory is released. Iteration reads the
+    segments back one at a time before the rows still in memory, so spilled rows
+    reach the tables at commit like any other. The staging file is removed once
+    the buffer is released.
+    """
+
+    def __init__(
+        self,
+        column_types: dict[str, type],
+        spill_rows: int = 0,
+        spill_dir: Optional[Path] = None,
+    ):
+        self.column_types = column_types
+        self.spill_rows = spill_rows
+        self.spill_dir = spill_dir
+        self.spill_path: Optional[str] = None
+        self._spilled_size = 0
+        self._reset_columns()
+
+    @classmethod
+    def for_model(
+        cls,
+        model: type[BaseModel],
+        spill_rows: int = 0,
+        spill_dir: Optional[Path] = None,
+    ) -> "ColumnarBuffer":
+        """
+        Buffer with one column per field of the table model
+        """
+        return cls(
+            {
+                field_name: _field_type(field_info.annotation)
+                for field_name, field_info in model.model_fields.items()
+            },
+            spill_rows=spill_rows,
+            spill_dir=spill_dir,
+        )
+
+    def empty_like(self) -> "ColumnarBuffer":
+        return ColumnarBuffer(
+            self.column_types, spill_rows=self.spill_rows, spill_dir=self.spill_dir
+        )
+
+    def _reset_columns(self) -> None:
+        self.columns: dict[str, Union[_ArrayColumn, _ListColumn]] = {}
+        for column_name, column_type in self.column_types.items():
+            typecode = _TYPECODES.get(column_type)
+            self.columns[column_name] = (
+                _ArrayColumn(typecode, column_type) if typecode else _ListColumn()
+            )
+        self._size = 0
+
+    def append(self, row: dict) -> None:
+        # Look up every column first, so a missing key leaves the buffer untouched
+        values = [row[column_name] for column_name in self.columns]
+        for (column_name, column), value in zip(self.columns.items(), values):
+            try:
+                column.append(value)
+            except (TypeError, OverflowError):
+                # Value does not fit the typed array, keep the column as objects
+                column = self._demote(column_name)
+                column.append(value)
+        self._size += 1
+        if self.spill_rows and self._size >= self.spill_rows:
+            self.spill()
+
+    def extend(self, rows) -> None:
+        for row in rows:
+            self.append(row)
+
+    def __len__(self) -> int:
+        return self._spilled_size + self._size
+
+    def __getitem__(self, idx: int) -> dict:
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("ColumnarBuffer index out of range")
+        if idx < self._spilled_size:
+            return next(islice(self, idx, None))
+        idx -= self._spilled_size
+        return {column_name: column[idx] for column_name, column in self.columns.items()}
+
+    def __iter__(self) -> Iterator[dict]:
+        for columns in self._iter_segments():
+            column_names = list(columns)
+            for values in zip(*columns.values()):
+                yield dict(zip(column_names, values))
+
+    def spill(self) -> None:
+        """
+        Append the rows in memory as a segment to the staging file and release them
+        """
+        if not self._size:
+            return
+        if self.spill_path is None:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            fd, self.spill_path = tempfile.mkstemp(
+                prefix=f"{SEGMENT_PREFIX}{os.getpid()}_", suffix=".seg", dir=self.spill_dir
+            )
+            os.close(fd)
+            # Staged rows only live as long as the buffer
+            weakref.finalize(self, _remove_file, self.spill_path)
+        with open(self.spill_path, "ab") as f:
+            pickle.dump(self.columns, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self._spilled_size += self._size
+        self._reset_columns()
+
+    def _iter_segments(self) -> Iterator[dict]:
+        """
+        Spilled segments one at a time, then the columns in memory
+        """
+        if self.spill_path is not None:
+            with open(self.spill_path, "rb") as f:
+                while True:
+                    try:
+                        yield pickle.load(f)
+                    except EOFError:
+                        break
+        yield self.columns
+
+    def iter_dict_batches(self, batch_size: int = 10_000) -> Iterator[list[dict]]:
+        """
+        Rows as lists of at most batch_size dicts, only one batch is materialized at a time
+        """
+        batch = []
+        for row in self:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate bytes in memory used by the column containers, excluding shared string objects"""
+        return sum(column.nbytes for column in self.columns.values())
+
+    def _demote(self, column_name: str) -> _ListColumn:
+        column = self.columns[column_name]
+        demoted = _ListColumn()
+        for idx in range(len(column.nulls)):
+            demoted.append(column[idx])
+        self.columns[column_name] = demoted
+        return demoted
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def remove_stale_segments(spill_dir: Path) -> int:
+    """
+    Remove staging files of processes that no longer run, left by killed runs.
+    Files of running processes may belong to live buffers and are kept.
+    """
+    removed = 0
+    for segment_path in Path(spill_dir).glob(f"{SEGMENT_PREFIX}*.seg"):
+        owner_pid = segment_path.name[len(SEGMENT_PREFIX):].split("_", 1)[0]
+        if owner_pid.isdigit() and psutil.pid_exists(int(owner_pid)):
+            continue
+        _remove_file(segment_path)
+        removed += 1
+    return removed
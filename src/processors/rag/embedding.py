@@ -1,4 +1,3 @@
-import json
 from typing import List, Dict, Any
 import chromadb
 from chromadb.config import Settings
@@ -8,6 +7,7 @@ from logger import housing_logger
 from config import housing_datahub_config
 from ..base import BaseProcessor
 from models.rag import Document, DocumentMetadata, SearchResult
+from processors.wiki.jsonl import WikiJsonlReader, ZSTD_SUFFIX
 
 
 class TextEmbeddingPipeline(BaseProcessor):
@@ -213,25 +213,26 @@ class TextEmbeddingPipeline(BaseProcessor):
             raise
 
     def _get_wiki_files(self) -> List[str]:
-        """Get list of wiki data files to process."""
+        """Get list of wiki data files to process, plain or zstd compressed JSONL."""
         root_path = housing_datahub_config.storage.wiki.files.get(
-            "pages", "wiki_data_partition_{num}.json"
+            "pages", "wiki_data_partition_{num}.jsonl"
         ).format(num="*")
         wiki_files = list(self.data_dir.glob(root_path))
-        return wiki_files
+        wiki_files.extend(self.data_dir.glob(root_path + ZSTD_SUFFIX))
+        return sorted(wiki_files)
 
     def _process_single_file(self, file_path) -> List[Document]:
         """Process a single wiki data file and return all documents."""
         housing_logger.info(f"Processing {file_path.name}")
 
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-
             all_documents = []
 
-            for estate_name, estate_data in data.items():
-                documents = self.process_estate_data(estate_name, estate_data)
+            # Estates are streamed one line at a time, the partition is never loaded whole
+            for record in WikiJsonlReader(file_path):
+                documents = self.process_estate_data(
+                    record["estate_name"], record["wiki_data"]
+                )
                 all_documents.extend(documents)
 
             return all_documents
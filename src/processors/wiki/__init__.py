@@ -1 +1,3 @@
-from .wiki import WikiProcessor
\ No newline at end of file
+from .wiki import WikiProcessor
+from .cache import WikiPageCache
+from .jsonl import WikiJsonlWriter, WikiJsonlReader
@@ -0,0 +1,120 @@
+import json
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from logger import housing_logger
+from models.wiki.responses import WikiPageContent
+from models.wiki.sql_db import WikiEstate, WikiPage
+
+
+class WikiPageCache:
+    """
+    Persistent cache of wiki pages keyed by page title, stored with the revision
+    they were fetched at, their raw wikitext and their processed wiki data.
+    Pages are only fetched again when their latest revision changed.
+
+    Estates without an article are cached negatively: their title variations
+    are not resolved again until negative_ttl_days have passed.
+
+    Rows are read and written column-wise without ORM objects, the wikitext and
+    wiki data of a page are never loaded unless asked for, and every stored estate
+    is committed at once, so nothing accumulates in the session.
+    """
+
+    def __init__(self, session: Session, negative_ttl_days: float = 7):
+        self.session = session
+        self.negative_ttl = timedelta(days=negative_ttl_days)
+
+    def lookup_estates(self, estate_names: list[str]) -> tuple[dict[str, str], set[str]]:
+        """
+        Cached page title of each estate, and the estates known to have no article.
+        Negative entries older than the TTL are left out, so they are resolved again.
+        """
+        page_titles, missing_estates = {}, set()
+        expired_before = datetime.now() - self.negative_ttl
+        rows = self.session.execute(
+            select(
+                WikiEstate.estate_name, WikiEstate.page_title, WikiEstate.checked_at
+            ).where(WikiEstate.estate_name.in_(estate_names))
+        )
+        for estate_name, page_title, checked_at in rows:
+            if page_title is not None:
+                page_titles[estate_name] = page_title
+            elif checked_at >= expired_before:
+                missing_estates.add(estate_name)
+        return page_titles, missing_estates
+
+    def get_revids(self, titles: list[str]) -> dict[str, int]:
+        """
+        Cached revision of each page by title
+        """
+        rows = self.session.execute(
+            select(WikiPage.title, WikiPage.revid).where(WikiPage.title.in_(titles))
+        )
+        return {title: revid for title, revid in rows}
+
+    def get_wiki_data(self, title: str) -> Optional[dict]:
+        """
+        Processed wiki data of a cached page, None if the page is not cached
+        """
+        wiki_data = self.session.execute(
+            select(WikiPage.wiki_data).where(WikiPage.title == title)
+        ).scalar()
+        return json.loads(wiki_data) if wiki_data is not None else None
+
+    def put_page(
+        self, estate_name: str, page_content: WikiPageContent, wiki_data: dict
+    ) -> None:
+        """
+        Store a fetched page at its revision and point the estate to it
+        """
+        now = datetime.now()
+        self._upsert(
+            WikiPage,
+            {
+                "title": page_content.title,
+                "pageid": page_content.pageid,
+                "revid": page_content.revid or 0,
+                "wikitext": page_content.wikitext,
+                "wiki_data": json.dumps(wiki_data, ensure_ascii=False),
+                "fetched_at": now,
+            },
+        )
+        self._upsert(
+            WikiEstate,
+            {"estate_name": estate_name, "page_title": page_content.title, "checked_at": now},
+        )
+        self.commit()
+
+    def put_missing(self, estate_name: str) -> None:
+        """
+        Record that no article was found for the estate
+        """
+        self._upsert(
+            WikiEstate,
+            {"estate_name": estate_name, "page_title": None, "checked_at": datetime.now()},
+        )
+        self.commit()
+
+    def _upsert(self, table_class: type, row: dict) -> None:
+        """
+        INSERT ... ON CONFLICT DO UPDATE of a single row, replacing the stored one
+        """
+        stmt = insert(table_class.__table__).values(**row)
+        pk_columns = [column.name for column in table_class.__table__.primary_key]
+        self.session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=pk_columns,
+                set_={column: stmt.excluded[column] for column in row if column not in pk_columns},
+            )
+        )
+
+    def commit(self) -> None:
+        try:
+            self.session.commit()
+        except Exception as e:
+            housing_logger.error(f"Failed to commit wiki cache: {e}")
+            self.session.rollback()
@@ -0,0 +1,127 @@
+import io
+import json
+import os
+from typing import Iterator, Optional
+
+try:
+    import zstandard
+except ImportError:  # Optional, zstd compressed wiki output
+    zstandard = None
+
+# Suffix of compressed wiki files, the index sidecar is named after the data file
+ZSTD_SUFFIX = ".zst"
+INDEX_SUFFIX = ".idx"
+
+
+class WikiJsonlWriter:
+    """
+    Streams wiki data to a JSONL file, one estate per line, as estates are processed.
+    With zstd compression every line is its own frame, so a line can still be read
+    alone from its offset while the file stays a valid zstd stream.
+
+    On close an index sidecar is written next to the file, mapping each estate name
+    to the byte offset and length of its line, and each estate_id to its name.
+    """
+
+    def __init__(self, path: str, compression: Optional[str] = None):
+        if compression == "zstd" and zstandard is None:
+            raise ImportError("zstandard is required for zstd compressed wiki output")
+        self.path = str(path)
+        self.compression = compression
+        self._compressor = zstandard.ZstdCompressor() if compression == "zstd" else None
+        self._file = open(self.path, "wb")
+        self._offset = 0
+        self.estate_offsets: dict[str, tuple[int, int]] = {}
+        self.estate_id_names: dict[str, str] = {}
+
+    def __enter__(self) -> "WikiJsonlWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.estate_offsets)
+
+    def write(self, estate_name: str, estate_ids: list[str], wiki_data: dict) -> None:
+        record = {"estate_name": estate_name, "estate_ids": estate_ids, "wiki_data": wiki_data}
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        if self._compressor is not None:
+            line = self._compressor.compress(line)
+        self._file.write(line)
+        self.estate_offsets[estate_name] = (self._offset, len(line))
+        for estate_id in estate_ids:
+            self.estate_id_names[estate_id] = estate_name
+        self._offset += len(line)
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        self._file.close()
+        index = {
+            "compression": self.compression,
+            "estates": self.estate_offsets,
+            "estate_ids": self.estate_id_names,
+        }
+        # Replace the index atomically, readers never see a partial one
+        index_path = f"{self.path}{INDEX_SUFFIX}"
+        with open(f"{index_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(f"{index_path}.tmp", index_path)
+
+
+class WikiJsonlReader:
+    """
+    Reads wiki JSONL files written by WikiJsonlWriter without loading a whole partition:
+    iteration streams one estate at a time, get() seeks to a single estate through the index.
+    """
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self.compressed = self.path.endswith(ZSTD_SUFFIX)
+        if self.compressed and zstandard is None:
+            raise ImportError("zstandard is required for zstd compressed wiki output")
+        self._index: Optional[dict] = None
+
+    @property
+    def index(self) -> dict:
+        if self._index is None:
+            with open(f"{self.path}{INDEX_SUFFIX}", "r", encoding="utf-8") as f:
+                self._index = json.load(f)
+        return self._index
+
+    def estate_names(self) -> list[str]:
+        return list(self.index["estates"])
+
+    def __iter__(self) -> Iterator[dict]:
+        """
+        Records in file order, {"estate_name", "estate_ids", "wiki_data"}
+        """
+        with open(self.path, "rb") as f:
+            lines = f
+            if self.compressed:
+                lines = io.BufferedReader(
+                    zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True)
+                )
+            for line in lines:
+                if line.strip():
+                    yield json.loads(line)
+
+    def get(
+        self, estate_name: Optional[str] = None, estate_id: Optional[str] = None
+    ) -> Optional[dict]:
+        """
+        Record of a single estate by name or estate_id, None if not in this file
+        """
+        if estate_name is None:
+            estate_name = self.index["estate_ids"].get(estate_id)
+        position = self.index["estates"].get(estate_name)
+        if position is None:
+            return None
+        offset, length = position
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            line = f.read(length)
+        if self.compressed:
+            line = zstandard.ZstdDecompressor().decompress(line)
+        return json.loads(line)
@@ -4,8 +4,10 @@ from logger import housing_logger
 from typing import Optional
 from models.wiki.outputs import WikiTable
 from processors.base import BaseProcessor
-from wikipediaapi import WikipediaPage
+from models.wiki.responses import WikiPageContent
 from config import housing_datahub_config
+from .jsonl import ZSTD_SUFFIX
+import pathlib
 import time
 
 
@@ -34,11 +36,20 @@ class WikiProcessor(BaseProcessor):
                 housing_logger.error(
                     f"Failed to create directory {self.wiki_data_storage_path}: {e}"
                 )
-        self.wiki_data_file_path = (
+        self.wiki_cache_db_path = (
             self.wiki_data_storage_path
-            / housing_datahub_config.storage.wiki.files["pages"]
+            / housing_datahub_config.storage.wiki.files.get("cache_db", "wiki_cache.db")
         )
 
+    def get_partition_file_path(self, partition_idx: int) -> pathlib.Path:
+        """JSONL file of a partition, with the compression suffix when compressed"""
+        file_name = housing_datahub_config.storage.wiki.files["pages"].format(
+            num=partition_idx
+        )
+        if housing_datahub_config.storage.wiki.compression == "zstd":
+            file_name += ZSTD_SUFFIX
+        return self.wiki_data_storage_path / file_name
+
     def _parse_tables_from_wikitext(self, wikitext: str) -> list[str]:
         """Parse tables from wiki markup text, handling colspan and rowspan by expanding cells."""
         parsed = mwparserfromhell.parse(wikitext)
@@ -162,7 +173,7 @@ class WikiProcessor(BaseProcessor):
 
     def _get_section_wikitext(
         self,
-        page_content: WikipediaPage,
+        page_content: WikiPageContent,
         section_title: str,
         wikitext: Optional[str] = None,
     ) -> str:
@@ -184,7 +195,7 @@ class WikiProcessor(BaseProcessor):
         return page_content.sections[section_index].text
 
     def process_page_content(
-        self, page_content: WikipediaPage, section_wikitexts: Optional[dict] = None
+        self, page_content: WikiPageContent, section_wikitexts: Optional[dict] = None
     ) -> Optional[dict]:
         sections = []
         all_tables = []
@@ -2,6 +2,8 @@ from typing import Union, Optional
 from requests import Response
 from pydantic import BaseModel
 from logger import housing_logger
+from config import housing_datahub_config
+from decoders import get_decoder
 import psutil
 import time
 from functools import wraps
@@ -36,15 +38,24 @@ def parse_response(response: Response, model: BaseModel) -> Optional[BaseModel]:
     """
     Parse the JSON response and return as a Pydantic BaseModel
     """
+    return parse_content(content=response.content, model=model)
+
+
+def parse_content(
+    content: bytes, model: BaseModel, decoder: Optional[str] = None
+) -> Optional[BaseModel]:
+    """
+    Decode a raw JSON response body into model with the configured decoder backend
+    The msgspec backend returns structs with the same fields as model instead of pydantic models
+    """
+    backend = get_decoder(decoder or housing_datahub_config.agency_api.crawler.decoder)
     try:
-        data = response.json()
-        housing_logger.debug(f"Full JSON response for {model.__name__}: {data}")
-        return model(**data)
+        return backend.decode(content, model)
     except ValueError as e:
         housing_logger.error(
             f"Failed to parse JSON response to pydantic model: {model.__name__}. Error: {e}"
         )
-        housing_logger.debug(f"Raw response text: {response.text}")
+        housing_logger.debug(f"Raw response text: {content.decode('utf-8', errors='replace')}")
         return None
 
 
@@ -56,6 +67,13 @@ def get_memory_usage() -> float:
     return psutil.virtual_memory().percent
 
 
+def get_process_rss() -> int:
+    """
+    Get the resident set size of the current process in bytes.
+    """
+    return psutil.Process().memory_info().rss
+
+
 def timer(func):
     """
     Decorator to measure the execution time of a function.
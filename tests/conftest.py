@@ -0,0 +1,10 @@
+import os
+import sys
+from pathlib import Path
+
+# Modules import each other relative to src, as when running src/main.py
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+# Settings require cloud storage credentials, tests never reach cloud storage
+os.environ.setdefault("CLOUD_STORAGE_ACCESS_KEY_ID", "test")
+os.environ.setdefault("CLOUD_STORAGE_SECRET_ACCESS_KEY", "test")
@@ -0,0 +1,30 @@
+import pytest
+
+from benchmarks.compact_schema import build_sample_database
+from processors.agency import CompactSchemaMigrator
+
+
+@pytest.fixture(scope="module")
+def compact_migrator(tmp_path_factory):
+    tmp_dir = tmp_path_factory.mktemp("compact_schema")
+    source_path = str(tmp_dir / "agency_data.db")
+    build_sample_database(source_path, transactions=3_000)
+    migrator = CompactSchemaMigrator(
+        source_path=source_path, target_path=str(tmp_dir / "agency_data_compact.db")
+    )
+    migrator.migrate()
+    return migrator
+
+
+def test_compact_views_match_source_tables(compact_migrator):
+    differences = compact_migrator.verify()
+    assert differences
+    assert all(count == 0 for count in differences.values()), differences
+
+
+def test_only_exact_cent_columns_are_scaled(compact_migrator):
+    scaled_columns = compact_migrator.scaled_columns
+    assert ("transactions", "price") in scaled_columns
+    # Per square foot prices and averages have fractional cents and stay REAL
+    assert ("transactions", "net_ft_price") not in scaled_columns
+    assert ("estate_monthly_market_info", "avg_ft_price") not in scaled_columns
@@ -0,0 +1,50 @@
+import pytest
+from pydantic import BaseModel
+
+import decoders
+from benchmarks.decoders import SAMPLE_RESPONSES, available_backends, normalize
+from benchmarks.samples import API_RESPONSES_PATH, make_building_payloads
+from models.agency.responses import BuildingInfoResponse
+
+
+def _decode(name: str, content: bytes, model: type[BaseModel]):
+    try:
+        return normalize(decoders.get_decoder(name).decode(content, model))
+    except (ValueError, TypeError):
+        # Backends raise their own error types, only rejecting the payload has to match
+        return ValueError
+
+
+@pytest.mark.parametrize("name", available_backends())
+@pytest.mark.parametrize("file_name", sorted(SAMPLE_RESPONSES))
+def test_documented_samples_decode_like_reference(name, file_name):
+    content = (API_RESPONSES_PATH / file_name).read_bytes()
+    model = SAMPLE_RESPONSES[file_name]
+    reference = _decode("pydantic", content, model)
+    assert reference is not ValueError
+    assert _decode(name, content, model) == reference
+
+
+@pytest.mark.parametrize("name", available_backends())
+def test_generated_payloads_with_edge_cases_decode_like_reference(name):
+    for content in make_building_payloads(count=30, units=5, transactions=4, edge_cases=True):
+        assert _decode(name, content, BuildingInfoResponse) == _decode(
+            "pydantic", content, BuildingInfoResponse
+        ), content[:80]
+
+
+@pytest.mark.parametrize("name", available_backends())
+@pytest.mark.parametrize("content", [b"not json", b'{"building": null, "data": []}', b"{}"])
+def test_invalid_payloads_raise_value_error(name, content):
+    with pytest.raises(ValueError):
+        decoders.get_decoder(name).decode(content, BuildingInfoResponse)
+
+
+def test_auto_prefers_msgspec_when_installed():
+    expected = "msgspec" if decoders.msgspec else "pydantic_json"
+    assert decoders.get_decoder("auto").name == expected
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        decoders.get_decoder("orjson")
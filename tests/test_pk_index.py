@@ -0,0 +1,46 @@
+from benchmarks.pk_index import check_dedup
+from processors.agency.pk_index import PkIndex
+
+
+def test_dedup_matches_exact_set():
+    assert check_dedup(partitions=10, partition_keys=500) == 0
+
+
+def test_keys_are_found_before_and_after_hand_off():
+    index = PkIndex(initial_capacity=8)
+    keys = [(f"U{idx:09d}", "balcony") for idx in range(1_000)]
+    for pk in keys:
+        index.add(pk)
+    assert len(index) == len(keys)
+    assert all(pk in index for pk in keys)
+    index.hand_off()
+    assert all(pk in index for pk in keys)
+    assert ("U999999999", "balcony") not in index
+
+
+def test_repeated_adds_count_once():
+    index = PkIndex()
+    index.add(("U1", "balcony"))
+    index.add(("U1", "balcony"))
+    assert len(index) == 1
+
+
+def test_hash_collision_with_seeded_key_is_confirmed_in_db(monkeypatch):
+    stored = {("U1", "balcony")}
+    index = PkIndex(exists_in_db=lambda pk: pk in stored)
+    # Every key hashes alike, so any lookup hits the seeded key
+    monkeypatch.setattr(PkIndex, "_hash", staticmethod(lambda pk: 1))
+    index.seed(stored)
+    assert ("U1", "balcony") in index
+    assert ("U2", "balcony") not in index
+    assert index.db_checks == 2
+
+
+def test_clear_keeps_db_confirmation():
+    exists_in_db = lambda pk: False
+    index = PkIndex(exists_in_db=exists_in_db)
+    index.add(("U1", "balcony"))
+    index.clear()
+    assert len(index) == 0
+    assert ("U1", "balcony") not in index
+    assert index.exists_in_db is exists_in_db
@@ -0,0 +1,133 @@
+import json
+
+import pytest
+
+import processors.agency.buildings as buildings
+from benchmarks.samples import load_sample_building, make_building_payloads
+from processors.agency.buildings import map_building_payload_to_rows
+
+
+def _skip_transaction(tx_id: str) -> bool:
+    return tx_id.endswith("3")
+
+
+def _map_both(payload: bytes, keep_latest: bool = False, skip_transaction=None):
+    reference = map_building_payload_to_rows(
+        payload, keep_latest, False, skip_transaction
+    )
+    fast = map_building_payload_to_rows(payload, keep_latest, True, skip_transaction)
+    return reference, fast
+
+
+def _payload(building: dict) -> bytes:
+    return json.dumps(building, ensure_ascii=False).encode("utf-8")
+
+
+def _edit_sample(edit) -> bytes:
+    building = load_sample_building()
+    edit(building)
+    return _payload(building)
+
+
+@pytest.mark.parametrize("keep_latest", [False, True])
+@pytest.mark.parametrize("skip_transaction", [None, _skip_transaction])
+def test_documented_sample_maps_identically(keep_latest, skip_transaction):
+    reference, fast = _map_both(
+        _payload(load_sample_building()), keep_latest, skip_transaction
+    )
+    assert reference is not None
+    assert fast == reference
+
+
+@pytest.mark.parametrize("keep_latest", [False, True])
+@pytest.mark.parametrize("skip_transaction", [None, _skip_transaction])
+def test_generated_payloads_with_edge_cases_map_identically(keep_latest, skip_transaction):
+    payloads = make_building_payloads(count=40, units=5, transactions=4, edge_cases=True)
+    for payload in payloads:
+        reference, fast = _map_both(payload, keep_latest, skip_transaction)
+        assert fast == reference, payload[:80]
+
+
+def _set_transaction_field(key, value):
+    def edit(building):
+        building["data"][0]["transactions"][0][key] = value
+
+    return edit
+
+
+def _drop_transaction_field(key):
+    def edit(building):
+        building["data"][0]["transactions"][0].pop(key)
+
+    return edit
+
+
+def _drop_unit_field(key):
+    def edit(building):
+        building["data"][0].pop(key)
+
+    return edit
+
+
+def _set_unit_field(key, value):
+    def edit(building):
+        building["data"][0][key] = value
+
+    return edit
+
+
+@pytest.mark.parametrize(
+    "edit",
+    [
+        _set_transaction_field("bedroom", None),
+        _set_transaction_field("sitting_room", None),
+        _set_transaction_field("gain", None),
+        _set_transaction_field("price", 6800000),
+        _set_transaction_field("bedroom", "3.5"),
+        _set_transaction_field("feature", None),
+        _set_transaction_field("feature", []),
+        _set_transaction_field("tx_date", None),
+        _drop_transaction_field("last_tx_date"),
+        _drop_transaction_field("feature"),
+        _drop_transaction_field("id"),
+        _set_unit_field("area", None),
+        _set_unit_field("unit_id", None),
+        _set_unit_field("unit_id", ""),
+        _set_unit_field("transactions", []),
+        _set_unit_field("transactions", None),
+        _set_unit_field("floor", 12),
+        _drop_unit_field("transactions"),
+        _drop_unit_field("area"),
+    ],
+)
+def test_null_and_missing_fields_map_identically(edit):
+    reference, fast = _map_both(_edit_sample(edit))
+    assert fast == reference
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        b"",
+        b"not json",
+        b"[]",
+        _payload({"building": None, "data": []}),
+        _payload({"data": []}),
+        _edit_sample(lambda building: building["building"].update(id=None)),
+        _edit_sample(lambda building: building.update(data=None)),
+    ],
+)
+def test_invalid_payloads_map_identically(payload):
+    reference, fast = _map_both(payload)
+    assert fast == reference
+
+
+def test_fast_path_failure_falls_back_to_pydantic(monkeypatch):
+    payload = _payload(load_sample_building())
+    reference = map_building_payload_to_rows(payload, False, False)
+
+    def fail(**kwargs):
+        raise KeyError("unexpected payload")
+
+    monkeypatch.setattr(buildings, "map_building_json_to_rows", fail)
+    assert map_building_payload_to_rows(payload, False, True) == reference